@@ -1,30 +1,25 @@
 import streamlit as st
 import pandas as pd
-import json
 import os
+import hashlib
+import tempfile
 import diagnostics  # Ensure diagnostics.py is available in your project
-import joblib
-import matplotlib.pyplot as plt
-from PIL import Image
-from reporting import generate_pdf_report  # Import the PDF report function
+import batch_scoring
+from client_data import read_clients
+from score_cache import ScoreCache, cached_predict_proba
+from client_index import lookup_client
+from explanations import add_reasons
 
-# Load configuration from config.json
-with open('config.json', 'r') as file:
-    CONFIG = json.load(file)
+# Paths come from config.py, which parses config.json once per process
+from config import TEST_DATA_PATH, MODEL_PATH
 
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-TEST_DATA_PATH = os.path.join(BASE_DIR, CONFIG['test_data_path'])
-MODEL_PATH = os.path.join(BASE_DIR, CONFIG['output_model_path'])
+# PIL and reporting (reportlab, matplotlib) are imported by the pages that use them
 CONFUSION_MATRIX_PATH = os.path.join(MODEL_PATH, 'confusionmatrix.png')
 PDF_REPORT_PATH = os.path.join(MODEL_PATH, 'summary_report.pdf')
 
-# Load the trained model
-def load_model():
-    return joblib.load(os.path.join(MODEL_PATH, 'trainedmodel.pkl'))
-
 st.title("Clint Risk Attrition System")
 st.sidebar.header("Navigation")
-page = st.sidebar.radio("Go to", ["Home", "Upload Data & Predict", "Model Performance", "High-Risk Clients", "Generate Report"])
+page = st.sidebar.radio("Go to", ["Home", "Upload Data & Predict", "Model Performance", "High-Risk Clients", "Client Lookup", "Generate Report"])
 
 # 🏠 Home Page
 if page == "Home":
@@ -37,31 +32,31 @@ elif page == "Upload Data & Predict":
     uploaded_file = st.file_uploader("Choose a CSV file", type=["csv"])
     
     if uploaded_file is not None:
-        test_df = pd.read_csv(uploaded_file)
         st.write("### Preview of Uploaded Data:")
-        st.dataframe(test_df.head())
-        
-        if 'Attrition_Risk' in test_df.columns:
-            y_true = test_df.pop('Attrition_Risk')
-        else:
-            y_true = None
-        
-        model = load_model()
-        X_df = pd.get_dummies(test_df.drop(['Client_ID'], axis=1), drop_first=True)
-        
-        # Align columns with model expectations
-        model_columns = model.feature_names_in_
-        for col in set(model_columns) - set(X_df.columns):
-            X_df[col] = 0
-        X_df = X_df[model_columns]
+        st.dataframe(pd.read_csv(uploaded_file, nrows=5))
+        uploaded_file.seek(0)
         
-        predictions = model.predict(X_df)
-        test_df['Predicted Risk'] = predictions
+        # Score in fixed-size chunks straight to disk so large uploads stay within memory;
+        # clients scored before with the same data and model come from the score cache.
+        # Each session writes its own file and reruns reuse it until a different file is uploaded
+        upload_digest = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+        scored = st.session_state.get('scored_upload')
+        if scored is None or scored['digest'] != upload_digest or not os.path.exists(scored['path']):
+            if scored is not None and os.path.exists(scored['path']):
+                os.remove(scored['path'])
+            with tempfile.NamedTemporaryFile(prefix='predictions_', suffix='.csv', delete=False) as predictions_file:
+                predictions_path = predictions_file.name
+            stats = batch_scoring.score_csv(uploaded_file, predictions_path, score_cache=ScoreCache())
+            scored = {'digest': upload_digest, 'path': predictions_path, 'stats': stats}
+            st.session_state['scored_upload'] = scored
+        predictions_path, stats = scored['path'], scored['stats']
         
         st.write("### Prediction Results:")
-        st.dataframe(test_df[['Client_ID', 'Predicted Risk']].head(20))
+        st.caption(f"Scored {stats['rows']:,} rows at {stats['rows_per_sec']:,.0f} rows/sec")
+        st.dataframe(pd.read_csv(predictions_path, usecols=['Client_ID', 'Predicted Risk'], nrows=20))
         
-        st.download_button("Download Predictions", test_df.to_csv(index=False).encode("utf-8"), "predictions.csv", "text/csv")
+        with open(predictions_path, "rb") as predictions_file:
+            st.download_button("Download Predictions", predictions_file, "predictions.csv", "text/csv")
 
 # 📊 Model Performance Page
 elif page == "Model Performance":
@@ -77,6 +72,7 @@ elif page == "Model Performance":
     
     st.write("### Confusion Matrix:")
     try:
+        from PIL import Image
         image = Image.open(CONFUSION_MATRIX_PATH)
         st.image(image, caption="Confusion Matrix", use_column_width=True)
     except:
@@ -85,29 +81,55 @@ elif page == "Model Performance":
 # 🚨 High-Risk Clients Page
 elif page == "High-Risk Clients":
     st.subheader("Top 50 High-Risk Clients")
+    rank_by = st.radio("Rank by", ["Probability of leaving", "Expected annual revenue loss"])
     
     try:
-        test_df = pd.read_csv(os.path.join(TEST_DATA_PATH, 'testdata.csv'))
-        X_df = test_df.drop(['Attrition_Risk', 'Client_ID'], axis=1)
-        X_df = pd.get_dummies(X_df, drop_first=True)
+        test_df = read_clients(os.path.join(TEST_DATA_PATH, 'testdata.csv'))
+        # Only clients that are new or changed since the last run are predicted again
+        y_prob, _ = cached_predict_proba(test_df)
         
-        high_risk_clients = diagnostics.model_predictions(X_df)
+        high_risk_clients = diagnostics.rank_high_risk_clients(
+            test_df, client_ids=test_df['Client_ID'], top_k=50, y_prob=y_prob,
+            by='probability' if rank_by == "Probability of leaving" else 'expected_revenue_loss')
+        # Largest per-feature contributions to each client's score
+        high_risk_clients = add_reasons(high_risk_clients, test_df)
 
-        if isinstance(high_risk_clients, str):  # Handle error messages
-            st.error(f"Error: {high_risk_clients}")
-        elif isinstance(high_risk_clients, pd.DataFrame):
-            st.write("### Top 50 High-Risk Clients:")
-            st.dataframe(high_risk_clients.head(50))
+        if high_risk_clients.empty:
+            st.info("No clients predicted to leave.")
         else:
-            st.error("Unexpected data format received from model_predictions.")
+            st.write("### Top 50 High-Risk Clients:")
+            st.dataframe(high_risk_clients)
     except Exception as e:
         st.error(f"Error generating high-risk clients list: {e}")
 
+# 🔎 Client Lookup Page
+elif page == "Client Lookup":
+    st.subheader("Look Up a Client")
+
+    client_id = st.text_input("Client_ID").strip()
+    if client_id:
+        try:
+            client = lookup_client(client_id)
+            if client is None:
+                st.warning(f"No client with Client_ID {client_id}.")
+            else:
+                probabilities = client.pop('probabilities')
+                st.metric("Probability of Leaving", f"{client['probability_of_leaving']:.1%}")
+                st.write(f"Predicted class: {client['predicted_class']}")
+                st.table(pd.DataFrame([client]).T.rename(columns={0: 'Value'}).astype(str))
+                st.write("### Class Probabilities:")
+                st.table(pd.DataFrame([probabilities]))
+        except FileNotFoundError:
+            st.error("Client index not found. Please run ingestion.py first.")
+        except Exception as e:
+            st.error(f"Error looking up client: {e}")
+
 # 📄 Generate Report Page
 elif page == "Generate Report":
     st.subheader("Generate and Download Report")
     
     if st.button("Generate PDF Report"):
+        from reporting import generate_pdf_report  # Import the PDF report function
         generate_pdf_report()
         st.success("PDF Report generated successfully!")
         
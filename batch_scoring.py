@@ -0,0 +1,105 @@
+"""
+Streaming batch scorer for client CSV files of any size.
+
+The input is read in fixed-size chunks; each chunk is encoded with the
+deployed FeatureEncoder, scored and appended to the output file before the
+next one is read, so peak memory depends on the chunk size, not the input size.
+
+Usage:
+    python batch_scoring.py input.csv predictions.csv --chunksize 100000
+    python batch_scoring.py input.csv predictions.csv --top-k 50 --rank-by expected_revenue_loss
+"""
+
+import os
+import sys
+import time
+import argparse
+import logging
+
+from client_data import iter_clients
+from model_registry import load_deployed_encoder, release_dir
+from numpy_model import load_scoring_model
+from topk import REVENUE_COLUMN, RANK_BY, TopKAccumulator
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def score_csv(input_path, output_path, chunksize=DEFAULT_CHUNKSIZE, model=None, encoder=None, score_cache=None,
+              top_k=None, rank_by='probability'):
+    """
+    Scores a client CSV chunk by chunk and writes predictions incrementally to output_path.
+
+    Each output row holds the input columns plus 'Predicted Risk' and 'probability_of_leaving'.
+    The output is written to a temporary file and renamed into place when complete.
+
+    Args:
+        input_path (str or file-like): CSV with the raw client columns.
+        output_path (str): Destination CSV.
+        chunksize (int): Number of rows scored at a time.
+        model (sklearn model): Model to use instead of the deployed one (by default the
+            exported NumPy model when current, see numpy_model.load_scoring_model).
+        encoder (FeatureEncoder): Encoder to use instead of the deployed one.
+        score_cache (score_cache.ScoreCache): Reuse cached probabilities of unchanged clients and
+            save the new ones once the last chunk is scored. Only used with the deployed model and encoder.
+        top_k (int): Also collect the top_k highest-risk clients while scoring (see topk.TopKAccumulator).
+        rank_by (str): Ranking of the top_k clients, 'probability' or 'expected_revenue_loss'.
+
+    Returns:
+        dict: rows, seconds and rows_per_sec, plus high_risk (a DataFrame) when top_k is given.
+    """
+    # Model and encoder come from the same release even if a deployment lands meanwhile
+    release = release_dir()
+    version = None
+    if score_cache is not None and model is None and encoder is None:
+        from score_cache import model_version
+        version = model_version(release)
+    if model is None:
+        model = load_scoring_model(release)
+    if encoder is None:
+        encoder = load_deployed_encoder(model, release)
+
+    accumulator = TopKAccumulator(top_k, rank_by) if top_k else None
+    tmp_path = f"{output_path}.part"
+    rows = 0
+    starttime = time.perf_counter()
+    with open(tmp_path, 'w', newline='') as out_file:
+        for i, chunk in enumerate(iter_clients(input_path, chunksize=chunksize)):
+            if version is not None:
+                y_prob = score_cache.predict_proba(chunk, model, encoder, version)
+            else:
+                y_prob = model.predict_proba(encoder.transform_frame(chunk))
+            chunk['Predicted Risk'] = model.classes_.take(y_prob.argmax(axis=1))
+            chunk['probability_of_leaving'] = y_prob[:, 1]
+            if accumulator is not None:
+                accumulator.update(y_prob[:, 1], chunk['Client_ID'], chunk[REVENUE_COLUMN])
+            chunk.to_csv(out_file, header=(i == 0), index=False)
+            rows += len(chunk)
+    os.replace(tmp_path, output_path)
+    if version is not None:
+        # One merge per run: saving per chunk would rewrite the whole cache file every chunk
+        score_cache.save()
+
+    seconds = time.perf_counter() - starttime
+    rows_per_sec = rows / seconds if seconds > 0 else float('inf')
+    logging.info(f"Scored {rows} rows in {seconds:.2f} sec ({rows_per_sec:,.0f} rows/sec)")
+    result = {'rows': rows, 'seconds': seconds, 'rows_per_sec': rows_per_sec}
+    if accumulator is not None:
+        result['high_risk'] = accumulator.result()
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Score a client CSV in fixed-size chunks.")
+    parser.add_argument('input_path', help="CSV file with client rows")
+    parser.add_argument('output_path', help="Where to write the predictions CSV")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="Rows per chunk")
+    parser.add_argument('--top-k', type=int, help="Also print the TOP_K highest-risk clients")
+    parser.add_argument('--rank-by', choices=RANK_BY, default='probability', help="Ranking of the top-k list")
+    args = parser.parse_args()
+
+    logging.info("Running batch_scoring.py")
+    result = score_csv(args.input_path, args.output_path, args.chunksize, top_k=args.top_k, rank_by=args.rank_by)
+    if 'high_risk' in result:
+        print(result['high_risk'].to_string(index=False))
@@ -0,0 +1,350 @@
+"""
+In-process benchmark suite for the attrition pipeline.
+
+Every case runs inside this process on synthetic clients (see synthetic.py), in a
+temporary directory, so neither interpreter start-up nor the real artifacts are
+involved: ingestion (CSV -> columnar store), encoding, training, single-row and
+batch prediction, and PDF report generation. Cold-start import time of the
+entry points is measured separately, in fresh interpreters with -X importtime.
+Each case is repeated and reported as latency percentiles, throughput and the
+peak RSS seen while it ran. Results are written as JSON and can be compared
+against a stored baseline.
+
+Usage:
+    python benchmarks.py --sizes 10000 100000 1000000 --output results.json
+    python benchmarks.py --save-baseline           # store this run as the baseline
+    python benchmarks.py --compare                 # exit status 1 if a case regressed
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import logging
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import sklearn
+
+from config import MODEL_PATH
+from batch_scoring import score_csv
+from client_data import INGEST_SCHEMA, read_clients
+from data_store import read_store, write_store
+from encoding import FeatureEncoder
+from synthetic import make_clients
+from training import fit_model
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+BASELINE_PATH = os.path.join(MODEL_PATH, 'benchmark_baseline.json')
+DEFAULT_SIZES = (10_000, 100_000)
+REGRESSION_TOLERANCE = 0.20  # Flag cases whose median is more than 20% slower than the baseline
+NOISE_FLOOR_SECONDS = 0.005  # ...and more than 5 ms slower, so tiny cases do not flap
+# Entry points whose cold-start import time is measured
+IMPORT_MODULES = ('config', 'numpy_model', 'batch_scoring', 'scoring', 'diagnostics', 'reporting', 'service')
+
+
+class PeakRss:
+    """
+    Samples the process RSS from a background thread and keeps the peak seen.
+
+    Falls back to the lifetime maximum from getrusage where /proc is not available.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+    def _rss_bytes(self):
+        try:
+            with open('/proc/self/statm') as statm:
+                return int(statm.read().split()[1]) * self._page_size
+        except OSError:
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_bytes = max(self.peak_bytes, self._rss_bytes())
+
+    def __enter__(self):
+        self.peak_bytes = self._rss_bytes()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, self._rss_bytes())
+
+    @property
+    def peak_mb(self):
+        return self.peak_bytes / 2**20
+
+
+def summarize(seconds):
+    """
+    Returns p50/p95/p99/mean/min/max of a list of timings.
+    """
+    seconds = np.asarray(seconds, dtype=np.float64)
+    p50, p95, p99 = np.percentile(seconds, [50, 95, 99])
+    return {
+        'p50': float(p50), 'p95': float(p95), 'p99': float(p99),
+        'mean': float(seconds.mean()), 'min': float(seconds.min()), 'max': float(seconds.max()),
+    }
+
+
+def run_case(name, fn, rows, repeats):
+    """
+    Calls fn() repeats times and returns its result record.
+
+    Args:
+        name (str): Case name.
+        fn (callable): Work to time; called without arguments.
+        rows (int): Rows processed by one call, for throughput.
+        repeats (int): Number of timed calls.
+
+    Returns:
+        dict: name, rows, repeats, seconds percentiles, rows_per_sec (at the median) and peak_rss_mb.
+    """
+    timings = []
+    with PeakRss() as rss:
+        for _ in range(repeats):
+            starttime = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - starttime)
+    seconds = summarize(timings)
+    result = {
+        'name': name,
+        'rows': rows,
+        'repeats': repeats,
+        'seconds': seconds,
+        'rows_per_sec': rows / seconds['p50'] if seconds['p50'] > 0 else float('inf'),
+        'peak_rss_mb': round(rss.peak_mb, 1),
+    }
+    logging.info(f"{name} [{rows} rows]: p50 {seconds['p50']:.4f} sec, p95 {seconds['p95']:.4f} sec, "
+                 f"{result['rows_per_sec']:,.0f} rows/sec, peak RSS {result['peak_rss_mb']} MB")
+    return result
+
+
+def benchmark_size(n_rows, work_dir, repeats=5, single_row_calls=200, seed=0):
+    """
+    Runs the ingestion, encoding, training and prediction cases on n_rows synthetic clients.
+
+    Returns:
+        list[dict]: One result record per case.
+    """
+    df = make_clients(n_rows, seed=seed)
+    source_csv = os.path.join(work_dir, f"clients_{n_rows}.csv")
+    predictions_csv = os.path.join(work_dir, f"predictions_{n_rows}.csv")
+    store_dir = os.path.join(work_dir, f"store_{n_rows}")
+    df.to_csv(source_csv, index=False)
+
+    results = [
+        run_case('ingestion', lambda: write_store(read_clients(source_csv, schema=INGEST_SCHEMA), store_dir=store_dir), n_rows, repeats),
+        run_case('encoding', lambda: FeatureEncoder.fit(df).transform(df), n_rows, repeats),
+    ]
+
+    fitted = {}
+
+    def train():
+        fitted['model'], fitted['encoder'] = fit_model(read_store(store_dir=store_dir))
+
+    results.append(run_case('training', train, n_rows, repeats))
+    model, encoder = fitted['model'], fitted['encoder']
+
+    # One call per request, on a different row each time
+    row_ids = iter(np.random.default_rng(seed).integers(0, n_rows, size=single_row_calls))
+    results.append(run_case(
+        'predict_single',
+        lambda: model.predict_proba(encoder.transform_frame(df.iloc[[next(row_ids)]])),
+        1, single_row_calls))
+    results.append(run_case(
+        'predict_batch',
+        lambda: score_csv(source_csv, predictions_csv, model=model, encoder=encoder),
+        n_rows, repeats))
+
+    for path in (source_csv, predictions_csv):
+        os.remove(path)
+    shutil.rmtree(store_dir, ignore_errors=True)
+    for result in results:
+        result['dataset_rows'] = n_rows
+    return results
+
+
+def benchmark_report(work_dir, repeats=3):
+    """
+    Times the reporting.py run (confusion matrix plot and PDF report) against the deployed
+    model. The image, PDF, section cache and score cache all go to work_dir, so no report
+    artifact in MODEL_PATH is touched.
+
+    Returns:
+        dict: The case record, or a record with 'error' if the report cannot be built here.
+    """
+    try:
+        import reporting
+        pdf_path = os.path.join(work_dir, 'summary_report.pdf')
+        confusion_png = os.path.join(work_dir, 'confusionmatrix.png')
+        cache_dir = os.path.join(work_dir, 'report_cache')
+        score_cache_path = os.path.join(work_dir, 'score_cache.parquet')
+
+        def report():
+            reporting.plot_confusion_matrix(confusion_png, score_cache_path)
+            reporting.generate_pdf_report(pdf_path=pdf_path, cache_dir=cache_dir, score_cache_path=score_cache_path)
+
+        return run_case('report', report, 1, repeats)
+    except Exception as e:
+        logging.error(f"Report benchmark failed: {e}")
+        return {'name': 'report', 'error': str(e)}
+
+
+def import_time(module, repeats=3):
+    """
+    Measures the cold-start cost of importing module in a fresh interpreter with -X importtime.
+
+    Returns:
+        dict: The case record: seconds are the module's cumulative import time, wall_seconds
+        the whole interpreter run (start-up plus import).
+    """
+    import_seconds, wall_seconds = [], []
+    for _ in range(repeats):
+        starttime = time.perf_counter()
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                                   capture_output=True, text=True, check=True)
+        wall_seconds.append(time.perf_counter() - starttime)
+        # Lines look like "import time:   self [us] | cumulative | package"; top-level imports are unindented
+        for line in completed.stderr.splitlines():
+            fields = line.split('|')
+            if len(fields) == 3 and fields[2].rstrip() == f" {module}":
+                import_seconds.append(int(fields[1]) / 1e6)
+    seconds = summarize(import_seconds)
+    logging.info(f"import {module}: p50 {seconds['p50']:.3f} sec import, "
+                 f"{summarize(wall_seconds)['p50']:.3f} sec interpreter run")
+    return {
+        'name': f"import:{module}",
+        'rows': 0,
+        'repeats': repeats,
+        'seconds': seconds,
+        'wall_seconds': summarize(wall_seconds),
+    }
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeats=5, single_row_calls=200, include_report=True,
+                   include_imports=True, seed=0):
+    """
+    Runs the whole suite.
+
+    Returns:
+        dict: 'meta' (environment and settings) and 'results' (one record per case and size).
+    """
+    results = []
+    if include_imports:
+        for module in IMPORT_MODULES:
+            try:
+                results.append(import_time(module))
+            except subprocess.CalledProcessError as e:
+                logging.error(f"Importing {module} failed: {e.stderr.strip().splitlines()[-1]}")
+                results.append({'name': f"import:{module}", 'error': e.stderr.strip().splitlines()[-1]})
+    work_dir = tempfile.mkdtemp(prefix='attrition-bench-')
+    try:
+        for n_rows in sizes:
+            logging.info(f"Benchmarking {n_rows} rows")
+            results.extend(benchmark_size(n_rows, work_dir, repeats, single_row_calls, seed))
+        if include_report:
+            results.append(benchmark_report(work_dir))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'sklearn': sklearn.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'sizes': list(sizes),
+            'repeats': repeats,
+            'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        },
+        'results': results,
+    }
+
+
+def compare_to_baseline(report, baseline, tolerance=REGRESSION_TOLERANCE, noise_floor=NOISE_FLOOR_SECONDS):
+    """
+    Compares median timings with a baseline run, case by case (same name and dataset size).
+
+    Returns:
+        list[dict]: Regressed cases with name, rows, baseline_p50, p50 and ratio.
+    """
+    base = {(r['name'], r.get('dataset_rows')): r for r in baseline['results'] if 'seconds' in r}
+    regressions = []
+    for result in report['results']:
+        reference = base.get((result['name'], result.get('dataset_rows')))
+        if reference is None or 'seconds' not in result:
+            continue
+        p50, base_p50 = result['seconds']['p50'], reference['seconds']['p50']
+        if p50 > base_p50 * (1 + tolerance) and p50 - base_p50 > noise_floor:
+            regressions.append({
+                'name': result['name'], 'rows': result.get('dataset_rows'),
+                'baseline_p50': base_p50, 'p50': p50, 'ratio': p50 / base_p50,
+            })
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the in-process benchmark suite.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help="Synthetic row counts")
+    parser.add_argument('--repeats', type=int, default=5, help="Timed calls per case")
+    parser.add_argument('--single-row-calls', type=int, default=200, help="Calls of the single-row case")
+    parser.add_argument('--no-report', action='store_true', help="Skip the PDF report case")
+    parser.add_argument('--no-imports', action='store_true', help="Skip the import-time cases")
+    parser.add_argument('--output', help="Write the results JSON here instead of stdout")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="Baseline results JSON")
+    parser.add_argument('--save-baseline', action='store_true', help="Store this run as the baseline")
+    parser.add_argument('--compare', action='store_true', help="Flag regressions against the baseline")
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE, help="Allowed slowdown (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    logging.info("Running benchmarks.py")
+    report = run_benchmarks(args.sizes, args.repeats, args.single_row_calls, not args.no_report, not args.no_imports)
+
+    regressions = []
+    if args.compare:
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                regressions = compare_to_baseline(report, json.load(f), args.tolerance)
+            report['regressions'] = regressions
+            for regression in regressions:
+                logging.warning(f"Regression in {regression['name']} [{regression['rows']} rows]: "
+                                f"p50 {regression['baseline_p50']:.4f} -> {regression['p50']:.4f} sec "
+                                f"({regression['ratio']:.2f}x)")
+        else:
+            logging.warning(f"No baseline at {args.baseline}; nothing to compare")
+
+    output = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            f.write(output)
+        logging.info(f"Baseline saved to {args.baseline}")
+
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,432 @@
+"""
+On-disk Client_ID index for single-client lookups.
+
+Ingestion writes DATA_PATH/client_index, a directory of NumPy files that are
+memory-mapped by readers:
+
+    rows.npy     every client as one fixed-width record, in store order
+    keys.npy     the Client_IDs as sorted 16-byte keys
+    offsets.npy  for each sorted key, the offset of its record in rows.npy
+    meta.json    category tables of the coded columns and the row count
+
+A lookup is a binary search in keys.npy and a read of one record, so it
+touches a few pages regardless of the number of clients. Incremental ingests
+append their clients with append_to_index, which sorts only the new keys and
+merges them into keys.npy instead of re-reading the store.
+
+Usage:
+    python client_index.py                         # (re)build the index from the columnar store
+    python client_index.py --lookup CLIENT_ID      # look up and score one client
+    python client_index.py --benchmark 50000000    # time lookups in a synthetic index of that many clients
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import functools
+import logging
+import numpy as np
+import pandas as pd
+
+from config import DATA_PATH
+from client_data import CLIENT_SCHEMA, UUID_DTYPE, uuid_to_bytes
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+INDEX_DIR = os.path.join(DATA_PATH, 'client_index')
+KEY_COLUMN = 'Client_ID'
+CODED_COLUMNS = ('Gender', 'Attrition_Risk')
+
+
+def _row_dtype(columns, float_columns=('Monthly_Spend', 'Revenue_Loss')):
+    # Coded columns are int8 category codes (-1 = missing), counts are float32 (exact for
+    # integers below 2**24, with NaN for missing) and amounts keep float64
+    fields = []
+    for col in columns:
+        if col == KEY_COLUMN:
+            continue
+        if col in CODED_COLUMNS:
+            fields.append((col, np.int8))
+        elif col in float_columns:
+            fields.append((col, np.float64))
+        else:
+            fields.append((col, np.float32))
+    return np.dtype(fields)
+
+
+def _sort_order(keys):
+    # Sorting the two big-endian halves as integers orders the keys exactly like a bytewise
+    # comparison (which searchsorted uses), but much faster than sorting 16-byte strings
+    halves = keys.view('>u8').reshape(-1, 2)
+    return np.lexsort((halves[:, 1], halves[:, 0]))
+
+
+def _write_records(rows, start, frame, categories):
+    # Fills rows[start:start + len(frame)] from raw client rows; returns the end position
+    end = start + len(frame)
+    for col in rows.dtype.names:
+        if col in CODED_COLUMNS:
+            rows[col][start:end] = pd.Categorical(frame[col], categories=categories[col]).codes
+        else:
+            rows[col][start:end] = frame[col].to_numpy(dtype=np.float64, na_value=np.nan)
+    return end
+
+
+def _offset_dtype(n_rows):
+    return np.int64 if n_rows >= 2**31 else np.int32
+
+
+def _save_index(new_dir, index_dir, keys, offsets, meta):
+    # Completes the index built in new_dir and swaps it with index_dir
+    np.save(os.path.join(new_dir, 'keys.npy'), keys)
+    np.save(os.path.join(new_dir, 'offsets.npy'), offsets)
+    with open(os.path.join(new_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+    # Build the new index beside the old one and swap directories
+    old_dir = f"{index_dir}.old"
+    if os.path.exists(index_dir):
+        os.replace(index_dir, old_dir)
+    os.replace(new_dir, index_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def write_index(frames, n_rows, columns, categories, index_dir=INDEX_DIR):
+    """
+    Writes an index from an iterable of client DataFrames holding n_rows rows in total.
+
+    Args:
+        frames (iterable[pandas.DataFrame]): Client rows in store order.
+        n_rows (int): Total number of rows in frames.
+        columns (list[str]): Column names (Client_ID plus the record fields).
+        categories (dict): Coded column -> list of categories.
+        index_dir (str): Destination directory; replaced atomically.
+
+    Returns:
+        str: index_dir
+    """
+    row_dtype = _row_dtype(columns)
+    integer_columns = [col for col in row_dtype.names if CLIENT_SCHEMA.get(col, '').startswith('int')]
+    new_dir = f"{index_dir}.new"
+    shutil.rmtree(new_dir, ignore_errors=True)
+    os.makedirs(new_dir)
+
+    rows = np.lib.format.open_memmap(os.path.join(new_dir, 'rows.npy'), mode='w+', dtype=row_dtype, shape=(n_rows,))
+    keys = np.empty(n_rows, dtype=UUID_DTYPE)
+    start = 0
+    for frame in frames:
+        keys[start:start + len(frame)] = uuid_to_bytes(frame[KEY_COLUMN])
+        start = _write_records(rows, start, frame, categories)
+    if start != n_rows:
+        raise ValueError(f"Expected {n_rows} rows, got {start}")
+    rows.flush()
+    del rows
+
+    order = _sort_order(keys)
+    _save_index(new_dir, index_dir, keys[order], order.astype(_offset_dtype(n_rows)),
+                {'rows': n_rows, 'columns': list(row_dtype.names), 'categories': categories,
+                 'integer_columns': integer_columns})
+    return index_dir
+
+
+def append_to_index(df, index_dir=INDEX_DIR, block_rows=1_000_000):
+    """
+    Adds clients just appended to the columnar store to an existing index.
+
+    Only the new keys are sorted; they are merged into the sorted keys and offsets with
+    np.searchsorted, and their records are written after the existing ones, so the store
+    is not read again. The result is written beside the old index and swapped in atomically.
+
+    Args:
+        df (pandas.DataFrame): The appended client rows, in store order, none of them indexed yet.
+        index_dir (str): Index to extend.
+        block_rows (int): Existing records copied at a time.
+
+    Returns:
+        str: index_dir
+    """
+    index = ClientIndex(index_dir)
+    row_dtype = index.rows.dtype
+    missing = [col for col in (KEY_COLUMN,) + row_dtype.names if col not in df.columns]
+    if missing:
+        raise ValueError(f"Rows lack the indexed columns {missing}")
+    # New categories go last, so the codes already written keep their meaning
+    categories = {}
+    for col, known in index.meta['categories'].items():
+        added = set(df[col].dropna().unique().tolist()) - set(known)
+        categories[col] = known + sorted(added)
+
+    new_keys = uuid_to_bytes(df[KEY_COLUMN])
+    order = _sort_order(new_keys)
+    new_keys = new_keys[order]
+    if (new_keys[1:] == new_keys[:-1]).any():
+        raise ValueError("Duplicate Client_IDs in the appended rows")
+    already = index.find_keys(new_keys) >= 0
+    if already.any():
+        raise ValueError(f"{int(already.sum())} Client_IDs are already indexed")
+
+    starttime = time.perf_counter()
+    n_old = len(index.rows)
+    n_rows = n_old + len(df)
+    new_dir = f"{index_dir}.new"
+    shutil.rmtree(new_dir, ignore_errors=True)
+    os.makedirs(new_dir)
+    rows = np.lib.format.open_memmap(os.path.join(new_dir, 'rows.npy'), mode='w+', dtype=row_dtype, shape=(n_rows,))
+    for start in range(0, n_old, block_rows):
+        stop = min(start + block_rows, n_old)
+        rows[start:stop] = index.rows[start:stop]
+    _write_records(rows, n_old, df, categories)
+    rows.flush()
+    del rows
+
+    offset_dtype = _offset_dtype(n_rows)
+    pos = np.searchsorted(index.keys, new_keys)
+    keys = np.insert(index.keys, pos, new_keys)
+    offsets = np.insert(index.offsets.astype(offset_dtype), pos, (n_old + order).astype(offset_dtype))
+    meta = dict(index.meta, rows=n_rows, categories=categories)
+    del index
+    _save_index(new_dir, index_dir, keys, offsets, meta)
+    logging.info(f"Indexed {len(df):,} new clients ({n_rows:,} in total) in {time.perf_counter() - starttime:.1f} sec")
+    return index_dir
+
+
+def build_index(index_dir=INDEX_DIR, batch_size=1_000_000):
+    """
+    Rebuilds the index from the columnar store in one streaming pass.
+
+    Returns:
+        str: index_dir, or None if there is no data to index.
+    """
+    from data_store import iter_store, read_store, store_columns, store_exists, store_statistics
+
+    if not store_exists():
+        logging.error("No columnar store to index. Run ingestion.py first.")
+        return None
+    columns = store_columns()
+    coded = [col for col in CODED_COLUMNS if col in columns]
+    category_frame = read_store(columns=coded)
+    categories = {col: sorted(category_frame[col].dropna().unique().tolist()) for col in coded}
+    del category_frame
+
+    starttime = time.perf_counter()
+    n_rows = store_statistics()['num_rows']
+    write_index(iter_store(batch_size=batch_size), n_rows, columns, categories, index_dir)
+    logging.info(f"Indexed {n_rows:,} clients in {time.perf_counter() - starttime:.1f} sec")
+    return index_dir
+
+
+class ClientIndex:
+    """
+    Read-only, memory-mapped view of an index directory.
+    """
+
+    def __init__(self, index_dir=INDEX_DIR):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.keys = np.load(os.path.join(index_dir, 'keys.npy'), mmap_mode='r')
+        self.offsets = np.load(os.path.join(index_dir, 'offsets.npy'), mmap_mode='r')
+        self.rows = np.load(os.path.join(index_dir, 'rows.npy'), mmap_mode='r')
+
+    def __len__(self):
+        return len(self.keys)
+
+    def find(self, client_ids):
+        """
+        Returns the record offset of each Client_ID, -1 where it is not indexed.
+        """
+        client_ids = np.atleast_1d(client_ids)
+        try:
+            keys = _to_keys(client_ids)
+        except ValueError:
+            return np.full(len(client_ids), -1, dtype=np.int64)
+        return self.find_keys(keys)
+
+    def find_keys(self, keys):
+        """
+        Returns the record offset of each 16-byte key (see client_data.uuid_to_bytes), -1 where
+        it is not indexed.
+        """
+        if len(self.keys) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        pos = np.searchsorted(self.keys, keys)
+        found = pos < len(self.keys)
+        found[found] = self.keys[pos[found]] == keys[found]
+        return np.where(found, self.offsets[np.minimum(pos, len(self.keys) - 1)], -1)
+
+    def get_frame(self, client_ids):
+        """
+        Returns the raw rows of the indexed clients among client_ids (unknown ids are skipped).
+
+        Returns:
+            pandas.DataFrame: Client_ID plus the record columns, coded columns as categoricals
+            and integer columns as nullable Int64.
+        """
+        client_ids = np.atleast_1d(client_ids)
+        offsets = self.find(client_ids)
+        hit = offsets >= 0
+        records = self.rows[offsets[hit]]
+        frame = {KEY_COLUMN: client_ids[hit]}
+        for col in self.rows.dtype.names:
+            values = np.asarray(records[col])
+            if col in self.meta['categories']:
+                frame[col] = pd.Categorical.from_codes(values, self.meta['categories'][col])
+            elif col in self.meta['integer_columns']:
+                frame[col] = pd.array(values, dtype='Int64')
+            else:
+                frame[col] = values
+        return pd.DataFrame(frame)
+
+    def get(self, client_id):
+        """
+        Returns one client's raw row as a dict (missing values as None), or None if the
+        Client_ID is not indexed.
+
+        Reads a single record and builds no DataFrame, which keeps a lookup well below a millisecond.
+        """
+        offset = self.find(client_id)[0]
+        if offset < 0:
+            return None
+        record = self.rows[offset]
+        row = {KEY_COLUMN: client_id}
+        for col in self.rows.dtype.names:
+            value = record[col].item()
+            if col in self.meta['categories']:
+                value = self.meta['categories'][col][value] if value >= 0 else None
+            elif value != value:
+                value = None
+            elif col in self.meta['integer_columns']:
+                value = int(value)
+            row[col] = value
+        return row
+
+
+def _to_keys(client_ids):
+    # A handful of ids is faster to parse one by one than through pandas string methods
+    if len(client_ids) > 64:
+        return uuid_to_bytes(client_ids)
+    keys = [bytes.fromhex(str(client_id).replace('-', '')) for client_id in client_ids]
+    if any(len(key) != UUID_DTYPE.itemsize for key in keys):
+        raise ValueError("Client_ID values must be UUIDs (32 hex digits)")
+    return np.array(keys, dtype=UUID_DTYPE)
+
+
+@functools.lru_cache(maxsize=4)
+def _open_index(index_dir, stat_key):
+    return ClientIndex(index_dir)
+
+
+def open_index(index_dir=INDEX_DIR):
+    """
+    Returns the ClientIndex of index_dir, reopened only after the index has been rebuilt.
+    """
+    stat = os.stat(os.path.join(index_dir, 'meta.json'))
+    return _open_index(index_dir, (stat.st_ino, stat.st_mtime_ns))
+
+
+def lookup_client(client_id, index=None):
+    """
+    Looks up one client and scores it with the deployed model.
+
+    Args:
+        client_id (str): The Client_ID.
+        index (ClientIndex): Index to use. Defaults to the one built at ingestion.
+
+    Returns:
+        dict: The client's raw fields plus predicted_class, probability_of_leaving and
+        probabilities, or None if the Client_ID is not indexed.
+    """
+    from numpy_model import NumpyModel, load_scoring_model
+    from model_registry import load_deployed_encoder, release_dir
+
+    if index is None:
+        index = open_index()
+    result = index.get(client_id)
+    if result is None:
+        return None
+
+    release = release_dir()
+    model = load_scoring_model(release)
+    encoder = load_deployed_encoder(model, release)
+    # One record is encoded straight into a feature row; a one-row DataFrame would cost more than the rest
+    X = encoder.transform_record(result)
+    if not isinstance(model, NumpyModel):
+        X = pd.DataFrame(X, columns=encoder.feature_names_, copy=False)
+    y_prob = model.predict_proba(X)[0]
+    classes = [c.item() if isinstance(c, np.generic) else c for c in model.classes_]
+
+    result.update({
+        'predicted_class': classes[int(y_prob.argmax())],
+        'probability_of_leaving': float(y_prob[1]),
+        'probabilities': {str(c): float(p) for c, p in zip(classes, y_prob)},
+    })
+    return result
+
+
+def benchmark_lookups(n_rows, n_lookups=10_000, chunksize=1_000_000, seed=0):
+    """
+    Builds a synthetic index of n_rows clients in a temporary directory and times lookups.
+
+    Each lookup is timed end to end through lookup_client (index read, encoding and scoring
+    with the deployed model); the index read alone (ClientIndex.get) is reported as well.
+
+    Returns:
+        dict: rows, build seconds and the mean/p99 latency in ms of lookup_client and of index.get.
+    """
+    import tempfile
+    from synthetic import make_clients
+
+    rng = np.random.default_rng(seed)
+    sample = make_clients(10_000, seed=seed)
+    categories = {col: sorted(sample[col].dropna().unique().tolist()) for col in CODED_COLUMNS}
+    n_chunks = -(-n_rows // chunksize)
+    per_chunk = -(-n_lookups // n_chunks)
+    probe_ids = []
+
+    def frames():
+        for i, start in enumerate(range(0, n_rows, chunksize)):
+            frame = make_clients(min(chunksize, n_rows - start), seed=[seed, i])
+            probe_ids.extend(frame[KEY_COLUMN].to_numpy()[rng.integers(0, len(frame), per_chunk)])
+            yield frame
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        index_dir = os.path.join(work_dir, 'client_index')
+        starttime = time.perf_counter()
+        write_index(frames(), n_rows, list(sample.columns), categories, index_dir)
+        build_seconds = time.perf_counter() - starttime
+
+        index = ClientIndex(index_dir)
+        probe_ids = probe_ids[:n_lookups]
+        lookup_client(probe_ids[0], index)  # Loads the model and encoder once
+        result = {'rows': n_rows, 'build_seconds': build_seconds, 'lookups': len(probe_ids)}
+        for name, lookup in (('lookup_client', lambda client_id: lookup_client(client_id, index)),
+                             ('index_get', index.get)):
+            latencies = []
+            for client_id in probe_ids:
+                starttime = time.perf_counter()
+                lookup(client_id)
+                latencies.append(time.perf_counter() - starttime)
+            latencies = np.array(latencies)
+            result[f"{name}_mean_ms"] = float(latencies.mean() * 1000)
+            result[f"{name}_p99_ms"] = float(np.percentile(latencies, 99) * 1000)
+    logging.info(f"Lookup and scoring in {n_rows:,} clients: mean {result['lookup_client_mean_ms']:.3f} ms, "
+                 f"p99 {result['lookup_client_p99_ms']:.3f} ms")
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build or query the on-disk Client_ID index.")
+    parser.add_argument('--lookup', metavar='CLIENT_ID', help="Look up and score one client")
+    parser.add_argument('--benchmark', type=int, metavar='ROWS', help="Time lookups in a synthetic index")
+    args = parser.parse_args()
+
+    logging.info("Running client_index.py")
+    if args.lookup:
+        print(json.dumps(lookup_client(args.lookup), indent=4))
+    elif args.benchmark:
+        print(json.dumps(benchmark_lookups(args.benchmark), indent=4))
+    else:
+        build_index()
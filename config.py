@@ -0,0 +1,36 @@
+"""
+Project paths, read from config.json once per process.
+
+config.json is looked up in the working directory first (where the scripts are
+run from), then next to this file. Its paths are relative to the parent of the
+repository directory.
+"""
+
+import os
+import json
+import functools
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+CONFIG_FILE = 'config.json'
+
+
+@functools.lru_cache(maxsize=None)
+def load_config(path=None):
+    """
+    Returns the parsed config.json (cached, so the file is read only once).
+    """
+    if path is None:
+        path = CONFIG_FILE
+        if not os.path.exists(path):
+            path = os.path.join(os.path.dirname(os.path.abspath(__file__)), CONFIG_FILE)
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+CONFIG = load_config()
+
+INPUT_FOLDER_PATH = os.path.join(BASE_DIR, CONFIG['input_folder_path'])
+DATA_PATH = os.path.join(BASE_DIR, CONFIG['output_folder_path'])
+TEST_DATA_PATH = os.path.join(BASE_DIR, CONFIG['test_data_path'])
+MODEL_PATH = os.path.join(BASE_DIR, CONFIG['output_model_path'])
+PROD_DEPLOYMENT_PATH = os.path.join(BASE_DIR, CONFIG['prod_deployment_path'])
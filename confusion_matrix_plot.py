@@ -0,0 +1,261 @@
+"""
+Fast confusion-matrix rendering with plain matplotlib.
+
+Produces the same layout as pretty_confusion_matrix (counts and share of the
+total in every cell, a totals row and column with the percentage right and
+wrong, a green diagonal) but computes all totals and percentages in one NumPy
+pass and draws the cells as a single image on a fresh Agg figure, with no
+seaborn and no pyplot state. Many matrices can be rendered in one call,
+optionally across worker processes.
+
+Usage:
+    python confusion_matrix_plot.py    # time rendering of 2x2 up to 50x50 matrices
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+DIAGONAL_COLOR = (0.35, 0.8, 0.55, 1.0)
+TOTALS_COLOR = (0.27, 0.30, 0.27, 1.0)
+CORNER_COLOR = (0.17, 0.20, 0.17, 1.0)
+BENCHMARK_SIZES = (2, 5, 10, 20, 50)
+MAX_PERCENTAGE_CLASSES = 20
+
+
+def confusion_table(confusion):
+    """
+    Adds the totals row/column to a confusion matrix and computes every percentage at once.
+
+    Args:
+        confusion (array-like): n x n counts, rows = actual, columns = predicted.
+
+    Returns:
+        dict: counts ((n+1) x (n+1) with totals), share (% of all samples per cell),
+        correct and wrong (% right/wrong for the totals row and column; corner = accuracy).
+    """
+    confusion = np.asarray(confusion, dtype=np.int64)
+    n = len(confusion)
+    counts = np.zeros((n + 1, n + 1), dtype=np.int64)
+    counts[:n, :n] = confusion
+    counts[:n, n] = confusion.sum(axis=1)
+    counts[n, :n] = confusion.sum(axis=0)
+    counts[n, n] = confusion.sum()
+
+    total = max(counts[n, n], 1)
+    share = counts * (100.0 / total)
+
+    # Totals: row totals are right on the diagonal of their row, column totals on that of their column
+    right = np.zeros((n + 1, n + 1))
+    diagonal = np.diag(confusion)
+    right[:n, n] = diagonal
+    right[n, :n] = diagonal
+    right[n, n] = diagonal.sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correct = np.where(counts > 0, right * 100.0 / counts, 0.0)
+    wrong = np.where(counts > 0, 100.0 - correct, 0.0)
+    return {'counts': counts, 'share': share, 'correct': correct, 'wrong': wrong}
+
+
+def _cell_colors(table, cmap):
+    from matplotlib import colormaps
+
+    counts = table['counts']
+    n = len(counts) - 1
+    values = counts[:n, :n].astype(np.float64)
+    off_diagonal = ~np.eye(n, dtype=bool)
+    vmax = values[off_diagonal].max() if n > 1 and values[off_diagonal].max() > 0 else 1.0
+
+    colors = np.empty((n + 1, n + 1, 4))
+    colors[:n, :n] = colormaps[cmap](values / vmax)
+    colors[np.arange(n), np.arange(n)] = DIAGONAL_COLOR
+    colors[n, :] = TOTALS_COLOR
+    colors[:, n] = TOTALS_COLOR
+    colors[n, n] = CORNER_COLOR
+    return colors
+
+
+def render_confusion_matrix(confusion, labels=None, title="Confusion matrix", cmap='Oranges',
+                            figsize=None, pred_val_axis='lin', fontsize=None, percentages=None):
+    """
+    Draws a confusion matrix on a new Agg figure.
+
+    Args:
+        confusion (array-like): n x n counts, rows = actual, columns = predicted.
+        labels (list): Class names. Defaults to 0..n-1.
+        title (str): Axes title.
+        cmap (str): Colormap of the off-diagonal cells.
+        figsize (tuple): Figure size in inches. Defaults to one that grows with n.
+        pred_val_axis (str): 'lin'/'y' puts predictions on the y axis (as pretty_confusion_matrix
+            does by default), 'col'/'x' on the x axis.
+        fontsize (float): Cell text size. Defaults to one that fits the cell size.
+        percentages (bool): Show the share of the total under each count. Defaults to True up to
+            MAX_PERCENTAGE_CLASSES classes; above that only counts are drawn, which halves the text to render.
+
+    Returns:
+        tuple: (matplotlib.figure.Figure, Axes)
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    table = confusion_table(confusion)
+    n = len(table['counts']) - 1
+    labels = [str(label) for label in (labels if labels is not None else range(n))]
+
+    if pred_val_axis in ('col', 'x'):
+        xlabel, ylabel = 'Predicted', 'Actual'
+    else:
+        xlabel, ylabel = 'Actual', 'Predicted'
+        table = {name: values.T for name, values in table.items()}
+
+    if figsize is None:
+        side = min(max(6.0, 0.4 * (n + 1)), 20.0)
+        figsize = (side, side)
+    if fontsize is None:
+        cell_points = 72 * 0.86 * figsize[0] / (n + 1)
+        fontsize = max(3.0, min(11.0, cell_points / 4))
+    if percentages is None:
+        percentages = n <= MAX_PERCENTAGE_CLASSES
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.imshow(_cell_colors(table, cmap), interpolation='nearest', aspect='equal')
+
+    # Cell text, formatted for every cell in one pass
+    counts, share, correct, wrong = table['counts'], table['share'], table['correct'], table['wrong']
+    rows, cols = np.indices(counts.shape)
+    is_total = (rows == n) | (cols == n)
+    text_kw = dict(ha='center', va='center', fontsize=fontsize)
+    for r, c, count, pct in zip(rows[~is_total], cols[~is_total], counts[~is_total], share[~is_total]):
+        text = f"{count}\n{pct:.1f}%" if percentages else f"{count}"
+        ax.text(c, r, text, color='w' if r == c else 'r', **text_kw)
+    # Totals hold three lines, so they get a smaller font
+    text_kw['fontsize'] = fontsize * 0.8
+    offset = 0.3
+    for r, c, count, ok, err in zip(rows[is_total], cols[is_total], counts[is_total],
+                                    correct[is_total], wrong[is_total]):
+        ax.text(c, r - offset, f"{count}", color='w', fontweight='bold', **text_kw)
+        ax.text(c, r, '100%' if ok == 100 else f"{ok:.2f}%", color='g', fontweight='bold', **text_kw)
+        ax.text(c, r + offset, f"{err:.2f}%", color='r', fontweight='bold', **text_kw)
+
+    tick_labels = labels + ['Total']
+    ax.set_xticks(np.arange(n + 1))
+    ax.set_yticks(np.arange(n + 1))
+    ax.set_xticklabels(tick_labels, rotation=45, fontsize=min(10, fontsize + 2))
+    ax.set_yticklabels(tick_labels, rotation=25, fontsize=min(10, fontsize + 2))
+    ax.tick_params(length=0)
+    # White grid lines between cells
+    ax.set_xticks(np.arange(n + 2) - 0.5, minor=True)
+    ax.set_yticks(np.arange(n + 2) - 0.5, minor=True)
+    ax.grid(which='minor', color='w', linewidth=0.5)
+    ax.tick_params(which='minor', length=0)
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    # Fixed margins: tight_layout would lay out every cell text once more before the real draw
+    fig.subplots_adjust(left=0.1, right=0.98, bottom=0.1, top=0.95)
+    return fig, ax
+
+
+def save_confusion_matrix(confusion, path, labels=None, title="Confusion matrix", **kwargs):
+    """
+    Renders a confusion matrix and saves it to path (format from the extension).
+
+    Returns:
+        str: path
+    """
+    fig, _ = render_confusion_matrix(confusion, labels=labels, title=title, **kwargs)
+    fig.savefig(path)
+    return path
+
+
+def _save_item(item):
+    return save_confusion_matrix(**item)
+
+
+def render_batch(items, n_workers=1):
+    """
+    Renders many confusion matrices, e.g. one per model.
+
+    Args:
+        items (iterable[dict]): Keyword arguments of save_confusion_matrix (confusion, path, ...).
+        n_workers (int): Worker processes; 1 renders in this process.
+
+    Returns:
+        list[str]: Paths written, in input order.
+    """
+    items = list(items)
+    if n_workers <= 1 or len(items) <= 1:
+        return [_save_item(item) for item in items]
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        return list(executor.map(_save_item, items))
+
+
+def _legacy_render(confusion, path):
+    import pandas as pd
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from pretty_confusion_matrix import pretty_plot_confusion_matrix
+
+    n = len(confusion)
+    fig, _ = pretty_plot_confusion_matrix(pd.DataFrame(confusion, index=range(n), columns=range(n)),
+                                          cmap='Oranges', show_null_values=2, pred_val_axis='lin')
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def benchmark_rendering(sizes=BENCHMARK_SIZES, repeats=3, legacy=False, seed=0):
+    """
+    Times rendering plus PNG encoding of random n x n matrices for each n in sizes.
+
+    Returns:
+        list[dict]: n, seconds (best of repeats) and, with legacy=True, legacy_seconds for
+        pretty_confusion_matrix on the same matrix (legacy_error if it fails).
+    """
+    import tempfile
+
+    rng = np.random.default_rng(seed)
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'confusion.png')
+        for n in sizes:
+            confusion = rng.integers(0, 50, size=(n, n)) + np.diag(rng.integers(100, 500, size=n))
+            timings = []
+            for _ in range(repeats):
+                starttime = time.perf_counter()
+                save_confusion_matrix(confusion, path)
+                timings.append(time.perf_counter() - starttime)
+            result = {'n': n, 'seconds': min(timings)}
+            if legacy:
+                starttime = time.perf_counter()
+                try:
+                    _legacy_render(confusion, path)
+                    result['legacy_seconds'] = time.perf_counter() - starttime
+                except Exception as e:
+                    result['legacy_error'] = f"{type(e).__name__}: {e}"
+            logging.info(f"{n}x{n}: {result}")
+            results.append(result)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time confusion-matrix rendering for growing class counts.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(BENCHMARK_SIZES), help="Class counts")
+    parser.add_argument('--repeats', type=int, default=3, help="Timed renders per size")
+    parser.add_argument('--legacy', action='store_true', help="Also time pretty_confusion_matrix")
+    args = parser.parse_args()
+
+    logging.info("Running confusion_matrix_plot.py")
+    print(json.dumps(benchmark_rendering(args.sizes, args.repeats, args.legacy), indent=4))
@@ -0,0 +1,206 @@
+"""
+Typed columnar store for the ingested client data.
+
+Ingestion writes DATA_PATH/finaldata.parquet, a directory of Parquet part
+files with a fixed schema: categoricals for Gender/Attrition_Risk and
+fixed-width numerics. Parquet keeps per-column statistics (min, max, null
+count) in each file footer, so readers can answer simple questions without
+touching the data and otherwise load only the columns they need, memory-mapped.
+
+Trees that were ingested before the store existed fall back to finaldata.csv.
+"""
+
+import os
+import sys
+import glob
+import shutil
+import logging
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config import DATA_PATH
+from client_data import INGEST_SCHEMA, iter_clients, read_clients
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+STORE_DIR = os.path.join(DATA_PATH, 'finaldata.parquet')
+LEGACY_CSV = os.path.join(DATA_PATH, 'finaldata.csv')
+
+# Pandas dtypes the store is written with; columns not listed keep their inferred dtype
+STORE_DTYPES = {
+    'Client_ID': 'string',
+    'Age': 'Int16',
+    'Gender': 'category',
+    'Tenure_Years': 'Int16',
+    'Monthly_Spend': 'float64',
+    'Complaints': 'Int16',
+    'Overdue_Payments': 'Int16',
+    'Revenue_Loss': 'float64',
+    'Attrition_Risk': 'category',
+}
+
+
+def _to_pandas(table):
+    # Strings stay in Arrow memory instead of becoming one Python object per value
+    return table.to_pandas(ignore_metadata=True, types_mapper={pa.string(): pd.StringDtype('pyarrow')}.get)
+
+
+def _to_store_dtypes(df):
+    # Integer casts are checked by pandas: out-of-range values raise instead of wrapping
+    dtypes = {col: dtype for col, dtype in STORE_DTYPES.items() if col in df.columns}
+    return df.astype(dtypes)
+
+
+def store_exists(store_dir=STORE_DIR):
+    return bool(store_parts(store_dir))
+
+
+def store_parts(store_dir=STORE_DIR):
+    """
+    Returns the store's part files in write order.
+    """
+    return sorted(glob.glob(os.path.join(store_dir, 'part-*.parquet')))
+
+
+def write_store(df, mode='overwrite', store_dir=STORE_DIR):
+    """
+    Writes client rows to the columnar store.
+
+    Args:
+        df (pandas.DataFrame): Client rows.
+        mode (str): 'overwrite' replaces the whole store, 'append' adds a new part file.
+        store_dir (str): Store directory.
+
+    Returns:
+        str: Path of the part file written.
+    """
+    table = pa.Table.from_pandas(_to_store_dtypes(df), preserve_index=False)
+
+    if mode == 'append' and store_exists(store_dir):
+        part_path = os.path.join(store_dir, f"part-{len(store_parts(store_dir)):05d}.parquet")
+        tmp_path = f"{part_path}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, part_path)
+        return part_path
+
+    # Build the new store beside the old one and swap directories
+    new_dir = f"{store_dir}.new"
+    shutil.rmtree(new_dir, ignore_errors=True)
+    os.makedirs(new_dir)
+    pq.write_table(table, os.path.join(new_dir, 'part-00000.parquet'))
+    old_dir = f"{store_dir}.old"
+    if os.path.exists(store_dir):
+        os.replace(store_dir, old_dir)
+    os.replace(new_dir, store_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return os.path.join(store_dir, 'part-00000.parquet')
+
+
+def store_columns(store_dir=STORE_DIR):
+    """
+    Returns the column names of the store (or of finaldata.csv for legacy trees).
+    """
+    parts = store_parts(store_dir)
+    if parts:
+        return pq.read_schema(parts[0]).names
+    return list(pd.read_csv(LEGACY_CSV, nrows=0).columns)
+
+
+def read_store(columns=None, store_dir=STORE_DIR):
+    """
+    Loads the requested columns of the store into a DataFrame, memory-mapping each part.
+
+    Integer columns come back as numpy int16 (float64 if a part has nulls), dictionary
+    columns as pandas categoricals and strings as Arrow-backed pandas strings.
+
+    Args:
+        columns (list[str]): Columns to load. Defaults to all.
+        store_dir (str): Store directory.
+
+    Returns:
+        pandas.DataFrame
+    """
+    parts = store_parts(store_dir)
+    if not parts:
+        logging.info(f"No columnar store at {store_dir}; reading {LEGACY_CSV}")
+        return read_clients(LEGACY_CSV, columns=columns, schema=INGEST_SCHEMA)
+
+    tables = [pq.read_table(part, columns=columns, memory_map=True) for part in parts]
+    table = pa.concat_tables(tables).unify_dictionaries()
+    return _to_pandas(table)
+
+
+def iter_store(columns=None, batch_size=65536, store_dir=STORE_DIR):
+    """
+    Yields the store as DataFrames of at most batch_size rows, one part at a time.
+
+    Args:
+        columns (list[str]): Columns to load. Defaults to all.
+        batch_size (int): Maximum rows per DataFrame.
+        store_dir (str): Store directory.
+    """
+    for _, batch in iter_store_batches(columns=columns, batch_size=batch_size, store_dir=store_dir):
+        yield batch
+
+
+def iter_store_batches(columns=None, batch_size=65536, start=(0, 0), store_dir=STORE_DIR):
+    """
+    Like iter_store, but yields ((part_index, batch_index), DataFrame) and can resume at a position.
+
+    Parts before start are not opened; batches of the start part before its batch index
+    are read but not converted to pandas.
+
+    Args:
+        columns (list[str]): Columns to load. Defaults to all.
+        batch_size (int): Maximum rows per DataFrame.
+        start (tuple): (part_index, batch_index) of the first batch to yield.
+        store_dir (str): Store directory.
+    """
+    start_part, start_batch = start
+    parts = store_parts(store_dir)
+    if not parts:
+        # The legacy CSV counts as a single part
+        if start_part > 0:
+            return
+        chunks = iter_clients(LEGACY_CSV, chunksize=batch_size, columns=columns, schema=INGEST_SCHEMA)
+        for batch_index, chunk in enumerate(chunks):
+            if batch_index >= start_batch:
+                yield (0, batch_index), chunk
+        return
+
+    for part_index in range(start_part, len(parts)):
+        parquet_file = pq.ParquetFile(parts[part_index], memory_map=True)
+        batches = parquet_file.iter_batches(batch_size=batch_size, columns=columns)
+        for batch_index, batch in enumerate(batches):
+            if part_index == start_part and batch_index < start_batch:
+                continue
+            yield (part_index, batch_index), _to_pandas(batch)
+
+
+def store_statistics(store_dir=STORE_DIR):
+    """
+    Aggregates the per-column statistics stored in the Parquet footers, without reading any data.
+
+    Returns:
+        dict: num_rows and, per column, null_count plus min/max when the footer has them.
+    """
+    num_rows = 0
+    columns = {}
+    for part in store_parts(store_dir):
+        metadata = pq.ParquetFile(part).metadata
+        num_rows += metadata.num_rows
+        for rg in range(metadata.num_row_groups):
+            row_group = metadata.row_group(rg)
+            for i in range(row_group.num_columns):
+                chunk = row_group.column(i)
+                col_stats = columns.setdefault(chunk.path_in_schema, {'null_count': 0})
+                stats = chunk.statistics
+                if stats is None or not stats.has_null_count:
+                    col_stats['null_count'] = None
+                elif col_stats['null_count'] is not None:
+                    col_stats['null_count'] += stats.null_count
+                if stats is not None and stats.has_min_max:
+                    col_stats['min'] = stats.min if 'min' not in col_stats else min(col_stats['min'], stats.min)
+                    col_stats['max'] = stats.max if 'max' not in col_stats else max(col_stats['max'], stats.max)
+    return {'num_rows': num_rows, 'columns': columns}
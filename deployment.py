@@ -6,30 +6,111 @@ This script is used to deploy the trained model.
 
 import os
 import sys
+import json
+import time
+import pickle
 import shutil
+import hashlib
+import argparse
 import logging
 
 # Importing paths from the configuration file
 from config import INPUT_FOLDER_PATH, MODEL_PATH, PROD_DEPLOYMENT_PATH
+from client_data import INGEST_SCHEMA
+from encoding import ENCODER_FILE
+from model_registry import (RELEASES_DIR, CURRENT_LINK, HISTORY_FILE, MANIFEST_FILE, MODEL_FILE,
+                            current_version, release_history)
 
 logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 
+def _file_digest(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+def _atomic_symlink(target, link):
+    """
+    Points link at target with a single rename, so readers see either the old or the new target.
+    """
+    tmp = f"{link}.tmp-{os.getpid()}"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    os.symlink(target, tmp)
+    os.replace(tmp, link)
+
+def _record_event(event, version, previous):
+    entry = {'event': event, 'version': version, 'previous': previous,
+             'time': time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+    with open(HISTORY_FILE, 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+
+def _switch_current(version, event):
+    """
+    Makes version the live release and records the switch in the release history.
+
+    The top-level files in PROD_DEPLOYMENT_PATH become symlinks through `current`, so readers
+    that open e.g. trainedmodel.pkl directly follow the switch as well. Links to files the
+    release does not have (e.g. after rolling back to an older release) are removed.
+    """
+    previous = current_version()
+    _atomic_symlink(os.path.join(os.path.basename(RELEASES_DIR), version), CURRENT_LINK)
+    names = set(os.listdir(os.path.join(RELEASES_DIR, version))) - {MANIFEST_FILE}
+    for name in names:
+        _atomic_symlink(os.path.join(os.path.basename(CURRENT_LINK), name),
+                        os.path.join(PROD_DEPLOYMENT_PATH, name))
+    for name in os.listdir(PROD_DEPLOYMENT_PATH):
+        link = os.path.join(PROD_DEPLOYMENT_PATH, name)
+        if (name not in names and os.path.islink(link)
+                and os.readlink(link) == os.path.join(os.path.basename(CURRENT_LINK), name)):
+            os.remove(link)
+    _record_event(event, version, previous)
+    logging.info(f"Release {version} is live (previous: {previous})")
+
+def _feature_schema(model, encoder_file):
+    if os.path.exists(encoder_file):
+        with open(encoder_file, 'rb') as f:
+            encoder = pickle.load(f)
+        return {'features': list(encoder.feature_names_),
+                # dtype of each numeric column in the training data (None if it is not in the schema)
+                'numeric_columns': {col: INGEST_SCHEMA.get(col) for col in encoder.numeric_columns_},
+                'categories': {col: list(table) for col, table in encoder.category_tables_.items()}}
+    return {'features': [str(name) for name in getattr(model, 'feature_names_in_', [])]}
+
+def list_releases():
+    """
+    Returns the published release versions, oldest first.
+    """
+    if not os.path.isdir(RELEASES_DIR):
+        return []
+    return sorted(name for name in os.listdir(RELEASES_DIR)
+                  if not name.startswith('.') and os.path.isdir(os.path.join(RELEASES_DIR, name)))
+
 def deploy_model():
     """
-    Copies the latest model pickle file, the latestscore.txt file,
-    and the ingestedfiles.txt file into the production deployment directory.
+    Publishes the latest model pickle file, the latestscore.txt file and the ingestedfiles.txt file
+    as a new release of the production deployment.
+
+    The fitted feature encoder is deployed alongside the model when present, and the model is
+    also exported as a NumPy-only artifact (trainedmodel.npz). Everything is written to a staging
+    directory together with a manifest (file hashes, metrics, feature schema), which is renamed to
+    PROD_DEPLOYMENT_PATH/releases/<version> and made live by switching the `current` symlink.
+
+    Returns:
+        str: The new release version, or None if deployment was aborted.
     """
     logging.info("Deploying trained model to production")
     
     # Paths to the files being deployed
     ingested_files = os.path.join(INPUT_FOLDER_PATH, 'ingestedfiles.txt')
-    model_file = os.path.join(MODEL_PATH, 'trainedmodel.pkl')
+    model_file = os.path.join(MODEL_PATH, MODEL_FILE)
     score_file = os.path.join(MODEL_PATH, 'latestscore.txt')
 
     # List of required files and their paths
     required_files = {
         'ingestedfiles.txt': ingested_files,
-        'trainedmodel.pkl': model_file,
+        MODEL_FILE: model_file,
         'latestscore.txt': score_file
     }
 
@@ -38,15 +119,113 @@ def deploy_model():
 
     if missing_files:
         logging.error(f"One or more files are missing: {', '.join(missing_files)}. Deployment aborted.")
-        return
+        return None
+
+    optional_files = {name: os.path.join(MODEL_PATH, name) for name in (ENCODER_FILE, 'latestscore.json')}
+    deployed_files = dict(required_files)
+    deployed_files.update({name: path for name, path in optional_files.items() if os.path.exists(path)})
+
+    os.makedirs(RELEASES_DIR, exist_ok=True)
+    staging = os.path.join(RELEASES_DIR, f".staging-{os.getpid()}")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    try:
+        # Copy files to the staging directory
+        for name, path in deployed_files.items():
+            shutil.copy(path, os.path.join(staging, name))
+            logging.info(f"Copied {name} to the new release.")
+
+        # Export the NumPy-only artifact, so scoring processes that prefer it
+        # (numpy_model.load_scoring_model) can start without importing scikit-learn
+        from numpy_model import export_model, NUMPY_MODEL_FILE
+        with open(model_file, 'rb') as f:
+            model = pickle.load(f)
+        try:
+            export_model(model, os.path.join(staging, NUMPY_MODEL_FILE))
+        except TypeError as e:
+            logging.warning(f"Model not exported to NumPy: {e}")
+
+        files = {name: {'sha256': _file_digest(os.path.join(staging, name)),
+                        'size': os.path.getsize(os.path.join(staging, name))}
+                 for name in sorted(os.listdir(staging))}
+        metrics = None
+        if 'latestscore.json' in files:
+            with open(os.path.join(staging, 'latestscore.json')) as f:
+                metrics = json.load(f)
+            # latestscore.json may describe another model (e.g. the deployed one, or a model since retrained)
+            if metrics.get('model_sha256') != files[MODEL_FILE]['sha256']:
+                logging.warning("latestscore.json does not describe this model, so the release carries no metrics. "
+                                "Run `python scoring.py --candidate` before deploying to record them.")
+                metrics = None
+
+        base_version = f"{time.strftime('%Y%m%dT%H%M%S')}-{files[MODEL_FILE]['sha256'][:8]}"
+        version, n = base_version, 0
+        while os.path.exists(os.path.join(RELEASES_DIR, version)):
+            n += 1
+            version = f"{base_version}.{n}"
+
+        manifest = {
+            'version': version,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'model_class': type(model).__name__,
+            'files': files,
+            'metrics': metrics,
+            'feature_schema': _feature_schema(model, os.path.join(staging, ENCODER_FILE)),
+        }
+        with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=4)
 
-    # Copy files to the production deployment path
-    for name, path in required_files.items():
-        shutil.copy(path, PROD_DEPLOYMENT_PATH)
-        logging.info(f"Copied {name} to production deployment path.")
+        # A directory rename is atomic: the release appears complete or not at all
+        os.rename(staging, os.path.join(RELEASES_DIR, version))
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
 
+    _switch_current(version, 'deploy')
     logging.info("Deployment completed successfully!")
+    return version
+
+def rollback(version=None):
+    """
+    Makes an earlier release live again by switching the `current` symlink; nothing is copied.
+
+    Args:
+        version (str): Release to activate. Defaults to the release published before the current one.
+
+    Returns:
+        str: The activated version, or None if there is nothing to roll back to.
+    """
+    releases = list_releases()
+    current = current_version()
+    if version is None:
+        older = [release for release in releases if current is None or release < current]
+        if not older:
+            logging.error("No earlier release to roll back to.")
+            return None
+        version = older[-1]
+    if version not in releases:
+        logging.error(f"Unknown release {version}. Available: {', '.join(releases)}")
+        return None
+    _switch_current(version, 'rollback')
+    return version
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Publish the trained model as a new release, or manage releases.")
+    parser.add_argument('--rollback', nargs='?', const='', metavar='VERSION',
+                        help="Activate VERSION, or the release before the current one")
+    parser.add_argument('--list', action='store_true', help="List releases")
+    parser.add_argument('--history', action='store_true', help="Print the deploy/rollback history")
+    args = parser.parse_args()
+
     logging.info("Running deployment.py")
-    deploy_model()
+    if args.list:
+        current = current_version()
+        for release in list_releases():
+            print(f"{'*' if release == current else ' '} {release}")
+    elif args.history:
+        for event in release_history():
+            print(json.dumps(event))
+    elif args.rollback is not None:
+        rollback(args.rollback or None)
+    else:
+        deploy_model()
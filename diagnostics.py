@@ -1,183 +1,209 @@
 import os
 import sys
 import json
-import pickle
-import timeit
 import logging
+import tempfile
 import numpy as np
-import pandas as pd
-import subprocess
 
 # Import paths from config.py
-from config import DATA_PATH, TEST_DATA_PATH, PROD_DEPLOYMENT_PATH
+from config import INPUT_FOLDER_PATH, TEST_DATA_PATH
+from client_data import INGEST_SCHEMA, read_clients
+from data_store import read_store, store_columns, store_exists, store_statistics, write_store
+from profiling import profile_store
+from model_registry import load_deployed_model, load_deployed_encoder
 
 logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 
 
-def model_predictions(X_df, revenue_col='Monthly_Spend'):
+def rank_high_risk_clients(df, client_ids=None, top_k=50, revenue_col='Monthly_Spend', model=None, y_prob=None,
+                           by='probability', X=None):
+    """
+    Scores the raw client rows in df with the deployed model and returns the top_k clients most
+    likely to leave.
+
+    The revenue always comes from df, never from encoded features: the encoder standardizes
+    Monthly_Spend, so the encoded column is not in dollars.
+
+    The rows go through a topk.TopKAccumulator, which keeps only the top_k candidates
+    (np.argpartition) and sorts those, so the cost is O(n + k log k) rather than a full sort,
+    and no copy of the feature frame is made. Use topk.stream_high_risk_clients to rank data
+    that does not fit in memory.
+
+    Args:
+        df (pandas.DataFrame): Raw client rows (at least revenue_col, in dollars).
+        client_ids (array-like): Client_ID for each row of df. Defaults to the row index.
+        top_k (int): Number of clients to return.
+        revenue_col (str): Column of df with the monthly revenue.
+        model (sklearn model): Model to use instead of the deployed one.
+        y_prob (numpy.ndarray): Precomputed predict_proba of the rows (e.g. from
+            score_cache.cached_predict_proba). Without it the rows are scored here.
+        by (str): 'probability', or 'expected_revenue_loss' to rank by revenue_col * 12 * probability.
+        X (pandas.DataFrame): Encoded features of the rows, if already computed. Defaults to
+            df encoded with the deployed encoder.
+
+    Returns:
+        pandas.DataFrame: Client_ID, probability_of_leaving, predicted_class and
+        annual_revenue_loss (plus expected_annual_revenue_loss when ranked by it), sorted in
+        descending order and indexed by the row positions in df (see explanations.add_reasons).
+    """
+    from topk import TopKAccumulator
+
+    if revenue_col not in df.columns:
+        raise KeyError(f"Column '{revenue_col}' is missing from the dataset.")
+
+    if y_prob is None:
+        if model is None:
+            model = load_deployed_model()  # Cached in memory, reloaded only when the pickle changes
+        if X is None:
+            X = load_deployed_encoder(model).transform_frame(df)
+
+        logging.info("Running predictions on data")
+        y_prob = model.predict_proba(X)
+
+    if client_ids is None:
+        client_ids = df.index
+    # Probability of leaving (assuming class 1 = leaving)
+    accumulator = TopKAccumulator(top_k, by)
+    accumulator.update(y_prob[:, 1], client_ids, df[revenue_col].to_numpy(dtype=np.float64))
+    return accumulator.result()
+
+
+def format_high_risk_clients(ranked_df):
+    """
+    Renders the output of rank_high_risk_clients in the set-by-set text format.
+
+    Args:
+        ranked_df (pandas.DataFrame): Output of rank_high_risk_clients.
+
+    Returns:
+        str: One block of Client ID / Risk Probability / Predicted Class / Annual Revenue Loss per client.
+    """
+    return "".join(
+        f"Client ID: {client_id}\n"
+        f"Risk Probability: {risk_prob:.4f}\n"
+        f"Predicted Class: {predicted_class}\n"
+        f"Annual Revenue Loss: ${annual_revenue_loss:,.2f}\n\n"
+        for client_id, risk_prob, predicted_class, annual_revenue_loss in zip(
+            ranked_df['Client_ID'],
+            ranked_df['probability_of_leaving'],
+            ranked_df['predicted_class'],
+            ranked_df['annual_revenue_loss'])
+    )
+
+
+def model_predictions(df, revenue_col='Monthly_Spend', client_ids=None, top_k=50, y_prob=None):
     """
     Loads deployed model to predict on data provided, and outputs the top 50 clients most likely to leave,
     including their annual revenue loss.
 
     Args:
-        X_df (pandas.DataFrame): Dataframe with features.
+        df (pandas.DataFrame): Raw client rows; they are encoded with the deployed encoder.
         revenue_col (str): Column name for monthly revenue data.
+        client_ids (array-like): Client_ID for each row of df. Defaults to the row index.
+        top_k (int): Number of clients to return.
+        y_prob (numpy.ndarray): Precomputed predict_proba of the rows.
 
     Returns:
         str: A string containing the top 50 clients with their details formatted as requested.
     """
-    logging.info("Loading deployed model")
-    model = pickle.load(
-        open(
-            os.path.join(
-                PROD_DEPLOYMENT_PATH,
-                'trainedmodel.pkl'),
-            'rb'))  # Loading the trained model
-
-    logging.info("Running predictions on data")
-    # Get predicted probabilities instead of just labels
-    y_prob = model.predict_proba(X_df)
-
-    # Get the probability of leaving (assuming binary classification, class 1 = leaving)
-    probability_of_leaving = y_prob[:, 1]
-
-    # Ensure the revenue column exists
-    if revenue_col not in X_df.columns:
+    try:
+        ranked_df = rank_high_risk_clients(df, client_ids, top_k, revenue_col, y_prob=y_prob)
+    except KeyError:
         logging.error(f"Column '{revenue_col}' not found in data.")
         return f"Error: Column '{revenue_col}' is missing from the dataset."
 
-    # Create a DataFrame for easier sorting and filtering
-    df_predictions = X_df.copy()
-    df_predictions['probability_of_leaving'] = probability_of_leaving
-
-    # Sort the clients by the probability of leaving in descending order and get the top 50
-    top_50_clients = df_predictions.sort_values(by='probability_of_leaving', ascending=False).head(50)
-
-    # Prepare output in set-by-set format
-    output = ""
-    for idx, row in top_50_clients.iterrows():
-        client_id = idx  # Client ID (row index)
-        risk_prob = row['probability_of_leaving']
-        predicted_class = 1 if risk_prob >= 0.5 else 0  # Predicted class: 1 if likely to leave, else 0
-        annual_revenue_loss = row[revenue_col] * 12 if predicted_class == 1 else 0
-        output += (
-            f"Client ID: {client_id}\n"
-            f"Risk Probability: {risk_prob:.4f}\n"
-            f"Predicted Class: {predicted_class}\n"
-            f"Annual Revenue Loss: ${annual_revenue_loss:,.2f}\n\n"
-        )
-
-    if not output:
+    if ranked_df.empty:
         logging.info("No clients predicted to leave.")
         return "No clients predicted to leave."
 
-    return output
-
+    return format_high_risk_clients(ranked_df)
 
 
+def data_profile():
+    """
+    Profiles the ingested data in a single streaming pass.
 
+    Returns:
+        dict: 'summary' in the dataframe_summary shape and 'missing' in the missing_percentage shape.
+    """
+    profile = profile_store()
+    return {'summary': profile.summary(), 'missing': profile.missing()}
 
 
 def dataframe_summary():
     """
-    Loads finaldata.csv and calculates mean, median, and std on numerical data.
+    Streams the ingested data once and calculates mean, median, and std on numerical data.
+
+    Means and standard deviations are exact; medians are exact up to 100k rows and
+    approximated with a quantile sketch beyond that.
 
     Returns:
         dict: Contains column name, mean, median, and std for each numerical column.
     """
-    logging.info("Loading and preparing finaldata.csv")
-    data_df = pd.read_csv(os.path.join(DATA_PATH, 'finaldata.csv'))
-
-    # Drop 'Client_ID' and keep only numerical columns
-    data_df = data_df.drop(['Client_ID'], axis=1)
-    data_df = data_df.select_dtypes(include=['float64', 'int64'])
-
     logging.info("Calculating statistics for data")
-    statistics_dict = {}
-    for col in data_df.columns:
-        mean = data_df[col].mean()
-        median = data_df[col].median()
-        std = data_df[col].std()
-
-        statistics_dict[col] = {'mean': mean, 'median': median, 'std': std}
-
-    return statistics_dict
+    # Skip 'Client_ID', which is not numerical
+    columns = [col for col in store_columns() if col != 'Client_ID']
+    return profile_store(columns=columns).summary()
 
 
 def missing_percentage():
     """
-    Calculates percentage of missing data for each column in finaldata.csv.
+    Calculates percentage of missing data for each column of the ingested data.
+
+    Null counts come from the columnar store's file footers when available, so no data is read.
 
     Returns:
         dict: Each key is a column name with the value being the actual percentage of missing data.
     """
-    logging.info("Loading and preparing finaldata.csv")
-    data_df = pd.read_csv(os.path.join(DATA_PATH, 'finaldata.csv'))
-
-    logging.info("Calculating missing data percentage")
-    missing_list = {
-        col: {
-            'missing_count': int(data_df[col].isna().sum()),  # Convert numpy.int64 to int
-            'total_count': int(len(data_df)),  # Convert numpy.int64 to int
-            'percentage': round((data_df[col].isna().sum() / len(data_df)) * 100, 2)
+    stats = store_statistics() if store_exists() else None
+    if stats is not None and all(col['null_count'] is not None for col in stats['columns'].values()):
+        logging.info("Calculating missing data percentage")
+        total_count = stats['num_rows']
+        return {
+            col: {
+                'missing_count': int(col_stats['null_count']),
+                'total_count': int(total_count),
+                'percentage': round((col_stats['null_count'] / total_count) * 100, 2) if total_count else 0.0
+            }
+            for col, col_stats in stats['columns'].items()
         }
-        for col in data_df.columns
-    }
-
-    return missing_list
-
-
 
+    logging.info("Calculating missing data percentage")
+    return profile_store().missing()
 
-def _ingestion_timing():
-    """
-    Runs ingestion.py script and measures execution time.
 
-    Returns:
-        float: Execution time of ingestion script.
+def execution_time(repeats=5):
     """
-    starttime = timeit.default_timer()
-    _ = subprocess.run(['python', 'ingestion.py'], capture_output=True)
-    timing = timeit.default_timer() - starttime
-    return timing
+    Gets average execution time for data ingestion and model training, timed in process.
 
+    Ingestion reads dataset.csv from INPUT_FOLDER_PATH into a temporary columnar store and
+    training fits the encoder and model on the ingested data without saving them, so no
+    artifact is overwritten. Errors are raised rather than timed. See benchmarks.py for the
+    full suite.
 
-def _training_timing():
-    """
-    Runs training.py script and measures execution time.
+    Args:
+        repeats (int): Timed runs of each step.
 
     Returns:
-        float: Execution time of training script.
+        list[dict]: Mean execution times for each step.
     """
-    starttime = timeit.default_timer()
-    _ = subprocess.run(['python', 'training.py'], capture_output=True)
-    timing = timeit.default_timer() - starttime
-    return timing
-
+    from benchmarks import run_case
+    from training import fit_model
 
-def execution_time():
-    """
-    Gets average execution time for data ingestion and model training
-    by running each 20 times.
+    dataset_path = os.path.join(INPUT_FOLDER_PATH, 'dataset.csv')
+    data_df = read_store(columns=[col for col in store_columns() if col != 'Client_ID'])
+    with tempfile.TemporaryDirectory() as work_dir:
+        store_dir = os.path.join(work_dir, 'finaldata.parquet')
+        logging.info("Calculating time for ingestion")
+        ingestion = run_case(
+            'ingestion', lambda: write_store(read_clients(dataset_path, schema=INGEST_SCHEMA), store_dir=store_dir), len(data_df), repeats)
 
-    Returns:
-        list[dict]: Mean execution times for each script.
-    """
-    logging.info("Calculating time for ingestion.py")
-    ingestion_time = []
-    for _ in range(20):
-        time = _ingestion_timing()
-        ingestion_time.append(time)
-
-    logging.info("Calculating time for training.py")
-    training_time = []
-    for _ in range(20):
-        time = _training_timing()
-        training_time.append(time)
+    logging.info("Calculating time for training")
+    training = run_case('training', lambda: fit_model(data_df), len(data_df), repeats)
 
     ret_list = [
-        {'ingest_time_mean': np.mean(ingestion_time)},
-        {'train_time_mean': np.mean(training_time)}
+        {'ingest_time_mean': ingestion['seconds']['mean']},
+        {'train_time_mean': training['seconds']['mean']}
     ]
 
     return ret_list
@@ -186,19 +212,18 @@ def execution_time():
 if __name__ == '__main__':
     # Adjust test data to drop 'Attrition_Risk' and 'Client_ID' columns
     logging.info("Loading and preparing testdata.csv")
-    test_df = pd.read_csv(os.path.join(TEST_DATA_PATH, 'testdata.csv'))
+    test_df = read_clients(os.path.join(TEST_DATA_PATH, 'testdata.csv'))
     
-    # Drop 'Attrition_Risk' and 'Client_ID' for predictions
-    X_df = test_df.drop(['Attrition_Risk', 'Client_ID'], axis=1)
-    X_df = pd.get_dummies(X_df, drop_first=True)  # Encode categorical columns like 'Gender'
+    # The rows are encoded with the deployed encoder inside ('Attrition_Risk' and 'Client_ID' are not features)
+    print("Model predictions on testdata.csv:", model_predictions(test_df, client_ids=test_df['Client_ID']), end='\n\n')
 
-    print("Model predictions on testdata.csv:", model_predictions(X_df), end='\n\n')
+    profile = data_profile()  # One pass over the data for both reports
 
     print("Summary statistics")
-    print(json.dumps(dataframe_summary(), indent=4), end='\n\n')
+    print(json.dumps(profile['summary'], indent=4), end='\n\n')
 
     print("Missing percentage")
-    print(json.dumps(missing_percentage(), indent=4), end='\n\n')
+    print(json.dumps(profile['missing'], indent=4), end='\n\n')
 
     print("Execution time")
     print(json.dumps(execution_time(), indent=4), end='\n\n')
@@ -0,0 +1,243 @@
+"""
+Fitted, serializable feature encoder shared by training and every scoring path.
+
+The encoder reproduces the columns of pd.get_dummies(..., drop_first=True)
+but fixes the category tables at fit time, so the output layout never depends
+on which values happen to appear in the rows being scored. When a scaler has
+been fitted (scoring.py's RandomForest pipeline), transform also standardizes
+the matrix in place, so every inference path applies the training transform.
+The encoder also records the training label order, so evaluation maps test
+labels to the model's class codes even when a class is absent from the test set.
+"""
+
+import pickle
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+ENCODER_FILE = 'encoder.pkl'
+TARGET_COLUMN = 'Attrition_Risk'
+NON_FEATURE_COLUMNS = ('Client_ID', TARGET_COLUMN)
+
+# Rows per block when computing scaler moments, bounding the float64 temporaries
+_MOMENT_BLOCK_ROWS = 1 << 16
+
+
+class FeatureEncoder:
+    """
+    Maps raw client columns to a float32 feature matrix in a single pass.
+
+    Attributes:
+        feature_names_ (list[str]): Output column names, in model order.
+        numeric_columns_ (dict): Raw numeric column -> output index.
+        category_tables_ (dict): Raw categorical column -> {category: output index}.
+            Dropped (first) and unseen categories have no entry and encode as all zeros.
+        scaler_mean_ (numpy.ndarray): Per-feature mean subtracted by transform, or None.
+        scaler_scale_ (numpy.ndarray): Per-feature standard deviation divided out by transform, or None.
+        target_labels_ (list): Training labels in class-code order (code i is target_labels_[i]), or None.
+    """
+
+    def __init__(self, feature_names, numeric_columns, category_tables):
+        self.feature_names_ = list(feature_names)
+        self.numeric_columns_ = dict(numeric_columns)
+        self.category_tables_ = {col: dict(table) for col, table in category_tables.items()}
+        self.scaler_mean_ = None
+        self.scaler_scale_ = None
+        self.target_labels_ = None
+        self._indexers = None
+
+    @classmethod
+    def fit(cls, df, exclude=NON_FEATURE_COLUMNS):
+        """
+        Learns numeric columns and category tables from raw client data.
+
+        Args:
+            df (pandas.DataFrame): Raw client rows.
+            exclude (tuple): Columns that are not features.
+
+        Returns:
+            FeatureEncoder: Encoder whose feature_names_ match pd.get_dummies(drop_first=True).
+        """
+        X_df = df.drop(list(exclude), axis=1, errors='ignore')
+        numeric = [col for col in X_df.columns if is_numeric_dtype(X_df[col])]
+        categorical = [col for col in X_df.columns if col not in numeric]
+
+        feature_names = list(numeric)
+        category_tables = {}
+        for col in categorical:
+            categories = sorted(X_df[col].dropna().unique())[1:]  # drop_first
+            category_tables[col] = {}
+            for category in categories:
+                category_tables[col][category] = len(feature_names)
+                feature_names.append(f"{col}_{category}")
+
+        numeric_columns = {col: i for i, col in enumerate(numeric)}
+        encoder = cls(feature_names, numeric_columns, category_tables)
+        if TARGET_COLUMN in df.columns:
+            # Sorted, as LabelEncoder assigns the codes the model is trained on
+            encoder.target_labels_ = sorted(df[TARGET_COLUMN].dropna().unique())
+        return encoder
+
+    @classmethod
+    def from_feature_names(cls, feature_names, categorical_columns=('Gender',)):
+        """
+        Rebuilds an encoder from a model's feature_names_in_ for models saved without one.
+
+        Args:
+            feature_names (array-like): Feature names the model was fitted on.
+            categorical_columns (tuple): Raw columns that were one-hot encoded.
+
+        Returns:
+            FeatureEncoder
+        """
+        numeric_columns = {}
+        category_tables = {col: {} for col in categorical_columns}
+        for i, name in enumerate(feature_names):
+            for col in categorical_columns:
+                if name.startswith(f"{col}_"):
+                    category_tables[col][name[len(col) + 1:]] = i
+                    break
+            else:
+                numeric_columns[name] = i
+        return cls(feature_names, numeric_columns, category_tables)
+
+    def encode_target(self, labels):
+        """
+        Maps target labels to the model's class codes, using the training label order.
+
+        Encoders saved before the label order was recorded fall back to the sorted labels given.
+
+        Args:
+            labels (array-like): Attrition_Risk values.
+
+        Returns:
+            numpy.ndarray: Class code of each label; -1 for missing or unknown labels.
+        """
+        categories = self.target_labels_
+        if categories is None:
+            categories = sorted(pd.Series(labels).dropna().unique())
+        return pd.Categorical(labels, categories=categories).codes.astype(np.int64)
+
+    def _category_indexers(self):
+        # Per column: a hash index over the known categories and the output column of each
+        if self._indexers is None:
+            self._indexers = {
+                col: (pd.Index(list(table)), np.fromiter(table.values(), dtype=np.intp, count=len(table)))
+                for col, table in self.category_tables_.items()
+            }
+        return self._indexers
+
+    def fit_scaler(self, X):
+        """
+        Learns per-feature mean and standard deviation (as StandardScaler does) and
+        standardizes X in place. Later calls to transform apply the same scaling.
+
+        Moments are accumulated in float64 over row blocks, so no full-size temporary is made.
+
+        Args:
+            X (numpy.ndarray): float32 matrix produced by transform before a scaler was fitted.
+
+        Returns:
+            numpy.ndarray: X, standardized in place.
+        """
+        n_features = X.shape[1]
+        count = np.zeros(n_features)
+        total = np.zeros(n_features)
+        for start in range(0, len(X), _MOMENT_BLOCK_ROWS):
+            block = X[start:start + _MOMENT_BLOCK_ROWS]
+            valid = ~np.isnan(block)
+            count += valid.sum(axis=0)
+            total += np.where(valid, block, 0).sum(axis=0, dtype=np.float64)
+        mean = total / np.maximum(count, 1)
+
+        squares = np.zeros(n_features)
+        for start in range(0, len(X), _MOMENT_BLOCK_ROWS):
+            deviation = X[start:start + _MOMENT_BLOCK_ROWS].astype(np.float64) - mean
+            squares += np.nansum(deviation * deviation, axis=0)
+        scale = np.sqrt(squares / np.maximum(count, 1))
+        scale[scale == 0] = 1.0  # Constant features are centred only
+
+        self.scaler_mean_ = mean.astype(np.float32)
+        self.scaler_scale_ = scale.astype(np.float32)
+        return self._scale(X)
+
+    def _scale(self, X):
+        if getattr(self, 'scaler_mean_', None) is not None:  # Encoders pickled before scaling existed
+            X -= self.scaler_mean_
+            X /= self.scaler_scale_
+        return X
+
+    def transform(self, df):
+        """
+        Encodes raw client rows into a preallocated float32 matrix.
+
+        Missing numeric columns are left as zeros, matching the old column-patching loop.
+        If a scaler has been fitted, the matrix is then standardized in place.
+
+        Args:
+            df (pandas.DataFrame): Raw client rows.
+
+        Returns:
+            numpy.ndarray: Matrix of shape (len(df), len(feature_names_)).
+        """
+        n_rows = len(df)
+        X = np.zeros((n_rows, len(self.feature_names_)), dtype=np.float32)
+
+        for col, j in self.numeric_columns_.items():
+            if col in df.columns:
+                X[:, j] = df[col].to_numpy(dtype=np.float32, na_value=np.nan)
+
+        rows = np.arange(n_rows)
+        for col, (index, out_cols) in self._category_indexers().items():
+            if col not in df.columns or len(index) == 0:
+                continue
+            codes = index.get_indexer(df[col])
+            hit = codes >= 0
+            X[rows[hit], out_cols[codes[hit]]] = 1.0
+
+        return self._scale(X)
+
+    def transform_record(self, record):
+        """
+        Encodes a single raw client record without building a DataFrame, as transform would.
+
+        Args:
+            record (dict): Raw client fields; absent numeric fields encode as zero, None as NaN.
+
+        Returns:
+            numpy.ndarray: Matrix of shape (1, len(feature_names_)).
+        """
+        X = np.zeros((1, len(self.feature_names_)), dtype=np.float32)
+        for col, j in self.numeric_columns_.items():
+            if col in record:
+                value = record[col]
+                X[0, j] = np.nan if value is None else value
+        for col, table in self.category_tables_.items():
+            j = table.get(record.get(col))
+            if j is not None:
+                X[0, j] = 1.0
+        return self._scale(X)
+
+    def transform_frame(self, df):
+        """
+        Same as transform, wrapped in a DataFrame with the model's feature names.
+        """
+        return pd.DataFrame(self.transform(df), columns=self.feature_names_, index=df.index, copy=False)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_indexers'] = None
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault('target_labels_', None)
+        self.__dict__.update(state)
+
+    def save(self, path):
+        with open(path, 'wb') as encoder_file:
+            pickle.dump(self, encoder_file)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as encoder_file:
+            return pickle.load(encoder_file)
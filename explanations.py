@@ -0,0 +1,176 @@
+"""
+Per-client explanations of the deployed model's risk scores.
+
+Every client's probability_of_leaving is split into a base value plus one
+contribution per encoded feature (see NumpyModel.explain): coefficient x
+feature value for the logistic models of training.py, per-tree path
+contributions over the flattened tree arrays for the RandomForest of
+scoring.py. Both are computed for all clients in one vectorized pass, and the
+largest contributions become each client's top reasons.
+
+Usage:
+    python explanations.py                      # top reasons of the 50 highest-risk clients in testdata.csv
+    python explanations.py --benchmark 10000    # time explanations of 10k clients, vectorized vs one row at a time
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import numpy as np
+import pandas as pd
+
+from config import TEST_DATA_PATH
+from client_data import read_clients
+from model_registry import load_deployed_encoder, release_dir
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+LEAVING_CLASS_INDEX = 1  # Column of predict_proba reported as probability_of_leaving
+
+
+def _missing_features(encoder, columns):
+    # Encoded features whose raw column is absent: the encoder fills those with 0, which the
+    # scaler turns into a (possibly large) constant the client's data says nothing about
+    missing = [j for col, j in encoder.numeric_columns_.items() if col not in columns]
+    for col, table in encoder.category_tables_.items():
+        if col not in columns:
+            missing.extend(table.values())
+    return np.asarray(missing, dtype=np.int64)
+
+
+def explain_clients(df, release=None, class_index=LEAVING_CLASS_INDEX):
+    """
+    Explains the deployed model's score of every row of df.
+
+    Features whose source column is missing from df get a zero contribution, so they never
+    become a reason; the base and contributions then no longer add up to the score exactly.
+
+    Args:
+        df (pandas.DataFrame): Raw client rows.
+        release (str): Release directory whose model and encoder to use. Defaults to the current one.
+        class_index (int): Column of predict_proba to explain.
+
+    Returns:
+        tuple: (base as numpy.ndarray, contributions as a DataFrame with one column per encoded
+        feature and df's index)
+    """
+    from numpy_model import as_numpy_model, load_scoring_model
+
+    if release is None:
+        release = release_dir()
+    model = load_scoring_model(release)
+    encoder = load_deployed_encoder(model, release)
+    base, contributions = as_numpy_model(model).explain(encoder.transform(df), class_index)
+    contributions[:, _missing_features(encoder, df.columns)] = 0.0
+    return base, pd.DataFrame(contributions, columns=encoder.feature_names_, index=df.index, copy=False)
+
+
+def top_reasons(contributions, n_reasons=3):
+    """
+    Formats the n_reasons largest contributions (by absolute value) of each row.
+
+    Args:
+        contributions (pandas.DataFrame): Output of explain_clients.
+        n_reasons (int): Reasons per row.
+
+    Returns:
+        pandas.Series: Strings like 'Complaints +1.21, Tenure_Years -0.48', indexed like contributions.
+    """
+    values = contributions.to_numpy()
+    names = np.asarray(contributions.columns, dtype=object)
+    n_reasons = min(n_reasons, values.shape[1])
+    order = np.argsort(-np.abs(values), axis=1, kind='stable')[:, :n_reasons]
+    top_values = np.take_along_axis(values, order, axis=1)
+    reasons = [
+        ", ".join(f"{name} {value:+.2f}" for name, value in zip(names[row_order], row_values) if value != 0)
+        for row_order, row_values in zip(order, top_values)
+    ]
+    return pd.Series(reasons, index=contributions.index, dtype=object)
+
+
+def add_reasons(ranked_df, df, n_reasons=3, release=None):
+    """
+    Adds a top_reasons column to the output of diagnostics.rank_high_risk_clients.
+
+    Args:
+        ranked_df (pandas.DataFrame): Ranked clients, indexed by their row positions in df.
+        df (pandas.DataFrame): The raw client rows that were ranked.
+        n_reasons (int): Reasons per client.
+        release (str): Release directory to explain with. Defaults to the current one.
+
+    Returns:
+        pandas.DataFrame: ranked_df with top_reasons.
+    """
+    if ranked_df.empty:
+        return ranked_df.assign(top_reasons=pd.Series(dtype=object))
+    _, contributions = explain_clients(df.iloc[ranked_df.index.to_numpy()], release)
+    return ranked_df.assign(top_reasons=top_reasons(contributions, n_reasons).to_numpy())
+
+
+def benchmark_explanations(n_clients=10_000, n_trees=100, loop_rows=200, seed=0):
+    """
+    Times explanations of n_clients synthetic clients for the deployed model and for a RandomForest.
+
+    Each model is explained once in a single vectorized pass and loop_rows times one row
+    at a time (extrapolated to n_clients), the way a per-row explainer would run.
+
+    Returns:
+        dict: Per model, vectorized_seconds, loop_seconds and speedup; for the forest also
+        max_additivity_error (largest |base + sum(contributions) - probability|).
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from numpy_model import as_numpy_model, load_scoring_model
+    from synthetic import make_clients
+
+    df = make_clients(n_clients, seed=seed)
+    release = release_dir()
+    deployed = load_scoring_model(release)
+    X = load_deployed_encoder(deployed, release).transform(df)
+    forest = RandomForestClassifier(n_estimators=n_trees, max_depth=10, random_state=seed, n_jobs=1)
+    forest.fit(X, df['Attrition_Risk'].astype(str))
+
+    result = {'clients': n_clients}
+    for name, model in (('deployed', as_numpy_model(deployed)), ('random_forest', as_numpy_model(forest))):
+        starttime = time.perf_counter()
+        base, contributions = model.explain(X)
+        vectorized_seconds = time.perf_counter() - starttime
+
+        starttime = time.perf_counter()
+        for i in range(min(loop_rows, n_clients)):
+            model.explain(X[i:i + 1])
+        loop_seconds = (time.perf_counter() - starttime) * n_clients / min(loop_rows, n_clients)
+
+        result[name] = {
+            'vectorized_seconds': vectorized_seconds,
+            'loop_seconds': loop_seconds,
+            'speedup': loop_seconds / vectorized_seconds,
+        }
+        if model.kind == 'forest':
+            # Path contributions add up to the forest's probability exactly
+            score = base + contributions.sum(axis=1)
+            expected = model.predict_proba(X)[:, LEAVING_CLASS_INDEX]
+            result[name]['max_additivity_error'] = float(np.max(np.abs(score - expected)))
+        logging.info(f"{name}: {n_clients:,} explanations in {vectorized_seconds:.3f} sec "
+                     f"({result[name]['speedup']:.0f}x faster than one row at a time)")
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Explain the risk scores of the highest-risk clients.")
+    parser.add_argument('--benchmark', type=int, metavar='CLIENTS', help="Time explanations of CLIENTS synthetic clients")
+    args = parser.parse_args()
+
+    logging.info("Running explanations.py")
+    if args.benchmark:
+        print(json.dumps(benchmark_explanations(args.benchmark), indent=4))
+    else:
+        import diagnostics
+        from score_cache import cached_predict_proba
+
+        test_df = read_clients(os.path.join(TEST_DATA_PATH, 'testdata.csv'))
+        y_prob, _ = cached_predict_proba(test_df)
+        ranked_df = diagnostics.rank_high_risk_clients(test_df, client_ids=test_df['Client_ID'], top_k=50, y_prob=y_prob)
+        print(add_reasons(ranked_df, test_df).to_string(index=False))
@@ -1,15 +1,70 @@
 import os
+import glob
+import json
+import hashlib
+import argparse
+import numpy as np
 import pandas as pd
 import logging
 from datetime import datetime
-from config import INPUT_FOLDER_PATH, DATA_PATH
+from config import INPUT_FOLDER_PATH, DATA_PATH, TEST_DATA_PATH
+from client_data import INGEST_SCHEMA, read_clients, uuid_to_bytes
+from data_store import store_columns, store_exists, store_statistics, write_store
+from client_index import INDEX_DIR, ClientIndex, append_to_index, build_index
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
+MANIFEST_PATH = os.path.join(DATA_PATH, 'ingestion_manifest.json')
+
+
+def _file_sha256(path, block_size=1 << 20):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def load_manifest():
+    """
+    Returns the ingestion manifest: one entry per ingested source file.
+    """
+    if not os.path.exists(MANIFEST_PATH):
+        return {'files': []}
+    with open(MANIFEST_PATH) as f:
+        return json.load(f)
+
+
+def _save_manifest(manifest):
+    tmp_path = f"{MANIFEST_PATH}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def _manifest_entry(path, rows, new_rows, sha256=None):
+    return {
+        'file': os.path.basename(path),
+        'sha256': sha256 or _file_sha256(path),
+        'bytes': os.path.getsize(path),
+        'rows': int(rows),
+        'new_rows': int(new_rows),
+        'ingested_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+def _index_is_current():
+    # The index can only be extended when it holds exactly the rows already in the store
+    try:
+        with open(os.path.join(INDEX_DIR, 'meta.json')) as f:
+            return json.load(f)['rows'] == store_statistics()['num_rows']
+    except FileNotFoundError:
+        return False
+
 def ingest_single_dataframe():
     """
-    Function to ingest a single dataset.csv file from INPUT_FOLDER_PATH and save it to DATA_PATH.
+    Function to ingest a single dataset.csv file from INPUT_FOLDER_PATH and save it to the
+    typed columnar store (finaldata.parquet) in DATA_PATH, and rebuilds the Client_ID index.
     After saving the data, it adds an 'ingested.txt' file to the 'ingesteddata' folder.
     The file will include the dataset name and the time of ingestion.
     """
@@ -21,13 +76,16 @@ def ingest_single_dataframe():
         return
     
     logging.info(f"Reading file from {dataset_path}")
-    df = pd.read_csv(dataset_path)
+    df = read_clients(dataset_path, schema=INGEST_SCHEMA)
 
-    # Save to finaldata.csv in DATA_PATH
-    output_path = os.path.join(DATA_PATH, 'finaldata.csv')
+    # Save to the columnar store in DATA_PATH
     os.makedirs(DATA_PATH, exist_ok=True)
-    df.to_csv(output_path, index=False)
+    output_path = write_store(df)
     logging.info(f"Data saved to {output_path}")
+    build_index()
+
+    # The store was rebuilt from this one file, so the manifest starts over
+    _save_manifest({'files': [_manifest_entry(dataset_path, len(df), len(df))]})
     
     # Add ingested.txt to ingesteddata folder
     ingested_data_folder = os.path.join(DATA_PATH, 'ingesteddata')
@@ -45,6 +103,95 @@ def ingest_single_dataframe():
     
     logging.info(f"'ingestedfiles.txt' created in {ingested_data_folder}")
 
+
+def ingest_new_files(pattern='*.csv'):
+    """
+    Incrementally ingests every source file in INPUT_FOLDER_PATH matching pattern.
+
+    Files whose sha256 is already recorded in the manifest are skipped. Rows of new
+    files are deduplicated on Client_ID against the store (and within the file) and
+    appended as a new part of the columnar store, so the existing data is never rewritten.
+    The store's Client_IDs are looked up in the Client_ID index (a binary search over its
+    sorted 16-byte keys) rather than loaded, so a run costs the same however large the store.
+    The new rows are added to the Client_ID index once at the end (the index is rebuilt from
+    the store instead when it was missing or out of date).
+    Each ingested file is recorded in the manifest with its hash, byte size and row counts.
+
+    Returns:
+        list[dict]: Manifest entries of the files ingested by this run.
+    """
+    os.makedirs(DATA_PATH, exist_ok=True)
+    manifest = load_manifest()
+    known_hashes = {entry['sha256'] for entry in manifest['files']}
+    test_data_file = os.path.abspath(os.path.join(TEST_DATA_PATH, 'testdata.csv'))
+
+    index = None
+    expected_columns = None
+    if store_exists():
+        expected_columns = store_columns()
+        if not _index_is_current():
+            logging.info("Client_ID index is missing or out of date; rebuilding it")
+            build_index()
+        index = ClientIndex()
+
+    ingested, new_frames, new_keys = [], [], []
+    for path in sorted(glob.glob(os.path.join(INPUT_FOLDER_PATH, pattern))):
+        if os.path.abspath(path) == test_data_file:
+            continue
+        sha256 = _file_sha256(path)
+        if sha256 in known_hashes:
+            logging.info(f"Skipping {path}: already ingested")
+            continue
+
+        logging.info(f"Reading file from {path}")
+        df = read_clients(path, schema=INGEST_SCHEMA)
+        if expected_columns is not None and list(df.columns) != expected_columns:
+            logging.error(f"Skipping {path}: columns {list(df.columns)} do not match the store")
+            continue
+
+        new_df = df.drop_duplicates('Client_ID')
+        try:
+            keys = uuid_to_bytes(new_df['Client_ID'])
+        except ValueError as e:
+            logging.error(f"Skipping {path}: {e}")
+            continue
+        # Clients already in the store, or in a file ingested earlier in this run
+        seen = np.isin(keys, np.concatenate(new_keys)) if new_keys else np.zeros(len(keys), dtype=bool)
+        if index is not None:
+            seen |= index.find_keys(keys) >= 0
+        new_df = new_df[~seen]
+        if len(new_df):
+            output_path = write_store(new_df, mode='append')
+            logging.info(f"Appended {len(new_df)} new rows to {output_path}")
+            new_frames.append(new_df)
+            new_keys.append(keys[~seen])
+        expected_columns = list(df.columns)
+
+        entry = _manifest_entry(path, len(df), len(new_df), sha256)
+        manifest['files'].append(entry)
+        known_hashes.add(sha256)
+        _save_manifest(manifest)
+        ingested.append(entry)
+
+    # One index update per run, after all new rows are in the store: only the new keys are
+    # sorted and merged, so a daily drop does not re-read the whole store
+    if new_frames and index is not None:
+        index = None  # Releases the memory maps before the index directory is swapped
+        append_to_index(pd.concat(new_frames, ignore_index=True))
+    elif new_frames:
+        build_index()
+    logging.info(f"Ingested {len(ingested)} new file(s)")
+    return ingested
+
+
 if __name__ == '__main__':
-    ingest_single_dataframe()
+    parser = argparse.ArgumentParser(description="Ingest source data into the columnar store.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Ingest only new files from INPUT_FOLDER_PATH, appending to the store")
+    args = parser.parse_args()
+
+    if args.incremental:
+        ingest_new_files()
+    else:
+        ingest_single_dataframe()
 
@@ -0,0 +1,127 @@
+"""
+Load-test harness for service.py.
+
+Replays client rows from testdata.csv as concurrent single-client /predict
+requests (or /predict/batch requests with --bulk-size) and reports throughput
+and latency percentiles. With --start-server a local instance is launched for
+the duration of the test.
+
+Usage:
+    python load_test.py --start-server --concurrency 200 --requests 20000
+    python load_test.py --url http://127.0.0.1:8000 --bulk-size 500 --requests 200
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import subprocess
+import urllib.error
+import urllib.request
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+from config import TEST_DATA_PATH
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+
+def _post(url, payload):
+    body = json.dumps(payload).encode('utf-8')
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    starttime = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=30) as response:
+            response.read()
+            ok = response.status == 200
+    except (urllib.error.URLError, OSError):
+        ok = False
+    return time.perf_counter() - starttime, ok
+
+
+def _wait_until_healthy(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/health", timeout=1):
+                return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError(f"Service at {url} did not become healthy within {timeout} sec")
+
+
+def run_load_test(url, concurrency=200, n_requests=10000, bulk_size=None):
+    """
+    Fires n_requests requests at the service from `concurrency` threads.
+
+    Args:
+        url (str): Base URL of the service.
+        concurrency (int): Number of concurrent callers.
+        n_requests (int): Total requests to send.
+        bulk_size (int): If set, send /predict/batch requests of this many records.
+
+    Returns:
+        dict: requests, errors, seconds, requests_per_sec, records_per_sec and p50/p95/p99 latency in ms.
+    """
+    test_df = pd.read_csv(os.path.join(TEST_DATA_PATH, 'testdata.csv')).drop('Attrition_Risk', axis=1)
+    records = test_df.to_dict(orient='records')
+
+    if bulk_size:
+        endpoint = f"{url}/predict/batch"
+        payloads = [
+            [records[(i * bulk_size + j) % len(records)] for j in range(bulk_size)]
+            for i in range(n_requests)
+        ]
+    else:
+        endpoint = f"{url}/predict"
+        payloads = [records[i % len(records)] for i in range(n_requests)]
+
+    starttime = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda payload: _post(endpoint, payload), payloads))
+    seconds = time.perf_counter() - starttime
+
+    latencies = np.array([latency for latency, _ in results]) * 1000
+    errors = sum(not ok for _, ok in results)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    summary = {
+        'requests': n_requests,
+        'errors': errors,
+        'seconds': seconds,
+        'requests_per_sec': n_requests / seconds,
+        'records_per_sec': n_requests * (bulk_size or 1) / seconds,
+        'p50_ms': p50,
+        'p95_ms': p95,
+        'p99_ms': p99,
+    }
+    logging.info(
+        f"{n_requests} requests ({errors} errors) in {seconds:.2f} sec: "
+        f"{summary['requests_per_sec']:,.0f} req/sec, {summary['records_per_sec']:,.0f} records/sec, "
+        f"p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms")
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load-test the prediction service.")
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--bulk-size', type=int, default=None)
+    parser.add_argument('--start-server', action='store_true', help="Launch service.py locally for the test")
+    args = parser.parse_args()
+
+    server = None
+    if args.start_server:
+        port = args.url.rsplit(':', 1)[-1].strip('/')
+        server = subprocess.Popen([sys.executable, 'service.py', '--port', port],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_until_healthy(args.url)
+        print(json.dumps(run_load_test(args.url, args.concurrency, args.requests, args.bulk_size), indent=4))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
@@ -0,0 +1,63 @@
+"""
+Classification metrics from confusion matrices, shared by training, scoring and reporting.
+
+Confusion matrices are counted with one np.bincount, so matrices of disjoint
+batches can be summed and turned into weighted F1, precision and recall once.
+"""
+
+import numpy as np
+
+
+def confusion_counts(y_true, y_pred, labels):
+    """
+    Returns the confusion matrix (rows = actual, columns = predicted) over the sorted labels.
+    Matrices of disjoint batches add up to the matrix of the combined data.
+    """
+    labels = np.asarray(labels)
+    n_labels = len(labels)
+    true_idx = np.searchsorted(labels, y_true)
+    pred_idx = np.searchsorted(labels, y_pred)
+    return np.bincount(true_idx * n_labels + pred_idx, minlength=n_labels * n_labels).reshape(n_labels, n_labels)
+
+
+def metrics_from_confusion(confusion, labels):
+    """
+    Weighted F1, precision and recall and accuracy from a confusion matrix; empty classes score 0.
+
+    Returns:
+    - metrics (dict): f1, precision, recall, accuracy, labels and confusion_matrix.
+    """
+    confusion = np.asarray(confusion)
+    true_positives = np.diag(confusion).astype(np.float64)
+    support = confusion.sum(axis=1)
+    predicted = confusion.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(predicted > 0, true_positives / predicted, 0.0)
+        recall = np.where(support > 0, true_positives / support, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+    weights = support / support.sum()
+    return {
+        'f1': float(f1 @ weights),
+        'precision': float(precision @ weights),
+        'recall': float(recall @ weights),
+        'accuracy': float(true_positives.sum() / support.sum()),
+        'labels': np.asarray(labels).tolist(),
+        'confusion_matrix': confusion.tolist(),
+    }
+
+
+def classification_metrics(y_true, y_pred, labels):
+    """
+    Computes the confusion matrix and weighted F1, precision and recall in one vectorized pass.
+
+    Parameters:
+    - y_true (array-like): True labels.
+    - y_pred (array-like): Predicted labels.
+    - labels (array-like): Sorted label set (e.g. model.classes_).
+
+    Returns:
+    - metrics (dict): f1, precision, recall, accuracy, labels and confusion_matrix (rows = actual).
+    """
+    labels = np.union1d(labels, np.union1d(y_true, y_pred))
+    return metrics_from_confusion(confusion_counts(y_true, y_pred, labels), labels)
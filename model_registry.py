@@ -0,0 +1,213 @@
+"""
+In-process cache for pickled model artifacts.
+
+Every pickle is unpickled once per process and kept in memory. A lookup only
+stats the file; when its modification time or size changes the file is read
+and hashed, and the cached object is swapped out only if the contents really
+changed.
+
+Deployments are immutable release directories under PROD_DEPLOYMENT_PATH/releases,
+and the `current` symlink names the live one (see deployment.py). Entries are
+keyed by the resolved file path, so every release is cached separately: a
+request that pins release_dir() keeps a consistent model/encoder pair, and a
+rollback to a release loaded earlier costs nothing.
+"""
+
+import os
+import sys
+import json
+import time
+import pickle
+import hashlib
+import functools
+import logging
+import threading
+from collections import namedtuple
+
+from config import PROD_DEPLOYMENT_PATH
+from encoding import ENCODER_FILE, FeatureEncoder
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+DEPLOYED_MODEL_FILE = os.path.join(PROD_DEPLOYMENT_PATH, 'trainedmodel.pkl')
+DEPLOYED_ENCODER_FILE = os.path.join(PROD_DEPLOYMENT_PATH, ENCODER_FILE)
+MODEL_FILE = 'trainedmodel.pkl'
+RELEASES_DIR = os.path.join(PROD_DEPLOYMENT_PATH, 'releases')
+CURRENT_LINK = os.path.join(PROD_DEPLOYMENT_PATH, 'current')
+HISTORY_FILE = os.path.join(RELEASES_DIR, 'history.jsonl')
+MANIFEST_FILE = 'manifest.json'
+
+_Entry = namedtuple('_Entry', ['stat_key', 'digest', 'obj', 'loaded_at'])
+
+
+class ModelRegistry:
+    """
+    Thread-safe cache of unpickled artifacts keyed by resolved file path.
+
+    Entries are immutable and replaced with a single dict assignment, so a
+    reader either gets the old object or the new one, never a mix.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'loads': 0, 'revalidations': 0, 'load_seconds': 0.0}
+
+    def get(self, path, loader=pickle.loads):
+        """
+        Returns the unpickled object stored at path, reading the file only if it changed.
+
+        Args:
+            path (str): Path to a pickle file.
+            loader (callable): Turns the file's bytes into an object. Defaults to pickle.loads.
+
+        Returns:
+            object: The cached, unpickled object.
+        """
+        path = os.path.realpath(path)
+        stat = os.stat(path)
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+
+        entry = self._entries.get(path)
+        if entry is not None and entry.stat_key == stat_key:
+            self._counters['hits'] += 1
+            return entry.obj
+
+        with self._lock:
+            # Another thread may have refreshed the entry while we waited
+            entry = self._entries.get(path)
+            if entry is not None and entry.stat_key == stat_key:
+                self._counters['hits'] += 1
+                return entry.obj
+
+            starttime = time.perf_counter()
+            with open(path, 'rb') as file:
+                payload = file.read()
+            digest = hashlib.sha256(payload).hexdigest()
+
+            if entry is not None and entry.digest == digest:
+                # File was touched or re-copied but the contents are identical
+                entry = entry._replace(stat_key=stat_key)
+                self._counters['revalidations'] += 1
+            else:
+                entry = _Entry(stat_key, digest, loader(payload), time.time())
+                self._counters['loads'] += 1
+                logging.info(f"Loaded {path} (sha256 {digest[:12]})")
+
+            self._counters['load_seconds'] += time.perf_counter() - starttime
+            self._entries[path] = entry
+
+        return entry.obj
+
+    def digest(self, path):
+        """
+        Returns the sha256 of the cached contents of path, loading it if needed.
+        """
+        self.get(path)
+        return self._entries[os.path.realpath(path)].digest
+
+    def invalidate(self, path=None):
+        """
+        Drops one cached entry, or all of them when path is None.
+        """
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.realpath(path), None)
+
+    def counters(self):
+        """
+        Returns load/hit counters and the mean latency of a disk load.
+
+        Returns:
+            dict: hits, loads, revalidations, load_seconds and mean_load_seconds.
+        """
+        counters = dict(self._counters)
+        disk_reads = counters['loads'] + counters['revalidations']
+        counters['mean_load_seconds'] = counters['load_seconds'] / disk_reads if disk_reads else 0.0
+        return counters
+
+
+registry = ModelRegistry()
+
+
+def current_version():
+    """
+    Returns the release the `current` symlink points at (a single readlink, cheap enough to
+    call per request), or None for a flat deployment made before releases existed.
+    """
+    try:
+        return os.path.basename(os.readlink(CURRENT_LINK))
+    except OSError:
+        return None
+
+
+def release_dir(version=None):
+    """
+    Returns the directory of a release, the current one by default.
+
+    Release directories never change once published, so resolving this once and reading every
+    artifact from it pins one version for the length of a request.
+    """
+    if version is None:
+        version = current_version()
+    if version is None:
+        return PROD_DEPLOYMENT_PATH
+    return os.path.join(RELEASES_DIR, version)
+
+
+def read_manifest(version=None):
+    """
+    Returns the manifest of a release (files and hashes, metrics, feature schema), or None.
+    """
+    path = os.path.join(release_dir(version), MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def release_history():
+    """
+    Returns the recorded deploy and rollback events, oldest first.
+    """
+    if not os.path.exists(HISTORY_FILE):
+        return []
+    with open(HISTORY_FILE) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def load_deployed_model(release=None):
+    """
+    Returns the deployed model, cached in memory.
+
+    Args:
+        release (str): Release directory to read from (see release_dir). Defaults to the current one.
+    """
+    return registry.get(os.path.join(release or release_dir(), MODEL_FILE))
+
+
+def load_deployed_encoder(model=None, release=None):
+    """
+    Returns the feature encoder deployed next to the model, cached in memory.
+
+    Deployments that predate the encoder (or whose encoder does not match the
+    model's features) fall back to an encoder rebuilt from feature_names_in_.
+    """
+    if release is None:
+        release = release_dir()
+    if model is None:
+        model = load_deployed_model(release)
+    encoder_file = os.path.join(release, ENCODER_FILE)
+    if os.path.exists(encoder_file):
+        encoder = registry.get(encoder_file)
+        if list(encoder.feature_names_) == list(model.feature_names_in_):
+            return encoder
+        logging.warning("Deployed encoder does not match the model's features; rebuilding it")
+    return _encoder_from_feature_names(tuple(model.feature_names_in_))
+
+
+@functools.lru_cache(maxsize=8)
+def _encoder_from_feature_names(feature_names):
+    return FeatureEncoder.from_feature_names(feature_names)
@@ -0,0 +1,344 @@
+"""
+NumPy-only inference for the deployed model.
+
+export_model() flattens a fitted scikit-learn estimator into a compact .npz
+artifact: the weight matrix and intercepts of a linear model (training.py's
+LogisticRegression), or the concatenated node arrays of every tree of a
+forest (scoring.py's RandomForestClassifier). NumpyModel reproduces
+predict_proba from that artifact, so scoring processes never import sklearn,
+and NumpyModel.explain splits each score into per-feature contributions.
+
+Usage:
+    python numpy_model.py    # export the deployed model and verify it against sklearn on testdata.csv
+"""
+
+import io
+import os
+import sys
+import logging
+import numpy as np
+
+from config import PROD_DEPLOYMENT_PATH, TEST_DATA_PATH
+from model_registry import registry, MODEL_FILE, load_deployed_model, release_dir
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+NUMPY_MODEL_FILE = 'trainedmodel.npz'
+DEPLOYED_NUMPY_MODEL_FILE = os.path.join(PROD_DEPLOYMENT_PATH, NUMPY_MODEL_FILE)
+
+# Rows traversed at once per forest, bounded so (rows x trees) node indices stay small
+_FOREST_BLOCK_CELLS = 1 << 20
+
+
+def _is_ovr(model):
+    # Mirrors LogisticRegression.predict_proba: liblinear and binary problems use one-vs-rest
+    multi_class = getattr(model, 'multi_class', 'auto')
+    if multi_class == 'ovr':
+        return True
+    if multi_class == 'multinomial':
+        return False
+    solver = getattr(model, 'solver', None)
+    return solver is None or solver == 'liblinear' or len(model.classes_) <= 2
+
+
+def _linear_arrays(model):
+    return {
+        'kind': np.array('linear'),
+        'coef': np.asarray(model.coef_, dtype=np.float64),
+        'intercept': np.atleast_1d(np.asarray(model.intercept_, dtype=np.float64)),
+        'ovr': np.array(_is_ovr(model)),
+    }
+
+
+def _forest_arrays(model):
+    trees = [est.tree_ for est in getattr(model, 'estimators_', [model])]
+    offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+
+    children_left, children_right, feature, threshold, value = [], [], [], [], []
+    for tree, offset in zip(trees, offsets):
+        left = tree.children_left.astype(np.int64)
+        right = tree.children_right.astype(np.int64)
+        is_leaf = left == -1
+        children_left.append(np.where(is_leaf, -1, left + offset))
+        children_right.append(np.where(is_leaf, -1, right + offset))
+        feature.append(np.where(is_leaf, 0, tree.feature).astype(np.int64))
+        threshold.append(tree.threshold.astype(np.float64))
+        node_value = tree.value[:, 0, :].astype(np.float64)
+        normalizer = node_value.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0] = 1.0
+        value.append(node_value / normalizer)
+
+    return {
+        'kind': np.array('forest'),
+        'roots': offsets[:-1].astype(np.int64),
+        'children_left': np.concatenate(children_left),
+        'children_right': np.concatenate(children_right),
+        'feature': np.concatenate(feature),
+        'threshold': np.concatenate(threshold),
+        'value': np.concatenate(value),
+    }
+
+
+def model_arrays(model):
+    """
+    Flattens a fitted sklearn classifier into the arrays of a NumpyModel.
+
+    Args:
+        model: Fitted linear classifier (coef_/intercept_) or tree ensemble (estimators_ or tree_).
+
+    Returns:
+        dict: Array name -> numpy.ndarray.
+    """
+    if hasattr(model, 'coef_'):
+        arrays = _linear_arrays(model)
+    elif hasattr(model, 'estimators_') or hasattr(model, 'tree_'):
+        arrays = _forest_arrays(model)
+    else:
+        raise TypeError(f"Cannot export model of type {type(model).__name__}")
+
+    arrays['classes'] = np.asarray(model.classes_)
+    if hasattr(model, 'feature_names_in_'):
+        arrays['feature_names'] = np.asarray(model.feature_names_in_, dtype=str)
+    return arrays
+
+
+def as_numpy_model(model):
+    """
+    Returns model itself if it is a NumpyModel, else its flattened in-memory NumpyModel.
+    """
+    if isinstance(model, NumpyModel):
+        return model
+    return NumpyModel(model_arrays(model))
+
+
+def export_model(model, path):
+    """
+    Converts a fitted sklearn classifier into a NumPy-only .npz artifact.
+
+    Args:
+        model: Fitted linear classifier (coef_/intercept_) or tree ensemble (estimators_ or tree_).
+        path (str): Destination .npz file.
+
+    Returns:
+        NumpyModel: The exported model, loaded back from the arrays written.
+    """
+    arrays = model_arrays(model)
+    tmp_path = f"{path}.tmp-{os.getpid()}.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+    logging.info(f"Exported {type(model).__name__} to {path}")
+    return NumpyModel(arrays)
+
+
+class NumpyModel:
+    """
+    predict_proba/predict for an artifact written by export_model, using NumPy only.
+
+    Exposes classes_ and feature_names_in_ like the sklearn estimator it came from,
+    so it can stand in for it wherever only those and predict_proba are used.
+    """
+
+    def __init__(self, arrays):
+        self.kind = str(arrays['kind'])
+        self.classes_ = np.asarray(arrays['classes'])
+        if 'feature_names' in arrays:
+            self.feature_names_in_ = np.asarray(arrays['feature_names'], dtype=object)
+        self._arrays = {name: np.asarray(arrays[name]) for name in arrays}
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as npz:
+            return cls({name: npz[name] for name in npz.files})
+
+    @classmethod
+    def from_bytes(cls, payload):
+        """
+        Loader for model_registry.ModelRegistry.get(path, loader=NumpyModel.from_bytes).
+        """
+        with np.load(io.BytesIO(payload), allow_pickle=False) as npz:
+            return cls({name: npz[name] for name in npz.files})
+
+    def predict_proba(self, X):
+        """
+        Args:
+            X (array-like): Encoded features in feature_names_in_ order.
+
+        Returns:
+            numpy.ndarray: Class probabilities of shape (n_rows, n_classes).
+        """
+        if self.kind == 'linear':
+            return self._predict_proba_linear(np.asarray(X, dtype=np.float64))
+        return self._predict_proba_forest(np.asarray(X, dtype=np.float32))
+
+    def predict(self, X):
+        return self.classes_.take(self.predict_proba(X).argmax(axis=1))
+
+    def _predict_proba_linear(self, X):
+        a = self._arrays
+        decision = X @ a['coef'].T + a['intercept']
+        if decision.shape[1] == 1:
+            p = 1.0 / (1.0 + np.exp(-decision[:, 0]))
+            return np.column_stack([1.0 - p, p])
+        if bool(a['ovr']):
+            prob = 1.0 / (1.0 + np.exp(-decision))
+            return prob / prob.sum(axis=1, keepdims=True)
+        decision -= decision.max(axis=1, keepdims=True)
+        prob = np.exp(decision)
+        return prob / prob.sum(axis=1, keepdims=True)
+
+    def explain(self, X, class_index=1):
+        """
+        Splits the score of class class_index into a base value plus one contribution per feature.
+
+        Linear models: contributions are coef x feature value and the base is the intercept, so
+        they add up to the decision function (log-odds for logistic models). Forests: per-tree
+        path contributions (Saabas), where each split credits its feature with the change in
+        the class probability, averaged over the trees; they add up to predict_proba.
+
+        Args:
+            X (array-like): Encoded features in feature_names_in_ order.
+            class_index (int): Column of predict_proba to explain.
+
+        Returns:
+            tuple: (base of shape (n_rows,), contributions of shape (n_rows, n_features))
+        """
+        if self.kind == 'linear':
+            return self._explain_linear(np.asarray(X, dtype=np.float64), class_index)
+        return self._explain_forest(np.asarray(X, dtype=np.float32), class_index)
+
+    def _explain_linear(self, X, class_index):
+        a = self._arrays
+        coef, intercept = a['coef'], a['intercept']
+        if len(coef) == 1:
+            # Binary models keep one row of weights, for the positive class
+            sign = 1.0 if class_index == 1 else -1.0
+            coef, intercept = sign * coef[0], sign * intercept[0]
+        else:
+            coef, intercept = coef[class_index], intercept[class_index]
+        return np.full(len(X), intercept), X * coef
+
+    def _descend(self, X_block, on_split=None):
+        # Routes every (row, tree) pair from its root to a leaf, all pairs at once; one step
+        # descends every pair not yet at a leaf. Returns the leaf of each pair, row-major.
+        a = self._arrays
+        roots = a['roots']
+        left, right = a['children_left'], a['children_right']
+        feature, threshold = a['feature'], a['threshold']
+
+        n_trees = len(roots)
+        node = np.tile(roots, len(X_block))
+        row_of = np.repeat(np.arange(len(X_block)), n_trees)
+        active = np.arange(node.size)
+        while active.size:
+            current = node[active]
+            node_left = left[current]
+            internal = node_left != -1
+            active, current, node_left = active[internal], current[internal], node_left[internal]
+            go_left = X_block[row_of[active], feature[current]] <= threshold[current]
+            child = np.where(go_left, node_left, right[current])
+            node[active] = child
+            if on_split is not None and active.size:
+                on_split(row_of[active], current, child)
+        return node
+
+    def _forest_blocks(self, n_rows):
+        block = max(1, _FOREST_BLOCK_CELLS // len(self._arrays['roots']))
+        return range(0, n_rows, block), block
+
+    def _predict_proba_forest(self, X):
+        value = self._arrays['value']
+        n_trees = len(self._arrays['roots'])
+        proba = np.empty((len(X), value.shape[1]), dtype=np.float64)
+        starts, block = self._forest_blocks(len(X))
+        for start in starts:
+            X_block = X[start:start + block]
+            node = self._descend(X_block)
+            proba[start:start + len(X_block)] = value[node].reshape(len(X_block), n_trees, -1).mean(axis=1)
+        return proba
+
+    def _explain_forest(self, X, class_index):
+        a = self._arrays
+        roots, feature = a['roots'], a['feature']
+        value = a['value'][:, class_index]
+        n_rows, n_features = X.shape
+        n_trees = len(roots)
+
+        contributions = np.empty((n_rows, n_features), dtype=np.float64)
+        starts, block = self._forest_blocks(n_rows)
+        for start in starts:
+            X_block = X[start:start + block]
+            totals = np.zeros(len(X_block) * n_features)
+
+            def on_split(rows, parent, child):
+                # Sums the probability change of every split into its (row, feature) cell
+                totals[:] += np.bincount(rows * n_features + feature[parent],
+                                         weights=value[child] - value[parent], minlength=totals.size)
+
+            self._descend(X_block, on_split)
+            contributions[start:start + len(X_block)] = totals.reshape(len(X_block), n_features) / n_trees
+        return np.full(n_rows, value[roots].mean()), contributions
+
+
+def load_deployed_numpy_model(release=None):
+    """
+    Returns the exported NumPy model of a release (the current one by default), cached in memory.
+    """
+    return registry.get(os.path.join(release or release_dir(), NUMPY_MODEL_FILE), loader=NumpyModel.from_bytes)
+
+
+def load_scoring_model(release=None):
+    """
+    Returns the deployed model for scoring: the NumPy artifact when it is at least as new as
+    trainedmodel.pkl, so the process never imports scikit-learn, and the pickle otherwise.
+
+    Args:
+        release (str): Release directory to read from (see model_registry.release_dir).
+    """
+    if release is None:
+        release = release_dir()
+    numpy_file = os.path.join(release, NUMPY_MODEL_FILE)
+    model_file = os.path.join(release, MODEL_FILE)
+    if os.path.exists(numpy_file) and (
+            not os.path.exists(model_file) or os.path.getmtime(numpy_file) >= os.path.getmtime(model_file)):
+        return load_deployed_numpy_model(release)
+    return load_deployed_model(release)
+
+
+def verify_export(model, numpy_model, X, atol=1e-9):
+    """
+    Compares NumpyModel.predict_proba with the sklearn model on X.
+
+    Returns:
+        dict: max_abs_diff, within_tolerance and predictions_match.
+    """
+    expected = model.predict_proba(X)
+    actual = numpy_model.predict_proba(X)
+    max_abs_diff = float(np.max(np.abs(expected - actual))) if expected.size else 0.0
+    return {
+        'max_abs_diff': max_abs_diff,
+        'within_tolerance': max_abs_diff <= atol,
+        'predictions_match': bool(np.array_equal(expected.argmax(axis=1), actual.argmax(axis=1))),
+    }
+
+
+if __name__ == '__main__':
+    from client_data import read_clients
+    from model_registry import load_deployed_encoder
+
+    logging.info("Running numpy_model.py")
+    release = release_dir()
+    model = load_deployed_model(release)
+    numpy_file = os.path.join(release, NUMPY_MODEL_FILE)
+    # Releases are immutable, so verify the artifact shipped with them; flat deployments get one exported
+    if os.path.exists(numpy_file):
+        numpy_model = load_deployed_numpy_model(release)
+    else:
+        numpy_model = export_model(model, numpy_file)
+
+    test_df = read_clients(os.path.join(TEST_DATA_PATH, 'testdata.csv'))
+    X_df = load_deployed_encoder(model, release).transform_frame(test_df)
+    result = verify_export(model, numpy_model, X_df)
+    if result['within_tolerance'] and result['predictions_match']:
+        logging.info(f"Export verified against sklearn: max abs diff {result['max_abs_diff']:.3e}")
+    else:
+        logging.error(f"Export does not match sklearn: {result}")
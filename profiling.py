@@ -0,0 +1,226 @@
+"""
+Single-pass, mergeable data profiling.
+
+Data is streamed once in chunks. Each column keeps its count, missing count,
+mean and sum of squared deviations (Welford/Chan updates, merged exactly
+across chunks) and, for numeric columns, a KLL-style quantile sketch for
+approximate medians and quantiles. Profiles built on separate files or
+worker processes merge into the profile of the combined data.
+"""
+
+import sys
+import logging
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+from data_store import iter_store
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+DEFAULT_CHUNKSIZE = 65536
+
+
+class QuantileSketch:
+    """
+    KLL-style mergeable quantile sketch.
+
+    Values are kept exactly until more than exact_limit have been seen; after that,
+    full levels are sorted and every other item is promoted with doubled weight,
+    keeping O(k) items with rank error of roughly 1/k.
+    """
+
+    def __init__(self, k=2048, exact_limit=100_000, seed=0):
+        self.k = k
+        self.exact_limit = exact_limit
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - 1 - level
+        return max(2, int(self.k * (2 / 3) ** depth))
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def _compress(self):
+        if self.count <= self.exact_limit:
+            return
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                items = np.sort(items)
+                keep = items[-1:] if len(items) % 2 else items[:0]
+                if len(items) % 2:
+                    items = items[:-1]
+                promoted = items[self._rng.integers(2)::2]
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def quantile(self, q):
+        """
+        Returns the approximate q-quantile (exact, with linear interpolation, below exact_limit).
+        """
+        if self.count == 0:
+            return float('nan')
+        if len(self.levels) == 1:
+            return float(np.quantile(self.levels[0], q))
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level_items), 2 ** level) for level, level_items in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        idx = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+        return float(items[order][min(idx, len(order) - 1)])
+
+
+class ColumnProfile:
+    """
+    Running statistics for one column: count, missing, mean, std and (numeric) quantiles.
+
+    quantiles=False skips the sketch when only moments are needed.
+    """
+
+    def __init__(self, numeric, quantiles=True):
+        self.numeric = numeric
+        self.count = 0
+        self.missing = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sketch = QuantileSketch() if numeric and quantiles else None
+
+    def update(self, series):
+        if not self.numeric:
+            missing = int(series.isna().sum())
+            self.missing += missing
+            self.count += len(series) - missing
+            return
+
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        values = values[~np.isnan(values)]
+        self.missing += len(series) - len(values)
+        if len(values) == 0:
+            return
+        batch_mean = values.mean()
+        batch_m2 = float(((values - batch_mean) ** 2).sum())
+        self._combine(len(values), batch_mean, batch_m2)
+        if self.sketch is not None:
+            self.sketch.update(values)
+
+    def _combine(self, count, mean, m2):
+        # Chan et al. pairwise update of (count, mean, M2)
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    def merge(self, other):
+        self.missing += other.missing
+        if not self.numeric:
+            self.count += other.count
+            return self
+        if other.count:
+            self._combine(other.count, other.mean, other.m2)
+            if self.sketch is not None and other.sketch is not None:
+                self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else float('nan')
+
+    def quantile(self, q):
+        return self.sketch.quantile(q) if self.sketch is not None else None
+
+
+class DatasetProfile:
+    """
+    Per-column profiles of a dataset, built from a stream of DataFrame chunks.
+    """
+
+    def __init__(self):
+        self.num_rows = 0
+        self.columns = {}
+
+    def update(self, chunk):
+        for col in chunk.columns:
+            if col not in self.columns:
+                self.columns[col] = ColumnProfile(is_numeric_dtype(chunk[col]))
+            self.columns[col].update(chunk[col])
+        self.num_rows += len(chunk)
+        return self
+
+    def merge(self, other):
+        for col, col_profile in other.columns.items():
+            if col in self.columns:
+                self.columns[col].merge(col_profile)
+            else:
+                self.columns[col] = col_profile
+        self.num_rows += other.num_rows
+        return self
+
+    def summary(self, exclude=('Client_ID',)):
+        """
+        Returns {column: {'mean', 'median', 'std'}} for numeric columns (the dataframe_summary shape).
+        """
+        return {
+            col: {'mean': float(p.mean) if p.count else float('nan'), 'median': p.quantile(0.5), 'std': p.std}
+            for col, p in self.columns.items()
+            if p.numeric and col not in exclude
+        }
+
+    def missing(self):
+        """
+        Returns {column: {'missing_count', 'total_count', 'percentage'}} (the missing_percentage shape).
+        """
+        return {
+            col: {
+                'missing_count': int(p.missing),
+                'total_count': int(self.num_rows),
+                'percentage': round((p.missing / self.num_rows) * 100, 2) if self.num_rows else 0.0
+            }
+            for col, p in self.columns.items()
+        }
+
+
+def profile_frames(frames):
+    """
+    Profiles an iterable of DataFrame chunks in a single pass.
+    """
+    profile = DatasetProfile()
+    for chunk in frames:
+        profile.update(chunk)
+    return profile
+
+
+def profile_store(columns=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Profiles the ingested data store in one streaming pass.
+    """
+    logging.info("Profiling ingested data")
+    return profile_frames(iter_store(columns=columns, batch_size=chunksize))
+
+
+def profile_csv(path, columns=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Profiles a CSV file in one streaming pass; results from several files can be merged.
+    """
+    logging.info(f"Profiling {path}")
+    return profile_frames(pd.read_csv(path, usecols=columns, chunksize=chunksize))
@@ -1,129 +1,260 @@
 import sys
 import json
+import hashlib
 import logging
-import pandas as pd
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet
 import os
 import diagnostics  # Assuming diagnostics.py is provided
 
-# Load configuration from config.json
-with open('config.json', 'r') as file:
-    CONFIG = json.load(file)
+# Paths come from config.py, which parses config.json once per process
+from config import DATA_PATH, INPUT_FOLDER_PATH, TEST_DATA_PATH, MODEL_PATH
+from client_data import read_clients
+from data_store import store_parts, LEGACY_CSV
+from model_registry import DEPLOYED_MODEL_FILE, DEPLOYED_ENCODER_FILE, load_deployed_encoder
 
-# Define paths using the config file settings
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-DATA_PATH = os.path.join(BASE_DIR, CONFIG['output_folder_path'])
-TEST_DATA_PATH = os.path.join(BASE_DIR, CONFIG['test_data_path'])
-MODEL_PATH = os.path.join(BASE_DIR, CONFIG['output_model_path'])
-PROD_DEPLOYMENT_PATH = os.path.join(BASE_DIR, CONFIG['prod_deployment_path'])
+# matplotlib (via confusion_matrix_plot) and reportlab are imported inside the
+# functions that use them, so importing this module stays cheap
 
 logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 
-def generate_pdf_report():
+REPORT_CACHE_DIR = os.path.join(MODEL_PATH, 'report_cache')
+SECTION_VERSION = 4  # Bump when the computation of a section changes, to invalidate old entries
+
+
+def _read_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path, state):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+class SectionCache:
     """
-    Generates a PDF report with enhanced formatting, including the top 50 high-risk clients.
+    On-disk cache of computed report sections, keyed by the sha256 of their input files.
+
+    A file's digest is remembered with its size and mtime, so unchanged inputs are only
+    stat'ed. A section whose data lists 'files' is stale if any of them is missing.
     """
-    pdf_path = os.path.join(MODEL_PATH, 'summary_report.pdf')
-    doc = SimpleDocTemplate(pdf_path, pagesize=A4, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
-    elements = []
 
-    styles = getSampleStyleSheet()
-    title_style = styles["Title"]
-    heading_style = styles["Heading2"]
-    normal_style = styles["BodyText"]
+    def __init__(self, cache_dir=REPORT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self._digests_path = os.path.join(cache_dir, 'digests.json')
+        self._digests = _read_json(self._digests_path) or {}
 
-    elements.append(Paragraph("Model Summary Report", title_style))
-    elements.append(Spacer(1, 12))
+    def file_digest(self, path):
+        path = os.path.abspath(path)
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        cached = self._digests.get(path)
+        if cached is not None and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return cached[2]
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha256.update(block)
+        self._digests[path] = [stat.st_size, stat.st_mtime_ns, sha256.hexdigest()]
+        return sha256.hexdigest()
 
-    elements.append(Paragraph("Top 50 High-Risk Clients", heading_style))
-    elements.append(Spacer(1, 6))
-    
-    try:
-        test_df = pd.read_csv(os.path.join(TEST_DATA_PATH, 'testdata.csv'))
-        X_df = test_df.drop(['Attrition_Risk', 'Client_ID'], axis=1)
-        X_df = pd.get_dummies(X_df, drop_first=True)
-        
-        top_50_clients = diagnostics.model_predictions(X_df)
-        
-        if isinstance(top_50_clients, str):
-            elements.append(Paragraph(top_50_clients.replace("\n", "<br />"), normal_style))
-        else:
-            data_table = [["Client ID", "Risk Probability", "Predicted Class", "Annual Revenue Loss ($)"]]
-            data_table += top_50_clients
-            table = Table(data_table)
-            table.setStyle(TableStyle([
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('BACKGROUND', (0, 0), (-1, 0), colors.lavender),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ]))
-            elements.append(table)
-    except Exception as e:
-        logging.error(f"Error generating high-risk clients list: {e}")
-        elements.append(Paragraph("Error generating high-risk clients list.", normal_style))
+    def key(self, name, inputs):
+        payload = [name, SECTION_VERSION, [(os.path.abspath(path), self.file_digest(path)) for path in inputs]]
+        return hashlib.sha256(json.dumps(payload).encode('utf-8')).hexdigest()
 
-    elements.append(Spacer(1, 12))
-    
-    doc.build(elements)
-    logging.info("PDF report generated successfully.")
+    def get_or_build(self, name, inputs, build):
+        """
+        Returns (data, key) of a section, calling build() only if the cached data is stale.
 
-if __name__ == '__main__':
-    logging.info("Running reporting.py")
-    generate_pdf_report()
-import sys
-import json
-import logging
-import pandas as pd
-import os
-import matplotlib.pyplot as plt
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet
-from pretty_confusion_matrix import plot_confusion_matrix_from_data
-import diagnostics  # Assuming diagnostics.py is provided
+        A failed build is cached as {'error': message} too, so an unchanged broken input
+        does not make every report regeneration slow.
+        """
+        key = self.key(name, inputs)
+        path = os.path.join(self.cache_dir, f"{name}.json")
+        state = _read_json(path)
+        if state is not None and state['key'] == key and all(
+                os.path.exists(file) for file in state['data'].get('files', [])):
+            return state['data'], key
 
-# Load configuration from config.json
-with open('config.json', 'r') as file:
-    CONFIG = json.load(file)
+        logging.info(f"Rebuilding report section '{name}'")
+        try:
+            data = build()
+        except Exception as e:
+            data = {'error': str(e)}
+        _write_json(path, {'key': key, 'data': data})
+        return data, key
 
-# Define paths using the config file settings
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-DATA_PATH = os.path.join(BASE_DIR, CONFIG['output_folder_path'])
-TEST_DATA_PATH = os.path.join(BASE_DIR, CONFIG['test_data_path'])
-MODEL_PATH = os.path.join(BASE_DIR, CONFIG['output_model_path'])
-PROD_DEPLOYMENT_PATH = os.path.join(BASE_DIR, CONFIG['prod_deployment_path'])
+    def save(self):
+        _write_json(self._digests_path, self._digests)
 
-logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 
-def plot_confusion_matrix():
-    try:
-        test_df = pd.read_csv(os.path.join(TEST_DATA_PATH, 'testdata.csv'))
-        y_true = test_df.pop('Attrition_Risk')
-        X_df = pd.get_dummies(test_df.drop(['Client_ID'], axis=1), drop_first=True)
+def _cached_predict_proba(df, score_cache_path=None):
+    from score_cache import ScoreCache, cached_predict_proba
+
+    return cached_predict_proba(df, ScoreCache(score_cache_path) if score_cache_path else None)
 
-        model = diagnostics.load_deployed_model()
-        model_columns = model.feature_names_in_
-        for col in set(model_columns) - set(X_df.columns):
-            X_df[col] = 0
-        X_df = X_df[model_columns]
+def plot_confusion_matrix(output_path=None, score_cache_path=None):
+    """
+    Plots the deployed model's confusion matrix on testdata.csv.
+
+    Args:
+        output_path (str): Image to write. Defaults to MODEL_PATH/confusionmatrix.png.
+        score_cache_path (str): Score cache file to use. Defaults to the one in MODEL_PATH.
+
+    Returns:
+        str: Path of the saved image, or None if it could not be generated.
+    """
+    from confusion_matrix_plot import save_confusion_matrix
+    from metrics import confusion_counts
 
-        y_pred = model.predict(X_df)
+    if output_path is None:
+        output_path = os.path.join(MODEL_PATH, 'confusionmatrix.png')
+    try:
+        test_df = read_clients(os.path.join(TEST_DATA_PATH, 'testdata.csv'))
+        # The model predicts label-encoded classes, i.e. indices into the training labels
+        encoder = load_deployed_encoder()
+        labels = test_df.pop('Attrition_Risk')
+        y_true = encoder.encode_target(labels)
+        label_names = encoder.target_labels_ or sorted(labels.dropna().unique())
+        y_prob, classes = _cached_predict_proba(test_df, score_cache_path)
+        y_pred = classes.take(y_prob.argmax(axis=1))
+        known = y_true >= 0
 
-        fig, ax = plot_confusion_matrix_from_data(y_true, y_pred, columns=[0, 1], cmap='Blues')
-        ax.set_title("Model Confusion Matrix")
-        fig.savefig(os.path.join(MODEL_PATH, 'confusionmatrix.png'))
+        confusion = confusion_counts(y_true[known], y_pred[known], classes)
+        save_confusion_matrix(confusion, output_path, labels=list(label_names), title="Model Confusion Matrix",
+                              cmap='Blues')
         logging.info("Confusion matrix saved.")
+        return output_path
     except Exception as e:
         logging.error(f"Error generating confusion matrix: {e}")
+        return None
+
+def _read_text(path):
+    with open(path) as file:
+        return {'text': file.read()}
+
+def _top_clients(top_k=50, score_cache_path=None):
+    from explanations import add_reasons
+
+    test_df = read_clients(os.path.join(TEST_DATA_PATH, 'testdata.csv'))
+    y_prob, _ = _cached_predict_proba(test_df, score_cache_path)
+    top_clients = diagnostics.rank_high_risk_clients(test_df, client_ids=test_df['Client_ID'], top_k=top_k,
+                                                     y_prob=y_prob)
+    top_clients = add_reasons(top_clients, test_df)
+    return {'rows': [
+        [str(client_id), float(risk_prob), int(predicted_class), float(annual_revenue_loss), str(reasons)]
+        for client_id, risk_prob, predicted_class, annual_revenue_loss, reasons in top_clients.itertuples(index=False)
+    ]}
+
+def compute_sections(cache, score_cache_path=None):
+    """
+    Returns {section: (data, key)} for every report section, rebuilding only stale ones.
+
+    Scores come through the score cache at score_cache_path (default: the one in MODEL_PATH).
+
+    A failed section is logged and comes back as None, so the report skips it as before.
+    """
+    data_files = store_parts() or [LEGACY_CSV]
+    test_data = os.path.join(TEST_DATA_PATH, 'testdata.csv')
+    model_files = [DEPLOYED_MODEL_FILE, DEPLOYED_ENCODER_FILE]
+    confusion_png = os.path.join(cache.cache_dir, 'confusionmatrix.png')
+
+    sections = {
+        'ingestion': ([os.path.join(DATA_PATH, 'ingestedfiles.txt')],
+                      lambda: _read_text(os.path.join(DATA_PATH, 'ingestedfiles.txt'))),
+        'scores': ([os.path.join(MODEL_PATH, 'latestscore.txt')],
+                   lambda: _read_text(os.path.join(MODEL_PATH, 'latestscore.txt'))),
+        'timings': ([os.path.join(INPUT_FOLDER_PATH, 'dataset.csv')] + data_files,
+                    lambda: {'timings': diagnostics.execution_time()}),
+        'missing': (data_files, lambda: {'missing': diagnostics.missing_percentage()}),
+        'confusion_matrix': (model_files + [test_data],
+                             lambda: {'files': [confusion_png]} if plot_confusion_matrix(confusion_png, score_cache_path)
+                             else {'error': "confusion matrix could not be generated"}),
+        'top_clients': (model_files + [test_data], lambda: _top_clients(50, score_cache_path)),
+    }
+
+    results = {}
+    for name, (inputs, build) in sections.items():
+        data, key = cache.get_or_build(name, inputs, build)
+        if 'error' in data:
+            logging.error(f"Error in report section '{name}': {data['error']}")
+            data = None
+        results[name] = (data, key)
+    cache.save()
+    return results
+
+def publish_confusion_matrix(output_path=None, cache_dir=REPORT_CACHE_DIR):
+    """
+    Copies the report's cached confusion matrix image to where the app reads it.
+
+    The image is only copied when the cached one is newer or differs in size, so a warm
+    report rebuild neither re-plots nor rewrites it.
+
+    Args:
+        output_path (str): Destination image. Defaults to MODEL_PATH/confusionmatrix.png.
+        cache_dir (str): Section cache directory. Defaults to MODEL_PATH/report_cache.
+
+    Returns:
+        str: Path of the published image, or None if the section has no image.
+    """
+    if output_path is None:
+        output_path = os.path.join(MODEL_PATH, 'confusionmatrix.png')
+    state = _read_json(os.path.join(cache_dir, 'confusion_matrix.json'))
+    files = state['data'].get('files', []) if state is not None else []
+    if not files or not os.path.exists(files[0]):
+        logging.error("No cached confusion matrix to publish.")
+        return None
+
+    source = os.stat(files[0])
+    if os.path.exists(output_path):
+        target = os.stat(output_path)
+        if (target.st_size, target.st_mtime_ns) == (source.st_size, source.st_mtime_ns):
+            return output_path
+    import shutil
+    shutil.copy2(files[0], output_path)
+    logging.info(f"Confusion matrix published to {output_path}")
+    return output_path
+
+def generate_pdf_report(pdf_path=None, force=False, cache_dir=REPORT_CACHE_DIR, score_cache_path=None):
+    """
+    Builds the PDF summary report from cached sections (see SectionCache).
+
+    Only sections whose inputs changed are recomputed, and the PDF itself is not rebuilt
+    when every section is unchanged since it was last written.
+
+    Args:
+        pdf_path (str): Destination PDF. Defaults to MODEL_PATH/summary_report.pdf.
+        force (bool): Drop the cache and rebuild every section.
+        cache_dir (str): Section cache directory. Defaults to MODEL_PATH/report_cache.
+        score_cache_path (str): Score cache file. Defaults to the one in MODEL_PATH.
+    """
+    if pdf_path is None:
+        pdf_path = os.path.join(MODEL_PATH, 'summary_report.pdf')
+    if force:
+        import shutil
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    cache = SectionCache(cache_dir)
+    sections = compute_sections(cache, score_cache_path)
+
+    # Skip the PDF build when the same sections were already rendered to this file
+    report_key = hashlib.sha256(json.dumps([sections[name][1] for name in sorted(sections)]).encode('utf-8')).hexdigest()
+    manifest_path = os.path.join(cache.cache_dir, 'report.json')
+    manifest = _read_json(manifest_path) or {}
+    if os.path.exists(pdf_path) and manifest.get(os.path.abspath(pdf_path)) == [report_key, os.stat(pdf_path).st_mtime_ns]:
+        logging.info("PDF report is up to date.")
+        return pdf_path
+
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+    from reportlab.lib.styles import getSampleStyleSheet
 
-def generate_pdf_report():
-    pdf_path = os.path.join(MODEL_PATH, 'summary_report.pdf')
     doc = SimpleDocTemplate(pdf_path, pagesize=A4, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
     elements = []
 
@@ -137,80 +268,76 @@ def generate_pdf_report():
 
     # Ingested Data
     elements.append(Paragraph("Ingested Data", heading_style))
-    try:
-        with open(os.path.join(DATA_PATH, "ingestedfiles.txt")) as file:
-            ingested_data = file.read()
-        elements.append(Paragraph(ingested_data.replace("\n", "<br />"), normal_style))
-    except Exception as e:
-        logging.error(f"Error reading ingested files: {e}")
+    ingestion, _ = sections['ingestion']
+    if ingestion is not None:
+        elements.append(Paragraph(ingestion['text'].replace("\n", "<br />"), normal_style))
     elements.append(Spacer(1, 12))
 
     # Model Scoring
     elements.append(Paragraph("Model Score", heading_style))
-    try:
-        with open(os.path.join(MODEL_PATH, "latestscore.txt")) as file:
-            elements.append(Paragraph(file.read(), normal_style))
-    except Exception as e:
-        logging.error(f"Error reading model score: {e}")
+    scores, _ = sections['scores']
+    if scores is not None:
+        elements.append(Paragraph(scores['text'], normal_style))
     elements.append(Spacer(1, 12))
 
     # Execution Time
     elements.append(Paragraph("Execution Time", heading_style))
-    try:
-        timings = diagnostics.execution_time()
-        elements.append(Paragraph("<br />".join([f"{k}: {v:.4f} sec" for timing in timings for k, v in timing.items()]), normal_style))
-    except Exception as e:
-        logging.error(f"Error retrieving execution time: {e}")
+    timings, _ = sections['timings']
+    if timings is not None:
+        elements.append(Paragraph("<br />".join([f"{k}: {v:.4f} sec" for timing in timings['timings'] for k, v in timing.items()]), normal_style))
     elements.append(Spacer(1, 12))
 
     # Missing Data
     elements.append(Paragraph("Missing Data Summary", heading_style))
-    try:
-        missing_data = diagnostics.missing_percentage()
-        elements.append(Paragraph("<br />".join([f"{col}: {metrics['percentage']}%" for col, metrics in missing_data.items()]), normal_style))
-    except Exception as e:
-        logging.error(f"Error retrieving missing data: {e}")
+    missing, _ = sections['missing']
+    if missing is not None:
+        elements.append(Paragraph("<br />".join([f"{col}: {metrics['percentage']}%" for col, metrics in missing['missing'].items()]), normal_style))
     elements.append(Spacer(1, 12))
 
     # Confusion Matrix
     elements.append(Paragraph("Confusion Matrix", heading_style))
-    try:
-        img = Image(os.path.join(MODEL_PATH, 'confusionmatrix.png'), width=300, height=300)
-        elements.append(img)
-    except Exception as e:
-        logging.error(f"Error loading confusion matrix image: {e}")
+    confusion, _ = sections['confusion_matrix']
+    if confusion is not None:
+        elements.append(Image(confusion['files'][0], width=300, height=300))
     elements.append(Spacer(1, 12))
 
     # Top 50 High-Risk Clients
     elements.append(Paragraph("Top 50 High-Risk Clients", heading_style))
-    try:
-        test_df = pd.read_csv(os.path.join(TEST_DATA_PATH, 'testdata.csv'))
-        X_df = test_df.drop(['Attrition_Risk', 'Client_ID'], axis=1)
-        X_df = pd.get_dummies(X_df, drop_first=True)
-        top_50_clients = diagnostics.model_predictions(X_df)
-        if isinstance(top_50_clients, str):
-            elements.append(Paragraph(top_50_clients.replace("\n", "<br />"), normal_style))
+    top_clients, _ = sections['top_clients']
+    if top_clients is not None:
+        if not top_clients['rows']:
+            elements.append(Paragraph("No clients predicted to leave.", normal_style))
         else:
-            data_table = [["Client ID", "Risk Probability", "Predicted Class", "Annual Revenue Loss ($)"]]
-            data_table += top_50_clients
-            table = Table(data_table)
+            # Client IDs and reasons are wrapped in Paragraphs so the table fits the page width
+            small_style = styles["BodyText"].clone('TableText', fontSize=6, leading=7)
+            data_table = [["Client ID", "Risk\nProbability", "Predicted\nClass", "Annual Revenue\nLoss ($)", "Top Reasons"]]
+            data_table += [
+                [Paragraph(client_id, small_style), f"{risk_prob:.4f}", predicted_class, f"{annual_revenue_loss:,.2f}",
+                 Paragraph(reasons, small_style)]
+                for client_id, risk_prob, predicted_class, annual_revenue_loss, reasons in top_clients['rows']
+            ]
+            table = Table(data_table, colWidths=[110, 60, 55, 80, 230], repeatRows=1)
             table.setStyle(TableStyle([
                 ('GRID', (0, 0), (-1, -1), 1, colors.black),
                 ('BACKGROUND', (0, 0), (-1, 0), colors.lavender),
                 ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
                 ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                ('FONTSIZE', (0, 0), (-1, -1), 7),
                 ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
                 ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
             ]))
             elements.append(table)
-    except Exception as e:
-        logging.error(f"Error generating high-risk clients list: {e}")
     elements.append(Spacer(1, 12))
 
     doc.build(elements)
+    manifest[os.path.abspath(pdf_path)] = [report_key, os.stat(pdf_path).st_mtime_ns]
+    _write_json(manifest_path, manifest)
     logging.info("PDF report generated successfully.")
+    return pdf_path
 
 if __name__ == '__main__':
     logging.info("Running reporting.py")
-    plot_confusion_matrix()
+    # The confusion matrix is built as a report section, so a warm rebuild reuses it
     generate_pdf_report()
+    publish_confusion_matrix()
@@ -0,0 +1,255 @@
+"""
+Persistent per-client score cache for incremental rescoring.
+
+Each client's last probabilities are stored under its Client_ID together with
+a hash of its encoded feature row and the version of the model that produced
+them. A rescoring run encodes and hashes the incoming rows in one vectorized
+pass and sends only new or changed rows (or every row after a model change)
+through predict_proba; everything else is read back from the cache.
+
+Usage:
+    python score_cache.py                       # rescore testdata.csv through the cache
+    python score_cache.py --simulate 0.02       # time a full scoring against a rescoring with 2% changed rows
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import contextlib
+import functools
+import logging
+import numpy as np
+import pandas as pd
+
+from config import MODEL_PATH, TEST_DATA_PATH
+from client_data import read_clients
+from encoding import ENCODER_FILE
+from model_registry import MODEL_FILE, load_deployed_encoder, release_dir
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+SCORE_CACHE_FILE = os.path.join(MODEL_PATH, 'score_cache.parquet')
+KEY_COLUMN = 'Client_ID'
+LOCK_TIMEOUT = 60  # Seconds to wait for another process to finish saving
+
+
+def row_hashes(X):
+    """
+    Returns one uint64 hash per row of an encoded feature matrix.
+    """
+    return pd.util.hash_pandas_object(pd.DataFrame(X, copy=False), index=False).to_numpy()
+
+
+@functools.lru_cache(maxsize=32)
+def _file_digest(path, stat_key):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def model_version(release=None):
+    """
+    Identifies the scores a release produces: the digests of its model and encoder pickles.
+
+    Files are hashed without unpickling them (and only again when they change), so scoring
+    with the NumPy export never imports scikit-learn.
+    """
+    if release is None:
+        release = release_dir()
+    digests = []
+    for name in (MODEL_FILE, ENCODER_FILE):
+        path = os.path.realpath(os.path.join(release, name))
+        if os.path.exists(path):
+            stat = os.stat(path)
+            digests.append(_file_digest(path, (stat.st_mtime_ns, stat.st_size))[:16])
+    return '-'.join(digests)
+
+
+@contextlib.contextmanager
+def _file_lock(path, timeout=LOCK_TIMEOUT):
+    # A lock file created with O_EXCL serializes writers on every platform
+    lock_path = f"{path}.lock"
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for {lock_path}; remove it if no other process is saving")
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
+
+
+class ScoreCache:
+    """
+    Client_ID -> (row hash, model version, class probabilities), stored as a Parquet file.
+
+    predict_proba collects the new scores in memory; save() merges them into the file,
+    dropping the scores of any other model version. Saves hold a lock file and merge
+    against the file as it is at that moment, so concurrent writers keep each other's entries.
+    """
+
+    def __init__(self, path=SCORE_CACHE_FILE):
+        self.path = path
+        self.counters = {'rows': 0, 'predicted': 0}
+        self._updates = []
+        self._load()
+
+    def _load(self):
+        self._frame = pd.read_parquet(self.path) if os.path.exists(self.path) else None
+        if self._frame is None or self._frame.empty:
+            self._index = pd.Index([], dtype=object)
+            return
+        self._index = pd.Index(self._frame[KEY_COLUMN])
+        self._hashes = self._frame['row_hash'].to_numpy()
+        self._versions = self._frame['model_version'].to_numpy()
+        self._proba = self._frame.filter(regex=r'^p\d+$').to_numpy()
+
+    def __len__(self):
+        return len(self._index)
+
+    def predict_proba(self, df, model, encoder, version):
+        """
+        Returns predict_proba for every row of df, predicting only rows without a valid cached score.
+
+        Args:
+            df (pandas.DataFrame): Raw client rows; rows without a Client_ID are always predicted.
+            model: Model exposing predict_proba and classes_.
+            encoder (FeatureEncoder): Encoder matching the model.
+            version (str): The model's version (see model_version); cached scores of other versions are stale.
+
+        Returns:
+            numpy.ndarray: Probabilities of shape (len(df), len(model.classes_)).
+        """
+        X = encoder.transform(df)
+        n_rows, n_classes = len(X), len(model.classes_)
+        stale = np.ones(n_rows, dtype=bool)
+        y_prob = np.empty((n_rows, n_classes))
+
+        keyed = KEY_COLUMN in df.columns
+        if keyed:
+            ids = df[KEY_COLUMN].astype('string').to_numpy(dtype=object, na_value=None)
+            hashes = row_hashes(X)
+            if len(self._index) and self._proba.shape[1] == n_classes:
+                # Store entries are unique per Client_ID, so get_indexer is a single hash lookup per row
+                pos = self._index.get_indexer(ids)
+                hit = np.flatnonzero(pos >= 0)
+                fresh = hit[(self._hashes[pos[hit]] == hashes[hit]) & (self._versions[pos[hit]] == version)]
+                y_prob[fresh] = self._proba[pos[fresh]]
+                stale[fresh] = False
+            stale |= pd.isna(ids)
+
+        if stale.any():
+            X_stale = pd.DataFrame(X[stale], columns=encoder.feature_names_, copy=False)
+            y_prob[stale] = model.predict_proba(X_stale)
+            if keyed:
+                keep = stale & ~pd.isna(ids)
+                update = pd.DataFrame({KEY_COLUMN: ids[keep], 'row_hash': hashes[keep], 'model_version': version})
+                for j in range(n_classes):
+                    update[f"p{j}"] = y_prob[keep, j]
+                self._updates.append(update)
+
+        self.counters['rows'] += n_rows
+        self.counters['predicted'] += int(stale.sum())
+        return y_prob
+
+    def save(self):
+        """
+        Merges the scores computed since the last save into the cache file (atomically).
+        """
+        if not self._updates:
+            return
+        updates = pd.concat(self._updates, ignore_index=True).drop_duplicates(KEY_COLUMN, keep='last')
+        version = updates['model_version'].iloc[-1]
+        updates = updates[updates['model_version'] == version]
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with _file_lock(self.path):
+            # Another process may have saved since this cache was loaded
+            self._load()
+            if self._frame is not None and not self._frame.empty:
+                old = self._frame[(self._frame['model_version'] == version)
+                                  & ~self._frame[KEY_COLUMN].isin(updates[KEY_COLUMN])]
+                updates = pd.concat([old, updates], ignore_index=True)
+            tmp_path = f"{self.path}.tmp-{os.getpid()}"
+            updates.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, self.path)
+        self._updates = []
+        self._load()
+
+
+def cached_predict_proba(df, cache=None, release=None):
+    """
+    Scores raw client rows with the deployed model through the score cache, and saves the cache.
+
+    Args:
+        df (pandas.DataFrame): Raw client rows with Client_ID.
+        cache (ScoreCache): Cache to use. Defaults to the one in MODEL_PATH.
+        release (str): Release directory to score with. Defaults to the current one.
+
+    Returns:
+        tuple: (probabilities as numpy.ndarray, model.classes_)
+    """
+    from numpy_model import load_scoring_model
+
+    if release is None:
+        release = release_dir()
+    if cache is None:
+        cache = ScoreCache()
+    model = load_scoring_model(release)
+    encoder = load_deployed_encoder(model, release)
+    y_prob = cache.predict_proba(df, model, encoder, model_version(release))
+    cache.save()
+    logging.info(f"Predicted {cache.counters['predicted']:,} of {cache.counters['rows']:,} rows, "
+                 f"the rest came from the score cache")
+    return y_prob, model.classes_
+
+
+def simulate_update(df, changed_fraction=0.02, seed=0):
+    """
+    Scores df into an empty cache, changes changed_fraction of the rows and rescores them.
+
+    Returns:
+        dict: seconds and predicted rows of the full scoring and of the incremental rescoring.
+    """
+    import tempfile
+
+    rng = np.random.default_rng(seed)
+    result = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'score_cache.parquet')
+        for run, frame in (('full', df), ('incremental', None)):
+            if frame is None:
+                frame = df.copy()
+                changed = rng.random(len(frame)) < changed_fraction
+                frame.loc[changed, 'Monthly_Spend'] = frame.loc[changed, 'Monthly_Spend'] * 1.1
+            cache = ScoreCache(path)
+            starttime = time.perf_counter()
+            cached_predict_proba(frame, cache)
+            result[run] = {'seconds': time.perf_counter() - starttime, 'predicted': cache.counters['predicted']}
+    result['rows'] = len(df)
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rescore testdata.csv through the per-client score cache.")
+    parser.add_argument('--simulate', type=float, metavar='FRACTION',
+                        help="Time full scoring vs rescoring after changing FRACTION of the rows (uses a temporary cache)")
+    args = parser.parse_args()
+
+    logging.info("Running score_cache.py")
+    test_df = read_clients(os.path.join(TEST_DATA_PATH, 'testdata.csv'))
+    if args.simulate is not None:
+        print(json.dumps(simulate_update(test_df, args.simulate), indent=4))
+    else:
+        cached_predict_proba(test_df)
@@ -2,96 +2,241 @@
 Author: Ibrahim Sherif
 Date: December, 2021
 This script is used for evaluating a model on test data and saving evaluation metrics.
+Run `python scoring.py` to evaluate the deployed model, `python scoring.py retrain` to tune and retrain,
+or `python scoring.py memory --rows N` to measure preprocessing memory on synthetic data.
 """
 
 import os
 import sys
+import json
+import time
 import pickle
+import argparse
 import logging
+import numpy as np
 import pandas as pd
-from sklearn.metrics import f1_score, precision_score, recall_score
-from sklearn.model_selection import train_test_split, GridSearchCV
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.utils import resample
 from config import MODEL_PATH, TEST_DATA_PATH
+from client_data import read_clients
+from encoding import ENCODER_FILE, FeatureEncoder
+from metrics import classification_metrics
+from model_registry import (registry, MODEL_FILE, load_deployed_model, load_deployed_encoder, release_dir,
+                            current_version)
+
+# scikit-learn's ensemble and model selection modules (and tuning.py) are only needed to
+# retrain, so they are imported in tune_and_train_model; evaluation starts without them
 
 logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 
-def preprocess_data(df):
+def balanced_sample_indices(y, random_state=42):
+    """
+    Returns row indices that oversample every class to the size of the largest one.
+
+    Each class keeps all of its rows and draws the shortfall with replacement, so the
+    balanced set is a single index array into the original rows rather than a frame copy.
+
+    Parameters:
+    - y (np.ndarray): Encoded target.
+    - random_state (int): Seed of the draws.
+
+    Returns:
+    - indices (np.ndarray): Row indices of the balanced set, grouped by class.
+    """
+    rng = np.random.default_rng(random_state)
+    classes, y_idx, counts = np.unique(y, return_inverse=True, return_counts=True)
+    order = np.argsort(y_idx, kind='stable')
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    target = counts.max()
+
+    indices = []
+    for start, count in zip(starts, counts):
+        rows = order[start:start + count]
+        indices.append(rows)
+        indices.append(rows[rng.integers(0, count, size=target - count)])
+    return np.concatenate(indices)
+
+def preprocess_data(df, balance='oversample'):
     """
     Preprocesses the data by encoding categorical variables, handling imbalance, and scaling features.
-    
+
+    The features are encoded once into a float32 matrix; oversampling gathers rows by index
+    and the scaler standardizes the result in place. The scaler is stored in the returned
+    encoder, so anything scoring through it applies the same transform.
+
     Parameters:
     - df (pd.DataFrame): The raw dataframe to preprocess.
+    - balance (str): 'oversample' to oversample every class to the majority size, or 'none'
+      to keep the rows as they are and rely on class_weight='balanced' in the model.
 
     Returns:
-    - X (pd.DataFrame): The preprocessed feature set.
+    - X (pd.DataFrame): The preprocessed feature set (float32).
     - y (pd.Series): The target variable.
+    - encoder (FeatureEncoder): The fitted feature encoder, including the scaler.
+    """
+    # Encode categorical features (the encoder drops 'Attrition_Risk' and 'Client_ID')
+    encoder = FeatureEncoder.fit(df)
+    X = encoder.transform(df)
+
+    # Encode the target column 'Attrition_Risk' with the label order the encoder records
+    y = encoder.encode_target(df['Attrition_Risk'])
+
+    # Handle class imbalance by oversampling every class to the majority count
+    if balance == 'oversample':
+        indices = balanced_sample_indices(y)
+        X, y = X[indices], y[indices]
+    elif balance != 'none':
+        raise ValueError(f"Unknown balance mode: {balance}")
+
+    # Standardize features in place; the encoder keeps the scaler for inference
+    encoder.fit_scaler(X)
+
+    X = pd.DataFrame(X, columns=encoder.feature_names_, copy=False)
+    return X, pd.Series(y, name='Attrition_Risk_Encoded'), encoder
+
+def preprocess_memory_report(n_rows=10_000_000, seed=0):
     """
-    # Encode the target column 'Attrition_Risk'
-    le = LabelEncoder()
-    df['Attrition_Risk_Encoded'] = le.fit_transform(df['Attrition_Risk'])
-    y = df.pop('Attrition_Risk_Encoded')
+    Measures the peak memory preprocess_data allocates for n_rows synthetic clients.
 
-    # Drop irrelevant columns and encode categorical features
-    X = df.drop(['Attrition_Risk', 'Client_ID'], axis=1)
-    X = pd.get_dummies(X, drop_first=True)  # One-hot encode categorical variables
+    Returns:
+    - report (dict): rows, input_mb, peak_mb (traced allocations above the input frame),
+      seconds and the process's peak RSS in MB.
+    """
+    import resource
+    import tracemalloc
+    from synthetic import make_clients
 
-    # Handle class imbalance through resampling (oversampling minority class)
-    df_balanced = pd.concat([X, y], axis=1)
-    minority_class = df_balanced[df_balanced['Attrition_Risk_Encoded'] == 1]
-    majority_class = df_balanced[df_balanced['Attrition_Risk_Encoded'] == 0]
-    minority_upsampled = resample(minority_class, replace=True, n_samples=len(majority_class), random_state=42)
-    df_balanced = pd.concat([majority_class, minority_upsampled])
+    df = make_clients(n_rows, seed=seed, client_ids=False)
+    input_mb = df.memory_usage(deep=True).sum() / 2**20
 
-    # Split features and target variable after balancing
-    X = df_balanced.drop('Attrition_Risk_Encoded', axis=1)
-    y = df_balanced['Attrition_Risk_Encoded']
+    tracemalloc.start()
+    starttime = time.perf_counter()
+    X, y, _ = preprocess_data(df)
+    seconds = time.perf_counter() - starttime
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
 
-    # Standardize numerical features
-    scaler = StandardScaler()
-    X[X.columns] = scaler.fit_transform(X[X.columns])
+    report = {
+        'rows': n_rows,
+        'balanced_rows': len(X),
+        'input_mb': round(float(input_mb), 1),
+        'output_mb': round(float(X.memory_usage().sum() + y.memory_usage()) / 2**20, 1),
+        'peak_mb': round(peak / 2**20, 1),
+        'seconds': round(seconds, 2),
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    logging.info(f"preprocess_data on {n_rows} rows: {report}")
+    return report
 
-    return X, y
+PARAM_GRID = {
+    'n_estimators': [50, 100, 200],
+    'max_depth': [None, 10, 20, 30],
+    'min_samples_split': [2, 5, 10],
+    'min_samples_leaf': [1, 2, 4]
+}
 
-def tune_and_train_model(X, y):
+def tune_and_train_model(X, y, search='halving'):
     """
     Perform hyperparameter tuning on a RandomForestClassifier to optimize recall, precision, and F1 score.
 
     Parameters:
     - X (pd.DataFrame): The feature set.
     - y (pd.Series): The target variable.
+    - search (str): 'halving' for the cached successive-halving search (see tuning.py),
+      'grid' for the exhaustive GridSearchCV over all 540 fits.
 
     Returns:
     - model (sklearn model): The trained model.
     """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.model_selection import GridSearchCV
+    from tuning import successive_halving_search
+
+    starttime = time.perf_counter()
+    if search == 'halving':
+        model = RandomForestClassifier(random_state=42, class_weight='balanced', n_jobs=-1)
+        best_model, best_params, _ = successive_halving_search(model, PARAM_GRID, X, y, cv=5)
+        logging.info(f"Best model parameters: {best_params} ({time.perf_counter() - starttime:.1f} sec)")
+        return best_model
+
     # Set up RandomForest model with GridSearch for hyperparameter tuning
     model = RandomForestClassifier(random_state=42, class_weight='balanced')
-    param_grid = {
-        'n_estimators': [50, 100, 200],
-        'max_depth': [None, 10, 20, 30],
-        'min_samples_split': [2, 5, 10],
-        'min_samples_leaf': [1, 2, 4]
-    }
-    grid_search = GridSearchCV(model, param_grid, scoring='f1_weighted', cv=5, n_jobs=-1)
+    grid_search = GridSearchCV(model, PARAM_GRID, scoring='f1_weighted', cv=5, n_jobs=-1)
     grid_search.fit(X, y)
 
     # Return the best model from grid search
     best_model = grid_search.best_estimator_
-    logging.info(f"Best model parameters: {grid_search.best_params_}")
+    logging.info(f"Best model parameters: {grid_search.best_params_} ({time.perf_counter() - starttime:.1f} sec)")
     return best_model
 
-def score_model():
+def _save_scores(metrics):
+    """
+    Writes latestscore.txt (f1/precision/recall, as before) and the full metrics to latestscore.json.
+    """
+    logging.info(f"f1 score = {metrics['f1']}")
+    logging.info(f"precision = {metrics['precision']}")
+    logging.info(f"recall = {metrics['recall']}")
+
+    # Print metrics to console
+    print(f"F1 Score: {metrics['f1']}")
+    print(f"Precision: {metrics['precision']}")
+    print(f"Recall: {metrics['recall']}")
+
+    # Save scores to text file
+    logging.info("Saving scores to text file")
+    with open(os.path.join(MODEL_PATH, 'latestscore.txt'), 'w') as file:
+        file.write(f"f1 score = {metrics['f1']}\n")
+        file.write(f"precision = {metrics['precision']}\n")
+        file.write(f"recall = {metrics['recall']}\n")
+    with open(os.path.join(MODEL_PATH, 'latestscore.json'), 'w') as file:
+        json.dump(metrics, file, indent=4)
+
+def score_model(candidate=False):
+    """
+    Evaluates the deployed model on the test data without retraining it.
+
+    The cached model and encoder are used, testdata.csv is encoded once and predicted once, and
+    F1 score, precision, recall and the confusion matrix are derived from that single prediction
+    array. Saves the results to latestscore.txt / latestscore.json and prints them to the console.
+
+    Args:
+        candidate (bool): Evaluate the trained model in MODEL_PATH (the next deployment) instead of
+            the deployed one. deployment.py only publishes metrics whose model_sha256 matches the
+            model it deploys.
+    """
+    logging.info("Loading testdata.csv")
+    test_df = read_clients(os.path.join(TEST_DATA_PATH, 'testdata.csv'))
+
+    # MODEL_PATH holds trainedmodel.pkl and encoder.pkl in the same layout as a release
+    release = MODEL_PATH if candidate else release_dir()
+    model = load_deployed_model(release)
+    encoder = load_deployed_encoder(model, release)
+    # The model's classes are codes of the training labels; a class missing from the test set must not shift them
+    y = encoder.encode_target(test_df['Attrition_Risk'])
+    known = y >= 0
+    if not known.all():
+        logging.warning(f"Skipping {int((~known).sum())} test rows with a missing or unknown Attrition_Risk")
+        test_df, y = test_df[known], y[known]
+    X = encoder.transform_frame(test_df)
+
+    logging.info("Predicting test data")
+    y_pred = model.predict(X)
+
+    metrics = classification_metrics(y, y_pred, model.classes_)
+    metrics['model_sha256'] = registry.digest(os.path.join(release, MODEL_FILE))
+    metrics['release'] = os.path.basename(release) if current_version() and not candidate else None
+    metrics['n_samples'] = int(len(y))
+    _save_scores(metrics)
+    return metrics
+
+def retrain_model():
     """
-    Loads and preprocesses the test data, trains an optimized model, and calculates F1 score, precision, 
-    and recall. Saves the results to the latestscore.txt file and prints them to the console.
+    Loads and preprocesses the test data, trains an optimized model, and calculates F1 score, precision,
+    and recall. Saves the results to the latestscore.txt file and the model and encoder to MODEL_PATH.
     """
     logging.info("Loading testdata.csv")
-    test_df = pd.read_csv(os.path.join(TEST_DATA_PATH, 'testdata.csv'))
+    test_df = read_clients(os.path.join(TEST_DATA_PATH, 'testdata.csv'))
 
     logging.info("Preparing test data")
-    X, y = preprocess_data(test_df)
+    X, y, encoder = preprocess_data(test_df)
 
     logging.info("Tuning and training model")
     model = tune_and_train_model(X, y)
@@ -100,31 +245,29 @@ def score_model():
     y_pred = model.predict(X)
 
     # Calculate evaluation metrics
-    f1 = f1_score(y, y_pred, average='weighted')
-    precision = precision_score(y, y_pred, average='weighted')
-    recall = recall_score(y, y_pred, average='weighted')
-
-    logging.info(f"f1 score = {f1}")
-    logging.info(f"precision = {precision}")
-    logging.info(f"recall = {recall}")
+    metrics = classification_metrics(np.asarray(y), y_pred, model.classes_)
+    metrics['n_samples'] = int(len(y))
 
-    # Print metrics to console
-    print(f"F1 Score: {f1}")
-    print(f"Precision: {precision}")
-    print(f"Recall: {recall}")
-
-    # Save scores to text file
-    logging.info("Saving scores to text file")
-    with open(os.path.join(MODEL_PATH, 'latestscore.txt'), 'w') as file:
-        file.write(f"f1 score = {f1}\n")
-        file.write(f"precision = {precision}\n")
-        file.write(f"recall = {recall}\n")
-
-    # Save the model to disk
+    # Save the model to disk; the scores name the pickle they belong to
     with open(os.path.join(MODEL_PATH, 'trainedmodel.pkl'), 'wb') as model_file:
         pickle.dump(model, model_file)
+    encoder.save(os.path.join(MODEL_PATH, ENCODER_FILE))
+    metrics['model_sha256'] = registry.digest(os.path.join(MODEL_PATH, 'trainedmodel.pkl'))
+    _save_scores(metrics)
     logging.info("Model saved successfully")
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Evaluate the deployed model, or retrain it.")
+    parser.add_argument('command', nargs='?', choices=['evaluate', 'retrain', 'memory'], default='evaluate')
+    parser.add_argument('--rows', type=int, default=10_000_000, help="Synthetic rows for the memory report")
+    parser.add_argument('--candidate', action='store_true',
+                        help="Evaluate the trained model in MODEL_PATH instead of the deployed one")
+    args = parser.parse_args()
+
     logging.info("Running scoring.py")
-    score_model()
+    if args.command == 'retrain':
+        retrain_model()
+    elif args.command == 'memory':
+        print(json.dumps(preprocess_memory_report(args.rows), indent=4))
+    else:
+        score_model(candidate=args.candidate)
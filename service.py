@@ -0,0 +1,219 @@
+"""
+HTTP prediction service for the deployed attrition model.
+
+Concurrent single-client requests are queued and scored together: a
+background thread collects requests for up to MAX_WAIT_MS (or MAX_BATCH_SIZE
+requests) and runs one predict_proba call for the whole micro-batch.
+
+Endpoints:
+    GET  /health          live release, model digest and registry counters
+    POST /predict         one client record (JSON object)
+    POST /predict/batch   a list of client records (JSON array), scored in one call
+
+Usage:
+    python service.py --port 8000
+    gunicorn --worker-class gthread --workers 2 --threads 64 --bind 0.0.0.0:8000 service:app
+"""
+
+import os
+import sys
+import math
+import time
+import queue
+import argparse
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from concurrent.futures import Future
+from flask import Flask, jsonify, request
+
+from model_registry import (registry, MODEL_FILE, load_deployed_model, load_deployed_encoder, release_dir,
+                            current_version)
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+MAX_BATCH_SIZE = 256
+MAX_WAIT_MS = 5
+REQUEST_TIMEOUT = 10
+
+
+def _score_records(records):
+    """
+    Scores a list of raw client records with the deployed model in one predict_proba call.
+
+    Returns:
+        list[dict]: Client_ID, predicted_class, probability_of_leaving and per-class probabilities.
+    """
+    # Pin one release for the whole micro-batch, so model and encoder always match
+    release = release_dir()
+    model = load_deployed_model(release)
+    encoder = load_deployed_encoder(model, release)
+    # A field absent from a record encodes as zero, as a column absent from a whole batch does;
+    # left to DataFrame.from_records it would become NaN whenever another record has it
+    defaults = dict.fromkeys(encoder.numeric_columns_, 0.0)
+    frame = pd.DataFrame.from_records([{**defaults, **record} for record in records])
+    y_prob = model.predict_proba(encoder.transform_frame(frame))
+    classes = [c.item() if isinstance(c, np.generic) else c for c in model.classes_]
+    predicted = y_prob.argmax(axis=1)
+    return [
+        {
+            'Client_ID': record.get('Client_ID'),
+            'predicted_class': classes[predicted[i]],
+            'probability_of_leaving': float(y_prob[i, 1]),
+            'probabilities': {str(c): float(p) for c, p in zip(classes, y_prob[i])},
+        }
+        for i, record in enumerate(records)
+    ]
+
+
+class MicroBatcher:
+    """
+    Collects single-record requests from many threads and scores them in batches.
+
+    The worker thread is started lazily so it always runs in the process that
+    serves requests (gunicorn forks workers after importing this module).
+    """
+
+    def __init__(self, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+        self.batches = 0
+        self.records = 0
+
+    def submit(self, record):
+        """
+        Queues one record for scoring.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the record's result dict.
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((record, future))
+        return future
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                threading.Thread(target=self._run, name='micro-batcher', daemon=True).start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._score(batch)
+
+    def _score(self, batch):
+        records = [record for record, _ in batch]
+        try:
+            results = _score_records(records)
+        except Exception as e:
+            # Rescore one record at a time, so only the records that cannot be scored fail
+            logging.error(f"Error scoring micro-batch of {len(batch)}, rescoring its records one by one: {e}")
+            for record, future in batch:
+                try:
+                    future.set_result(_score_records([record])[0])
+                except Exception as record_error:
+                    future.set_exception(record_error)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+        self.batches += 1
+        self.records += len(batch)
+
+
+def _validate_record(record, encoder):
+    """
+    Returns an error message for a malformed client record, or None if it looks scoreable.
+
+    Numeric features must be finite numbers: the model cannot score missing values. A field
+    left out of the record encodes as zero (see _score_records), but null is rejected.
+    """
+    if not isinstance(record, dict):
+        return "Each client record must be a JSON object."
+    for col in encoder.numeric_columns_:
+        if col not in record:
+            continue
+        value = record[col]
+        if value is None:
+            return f"Field '{col}' must not be null."
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return f"Field '{col}' must be a finite number."
+        try:
+            # JSON integers are unbounded; float() overflows on those no float can hold
+            value = float(value)
+        except (OverflowError, TypeError, ValueError):
+            return f"Field '{col}' must be a finite number."
+        if not math.isfinite(value):
+            return f"Field '{col}' must be a finite number."
+    return None
+
+
+app = Flask(__name__)
+batcher = MicroBatcher()
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({
+        'status': 'ok',
+        'release': current_version(),
+        'model_sha256': registry.digest(os.path.join(release_dir(), MODEL_FILE)),
+        'registry': registry.counters(),
+        'micro_batches': batcher.batches,
+        'micro_batched_records': batcher.records,
+    })
+
+
+@app.route('/predict', methods=['POST'])
+def predict():
+    record = request.get_json(silent=True)
+    error = _validate_record(record, load_deployed_encoder())
+    if error:
+        return jsonify({'error': error}), 400
+    try:
+        return jsonify(batcher.submit(record).result(timeout=REQUEST_TIMEOUT))
+    except Exception as e:
+        return jsonify({'error': f"Prediction failed: {e}"}), 500
+
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    records = request.get_json(silent=True)
+    if not isinstance(records, list) or not records:
+        return jsonify({'error': "Request body must be a non-empty JSON array of client records."}), 400
+    encoder = load_deployed_encoder()
+    for record in records:
+        error = _validate_record(record, encoder)
+        if error:
+            return jsonify({'error': error}), 400
+    try:
+        return jsonify(_score_records(records))
+    except Exception as e:
+        return jsonify({'error': f"Prediction failed: {e}"}), 500
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the prediction service (development server).")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+
+    logging.info("Running service.py")
+    app.run(host=args.host, port=args.port, threaded=True)
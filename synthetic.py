@@ -0,0 +1,337 @@
+"""
+Synthetic client data for benchmarks, memory measurements and scale testing.
+
+make_clients() draws rows with the same columns, value ranges and class mix as
+finaldata.csv, each column independently, fully vectorized so tens of millions
+of rows can be generated in seconds.
+
+ClientDataGenerator learns the data instead: the class mix of Attrition_Risk
+and, per class, a Gaussian copula over the other columns (empirical marginals
+plus the rank correlations between them). It streams any number of rows in
+vectorized chunks to CSV or Parquet, deterministically for a given seed.
+
+Usage:
+    python synthetic.py clients.parquet --rows 100000000 --seed 0
+    python synthetic.py clients.csv --rows 1000000 --source finaldata.csv
+"""
+
+import os
+import sys
+import json
+import argparse
+import logging
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pandas.api.types import is_integer_dtype, is_numeric_dtype
+from scipy.special import ndtr, ndtri
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+RISK_LEVELS = np.array(['High', 'Low', 'Medium'], dtype=object)
+RISK_PROBABILITIES = [0.10, 0.60, 0.30]
+GENDERS = np.array(['Female', 'Male'], dtype=object)
+
+_HEX_DIGITS = np.frombuffer(b'0123456789abcdef', dtype='S1')
+_UUID_DASHES = (8, 12, 16, 20)
+
+
+def random_client_ids(n_rows, rng):
+    """
+    Returns n_rows random version-4 UUID strings, built with array operations.
+    """
+    raw = rng.integers(0, 256, size=(n_rows, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    nibbles = np.empty((n_rows, 32), dtype=np.uint8)
+    nibbles[:, 0::2] = raw >> 4
+    nibbles[:, 1::2] = raw & 0x0F
+    chars = _HEX_DIGITS[nibbles]
+    chars = np.insert(chars, _UUID_DASHES, b'-', axis=1)
+    return np.ascontiguousarray(chars).view('S36').ravel().astype(str).astype(object)
+
+
+def make_clients(n_rows, seed=0, client_ids=True, revenue_loss=True):
+    """
+    Generates synthetic client rows shaped like finaldata.csv.
+
+    Args:
+        n_rows (int): Number of rows.
+        seed (int): Random seed; equal seeds give identical frames.
+        client_ids (bool): Include the Client_ID column (the most memory-hungry one).
+        revenue_loss (bool): Include Revenue_Loss (absent from testdata.csv).
+
+    Returns:
+        pandas.DataFrame
+    """
+    rng = np.random.default_rng(seed)
+    data = {}
+    if client_ids:
+        data['Client_ID'] = random_client_ids(n_rows, rng)
+    data['Age'] = rng.integers(20, 70, size=n_rows)
+    data['Gender'] = pd.Categorical.from_codes(rng.integers(0, 2, size=n_rows), GENDERS)
+    data['Tenure_Years'] = rng.integers(1, 10, size=n_rows)
+    data['Monthly_Spend'] = np.round(rng.normal(500.0, 150.0, size=n_rows), 2)
+    data['Complaints'] = rng.poisson(0.5, size=n_rows)
+    data['Overdue_Payments'] = rng.poisson(1.0, size=n_rows)
+    if revenue_loss:
+        data['Revenue_Loss'] = rng.lognormal(13.6, 0.8, size=n_rows)
+    data['Attrition_Risk'] = pd.Categorical.from_codes(
+        rng.choice(len(RISK_LEVELS), size=n_rows, p=RISK_PROBABILITIES), RISK_LEVELS)
+    return pd.DataFrame(data)
+
+
+DEFAULT_CHUNKSIZE = 1_000_000
+MAX_DISCRETE_VALUES = 32  # Numeric columns with at most this many distinct values are sampled as discrete
+QUANTILE_GRID_SIZE = 1025
+
+
+def _decimals(values, max_decimals=6):
+    # Smallest number of decimals that represents every value, so generated amounts look like the source
+    for decimals in range(max_decimals + 1):
+        if np.allclose(values, np.round(values, decimals), rtol=0, atol=1e-9):
+            return decimals
+    return None
+
+
+def _fit_marginal(series):
+    if is_integer_dtype(series):
+        values = series.to_numpy(dtype=np.int64)
+    elif is_numeric_dtype(series):
+        values = series.to_numpy(dtype=np.float64)
+    else:
+        values = series.astype(str).to_numpy(dtype=object)
+
+    if values.dtype != np.float64 or len(pd.unique(values)) <= MAX_DISCRETE_VALUES:
+        support, counts = np.unique(values, return_counts=True)
+        return {
+            'kind': 'discrete',
+            'dtype': str(values.dtype),
+            'support': support.tolist(),
+            'cdf': (np.cumsum(counts) / counts.sum()).tolist(),
+        }
+    return {
+        'kind': 'continuous',
+        'quantiles': np.quantile(values, np.linspace(0, 1, QUANTILE_GRID_SIZE)).tolist(),
+        'decimals': _decimals(values),
+    }
+
+
+def _normal_scores(series):
+    # Mid-ranks mapped through the inverse normal CDF; ties (discrete values) share a score
+    ranks = series.rank(method='average').to_numpy()
+    return ndtri((ranks - 0.5) / len(ranks))
+
+
+class GaussianCopula:
+    """
+    Joint distribution of a set of columns: empirical marginals tied together by a
+    Gaussian copula whose correlation is estimated from normal scores of the ranks.
+    """
+
+    def __init__(self, marginals, correlation):
+        self.marginals = marginals  # {column: marginal spec}
+        self.correlation = np.asarray(correlation, dtype=np.float64)
+        eigenvalues, eigenvectors = np.linalg.eigh(self.correlation)
+        # Clip to the nearest positive definite matrix so the Cholesky factor always exists
+        clipped = (eigenvectors * np.maximum(eigenvalues, 1e-6)) @ eigenvectors.T
+        scale = np.sqrt(np.diag(clipped))
+        self._cholesky = np.linalg.cholesky(clipped / np.outer(scale, scale))
+
+    @classmethod
+    def fit(cls, df):
+        marginals = {col: _fit_marginal(df[col]) for col in df.columns}
+        if len(df) > 1 and df.shape[1] > 1:
+            scores = np.column_stack([_normal_scores(df[col]) for col in df.columns])
+            correlation = np.nan_to_num(np.corrcoef(scores, rowvar=False))
+            np.fill_diagonal(correlation, 1.0)
+        else:
+            correlation = np.eye(df.shape[1])
+        return cls(marginals, correlation)
+
+    def sample(self, n_rows, rng):
+        """
+        Returns {column: numpy array} of n_rows draws.
+        """
+        z = rng.standard_normal((n_rows, len(self.marginals))) @ self._cholesky.T
+        u = ndtr(z)
+        columns = {}
+        for j, (col, marginal) in enumerate(self.marginals.items()):
+            if marginal['kind'] == 'discrete':
+                support = np.asarray(marginal['support'], dtype=marginal['dtype'])
+                idx = np.searchsorted(np.asarray(marginal['cdf']), u[:, j], side='right')
+                columns[col] = support[np.minimum(idx, len(support) - 1)]
+            else:
+                quantiles = np.asarray(marginal['quantiles'])
+                values = np.interp(u[:, j], np.linspace(0, 1, len(quantiles)), quantiles)
+                if marginal['decimals'] is not None:
+                    values = np.round(values, marginal['decimals'])
+                columns[col] = values
+        return columns
+
+    def to_dict(self):
+        return {'marginals': self.marginals, 'correlation': self.correlation.tolist()}
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(state['marginals'], state['correlation'])
+
+
+class ClientDataGenerator:
+    """
+    Learns client data and generates arbitrarily many rows like it.
+
+    The stratify column (Attrition_Risk) is drawn from its observed frequencies and the
+    remaining columns from a Gaussian copula fitted on the rows of that class, so
+    class-dependent marginals (e.g. Revenue_Loss by risk level) are reproduced as well
+    as the correlations within each class. Client_ID is generated, not learned.
+    """
+
+    def __init__(self, columns, stratify, levels, probabilities, copulas):
+        self.columns = list(columns)
+        self.stratify = stratify
+        self.levels = list(levels)
+        self.probabilities = np.asarray(probabilities, dtype=np.float64)
+        self.copulas = list(copulas)
+
+    @classmethod
+    def fit(cls, df, stratify='Attrition_Risk', max_rows=1_000_000, seed=0):
+        """
+        Args:
+            df (pandas.DataFrame): Source client rows; rows with missing values are ignored.
+            stratify (str): Categorical column whose classes get their own copula.
+            max_rows (int): Fit on a random sample of at most this many rows.
+            seed (int): Seed of that sample.
+
+        Returns:
+            ClientDataGenerator
+        """
+        df = df.drop(columns=['Client_ID'], errors='ignore').dropna()
+        if len(df) > max_rows:
+            df = df.sample(max_rows, random_state=seed)
+        features = df.drop(columns=[stratify])
+
+        levels, counts = np.unique(df[stratify].astype(str).to_numpy(), return_counts=True)
+        copulas = [GaussianCopula.fit(features[df[stratify].astype(str).to_numpy() == level]) for level in levels]
+        return cls(['Client_ID'] + list(df.columns), stratify, levels.tolist(), counts / counts.sum(), copulas)
+
+    def sample(self, n_rows, rng, client_ids=True):
+        """
+        Generates n_rows rows with the source's column order.
+        """
+        classes = rng.choice(len(self.levels), size=n_rows, p=self.probabilities)
+        data = {}
+        for k, copula in enumerate(self.copulas):
+            rows = np.flatnonzero(classes == k)
+            if len(rows) == 0:
+                continue
+            for col, values in copula.sample(len(rows), rng).items():
+                if col not in data:
+                    data[col] = np.empty(n_rows, dtype=values.dtype)
+                data[col][rows] = values
+
+        frame = {}
+        for col in self.columns:
+            if col == 'Client_ID':
+                if client_ids:
+                    frame[col] = random_client_ids(n_rows, rng)
+            elif col == self.stratify:
+                frame[col] = pd.Categorical.from_codes(classes, self.levels)
+            elif data[col].dtype == object:
+                frame[col] = pd.Categorical(data[col])
+            else:
+                frame[col] = data[col]
+        return pd.DataFrame(frame)
+
+    def iter_chunks(self, n_rows, seed=0, chunksize=DEFAULT_CHUNKSIZE, client_ids=True):
+        """
+        Yields n_rows rows in DataFrames of at most chunksize rows.
+
+        Chunk i is drawn from its own generator seeded with (seed, i), so a given seed and
+        chunk size always produce the same data.
+        """
+        for i, start in enumerate(range(0, n_rows, chunksize)):
+            rng = np.random.default_rng([seed, i])
+            yield self.sample(min(chunksize, n_rows - start), rng, client_ids=client_ids)
+
+    def write_csv(self, path, n_rows, seed=0, chunksize=DEFAULT_CHUNKSIZE, client_ids=True):
+        tmp_path = f"{path}.part"
+        with open(tmp_path, 'w', newline='') as out_file:
+            for i, chunk in enumerate(self.iter_chunks(n_rows, seed, chunksize, client_ids)):
+                chunk.to_csv(out_file, header=(i == 0), index=False)
+        os.replace(tmp_path, path)
+
+    def write_parquet(self, path, n_rows, seed=0, chunksize=DEFAULT_CHUNKSIZE, client_ids=True):
+        """
+        Writes a single Parquet file with one row group per chunk, typed like the data store
+        (a store can be built by writing to <store_dir>/part-00000.parquet).
+        """
+        from data_store import STORE_DTYPES
+
+        tmp_path = f"{path}.part"
+        writer = None
+        try:
+            for chunk in self.iter_chunks(n_rows, seed, chunksize, client_ids):
+                chunk = chunk.astype({col: dtype for col, dtype in STORE_DTYPES.items() if col in chunk.columns})
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        os.replace(tmp_path, path)
+
+    def to_dict(self):
+        return {
+            'columns': self.columns,
+            'stratify': self.stratify,
+            'levels': self.levels,
+            'probabilities': self.probabilities.tolist(),
+            'copulas': [copula.to_dict() for copula in self.copulas],
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        copulas = [GaussianCopula.from_dict(copula) for copula in state['copulas']]
+        return cls(state['columns'], state['stratify'], state['levels'], state['probabilities'], copulas)
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate synthetic client data learned from the ingested data.")
+    parser.add_argument('output_path', help="Destination .csv or .parquet file")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Rows to generate")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="Rows generated at a time")
+    parser.add_argument('--source', help="CSV to learn from (defaults to the ingested data store)")
+    parser.add_argument('--model', help="Load the generator from this JSON file, or save it there after fitting")
+    args = parser.parse_args()
+
+    logging.info("Running synthetic.py")
+    if args.model and os.path.exists(args.model):
+        generator = ClientDataGenerator.load(args.model)
+    else:
+        if args.source:
+            source_df = pd.read_csv(args.source)
+        else:
+            from data_store import read_store
+            source_df = read_store()
+        generator = ClientDataGenerator.fit(source_df, seed=args.seed)
+        if args.model:
+            generator.save(args.model)
+
+    if args.output_path.endswith('.parquet'):
+        generator.write_parquet(args.output_path, args.rows, args.seed, args.chunksize)
+    else:
+        generator.write_csv(args.output_path, args.rows, args.seed, args.chunksize)
+    logging.info(f"Wrote {args.rows} rows to {args.output_path}")
@@ -0,0 +1,77 @@
+"""
+Shared test setup.
+
+config.py reads config.json once per process, when it is first imported, so the
+tests point it at a temporary directory before any project module is loaded.
+Every path of the config lives there except test_data_path, which is the
+repository's sourcedata.
+"""
+
+import os
+import json
+import shutil
+import tempfile
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORK_DIR = tempfile.mkdtemp(prefix='attrition-tests-')
+
+with open(os.path.join(WORK_DIR, 'config.json'), 'w') as config_file:
+    json.dump({
+        'input_folder_path': os.path.join(WORK_DIR, 'input'),
+        'output_folder_path': os.path.join(WORK_DIR, 'ingested'),
+        'test_data_path': os.path.join(REPO_DIR, 'sourcedata'),
+        'output_model_path': os.path.join(WORK_DIR, 'models'),
+        'prod_deployment_path': os.path.join(WORK_DIR, 'prod'),
+    }, config_file)
+
+_cwd = os.getcwd()
+os.chdir(WORK_DIR)
+try:
+    import config as paths
+finally:
+    os.chdir(_cwd)
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def work_dirs():
+    """
+    Empties the input, data, model and deployment directories and the in-process model cache.
+    """
+    from model_registry import registry
+
+    for path in (paths.INPUT_FOLDER_PATH, paths.DATA_PATH, paths.MODEL_PATH, paths.PROD_DEPLOYMENT_PATH):
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+    registry.invalidate()
+    return paths
+
+
+@pytest.fixture
+def train_model(work_dirs):
+    """
+    Returns train(seed), which fits training.py's model on synthetic clients and writes
+    it to MODEL_PATH with its encoder and the other files deploy_model requires.
+    """
+    import pickle
+    from encoding import ENCODER_FILE
+    from synthetic import make_clients
+    from training import fit_model
+
+    def train(seed=0, n_rows=2_000):
+        model, encoder = fit_model(make_clients(n_rows, seed=seed))
+        with open(os.path.join(work_dirs.MODEL_PATH, 'trainedmodel.pkl'), 'wb') as f:
+            pickle.dump(model, f)
+        encoder.save(os.path.join(work_dirs.MODEL_PATH, ENCODER_FILE))
+        with open(os.path.join(work_dirs.MODEL_PATH, 'latestscore.txt'), 'w') as f:
+            f.write("f1 score = 0.5\n")
+        with open(os.path.join(work_dirs.INPUT_FOLDER_PATH, 'ingestedfiles.txt'), 'w') as f:
+            f.write("synthetic.csv\n")
+        return model, encoder
+
+    return train
@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from client_index import ClientIndex, append_to_index, write_index
+from synthetic import make_clients
+
+CATEGORIES = {'Gender': ['Female', 'Male'], 'Attrition_Risk': ['High', 'Low', 'Medium']}
+
+
+def _build(df, index_dir):
+    return write_index([df], len(df), list(df.columns), CATEGORIES, index_dir)
+
+
+def test_appended_clients_match_a_full_rebuild(tmp_path):
+    old, new = make_clients(5_000, seed=1), make_clients(700, seed=2)
+    appended = _build(old, str(tmp_path / 'appended'))
+    append_to_index(new, appended, block_rows=1_000)
+    rebuilt = _build(pd.concat([old, new], ignore_index=True), str(tmp_path / 'rebuilt'))
+
+    appended, rebuilt = ClientIndex(appended), ClientIndex(rebuilt)
+    for name in ('keys', 'offsets', 'rows'):
+        assert np.array_equal(getattr(appended, name), getattr(rebuilt, name)), name
+
+    client = new.iloc[123]
+    row = appended.get(client['Client_ID'])
+    assert row['Monthly_Spend'] == client['Monthly_Spend']
+    assert row['Gender'] == client['Gender']
+    assert appended.get(old['Client_ID'].iloc[0].upper())['Age'] == old['Age'].iloc[0]
+    assert appended.get('00000000-0000-0000-0000-000000000000') is None
+
+
+def test_append_rejects_clients_already_indexed(tmp_path):
+    df = make_clients(100, seed=1)
+    index_dir = _build(df, str(tmp_path / 'index'))
+    with pytest.raises(ValueError):
+        append_to_index(df.iloc[:5], index_dir)
+    assert len(ClientIndex(index_dir)) == len(df)
+
+
+def test_empty_index_finds_nothing(tmp_path):
+    df = make_clients(10, seed=1)
+    index = ClientIndex(_build(df.iloc[:0], str(tmp_path / 'index')))
+    assert index.find(df['Client_ID'].to_numpy()).tolist() == [-1] * len(df)
+    assert index.get(df['Client_ID'].iloc[0]) is None
+
+
+def test_incremental_ingest_indexes_new_clients_once(work_dirs):
+    from ingestion import ingest_new_files
+    from client_index import INDEX_DIR
+
+    first, second = make_clients(3_000, seed=1), make_clients(500, seed=2)
+    first.to_csv(os.path.join(work_dirs.INPUT_FOLDER_PATH, 'a.csv'), index=False)
+    ingest_new_files()
+    # The second drop repeats 50 known clients (one in upper case) and 10 of its own rows
+    repeats = first.iloc[:50].copy()
+    repeats.loc[0, 'Client_ID'] = repeats.loc[0, 'Client_ID'].upper()
+    pd.concat([second, repeats, second.iloc[:10]]).to_csv(os.path.join(work_dirs.INPUT_FOLDER_PATH, 'b.csv'), index=False)
+    entries = ingest_new_files()
+
+    assert [entry['new_rows'] for entry in entries] == [len(second)]
+    index = ClientIndex(INDEX_DIR)
+    assert len(index) == len(first) + len(second)
+    assert (index.find(pd.concat([first, second])['Client_ID'].to_numpy()) >= 0).all()
+    assert index.get(second['Client_ID'].iloc[-1])['Tenure_Years'] == second['Tenure_Years'].iloc[-1]
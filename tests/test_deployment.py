@@ -0,0 +1,75 @@
+import os
+import json
+
+
+def _write_metrics(work_dirs, model_sha256):
+    with open(os.path.join(work_dirs.MODEL_PATH, 'latestscore.json'), 'w') as f:
+        json.dump({'f1': 0.5, 'model_sha256': model_sha256}, f)
+
+
+def test_rollback_relinks_files_and_drops_links_the_release_lacks(work_dirs, train_model):
+    from deployment import deploy_model, rollback, _file_digest
+    from model_registry import PROD_DEPLOYMENT_PATH, RELEASES_DIR, current_version, release_history
+
+    train_model(seed=1)
+    first = deploy_model()
+    train_model(seed=2)
+    _write_metrics(work_dirs, _file_digest(os.path.join(work_dirs.MODEL_PATH, 'trainedmodel.pkl')))
+    second = deploy_model()
+    assert current_version() == second
+    assert os.path.exists(os.path.join(PROD_DEPLOYMENT_PATH, 'latestscore.json'))
+
+    assert rollback(first) == first
+    assert current_version() == first
+    model_link = os.path.join(PROD_DEPLOYMENT_PATH, 'trainedmodel.pkl')
+    assert os.path.realpath(model_link) == os.path.realpath(os.path.join(RELEASES_DIR, first, 'trainedmodel.pkl'))
+    # The first release has no latestscore.json, so no link may be left dangling
+    assert not os.path.lexists(os.path.join(PROD_DEPLOYMENT_PATH, 'latestscore.json'))
+    for name in os.listdir(PROD_DEPLOYMENT_PATH):
+        assert os.path.exists(os.path.join(PROD_DEPLOYMENT_PATH, name)), name
+    assert [event['event'] for event in release_history()] == ['deploy', 'deploy', 'rollback']
+
+    assert rollback(second) == second
+    assert os.path.exists(os.path.join(PROD_DEPLOYMENT_PATH, 'latestscore.json'))
+
+
+def test_manifest_keeps_only_metrics_of_the_released_model(work_dirs, train_model):
+    from deployment import deploy_model, _file_digest
+    from model_registry import read_manifest
+
+    train_model(seed=1)
+    model_sha256 = _file_digest(os.path.join(work_dirs.MODEL_PATH, 'trainedmodel.pkl'))
+    _write_metrics(work_dirs, model_sha256)
+    deploy_model()
+    assert read_manifest()['metrics']['model_sha256'] == model_sha256
+
+    # Retrained without rescoring: latestscore.json still describes the previous model
+    train_model(seed=2)
+    deploy_model()
+    assert read_manifest()['metrics'] is None
+
+
+def test_candidate_scores_describe_the_model_in_model_path(work_dirs, train_model):
+    from deployment import deploy_model, _file_digest
+    from model_registry import read_manifest
+    from scoring import score_model
+
+    train_model(seed=1)
+    deploy_model()
+    train_model(seed=2)
+    metrics = score_model(candidate=True)
+    assert metrics['model_sha256'] == _file_digest(os.path.join(work_dirs.MODEL_PATH, 'trainedmodel.pkl'))
+    deploy_model()
+    assert read_manifest()['metrics']['f1'] == metrics['f1']
+
+
+def test_manifest_records_feature_dtypes(work_dirs, train_model):
+    from deployment import deploy_model
+    from model_registry import read_manifest
+
+    train_model(seed=1)
+    deploy_model()
+    schema = read_manifest()['feature_schema']
+    assert schema['numeric_columns']['Age'] == 'int8'
+    assert schema['numeric_columns']['Monthly_Spend'] == 'float64'
+    assert schema['categories'] == {'Gender': ['Male']}
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+
+from encoding import FeatureEncoder
+from numpy_model import NumpyModel, as_numpy_model, export_model, verify_export
+from synthetic import make_clients
+
+MODELS = {
+    'logistic_liblinear': lambda: LogisticRegression(solver='liblinear', max_iter=200),
+    'logistic_multinomial': lambda: LogisticRegression(solver='lbfgs', max_iter=500),
+    'sgd': lambda: SGDClassifier(loss='log_loss', alpha=1e-4, average=True, random_state=0),
+    'random_forest': lambda: RandomForestClassifier(n_estimators=20, max_depth=6, random_state=0),
+}
+
+
+@pytest.fixture(scope='module')
+def encoded():
+    df = make_clients(3_000, seed=0)
+    encoder = FeatureEncoder.fit(df)
+    X = encoder.transform(df)
+    encoder.fit_scaler(X)
+    return X, encoder.encode_target(df['Attrition_Risk'])
+
+
+@pytest.mark.parametrize('name', sorted(MODELS))
+def test_export_matches_sklearn(name, encoded, tmp_path):
+    X, y = encoded
+    model = MODELS[name]().fit(X, y)
+
+    exported = export_model(model, str(tmp_path / 'model.npz'))
+    loaded = NumpyModel.load(str(tmp_path / 'model.npz'))
+    for numpy_model in (exported, loaded):
+        check = verify_export(model, numpy_model, X, atol=1e-6)
+        assert check['within_tolerance'], check
+        assert check['predictions_match']
+        assert np.array_equal(numpy_model.predict(X), model.predict(X))
+
+
+def test_forest_explanations_add_up_to_the_probability(encoded):
+    X, y = encoded
+    model = RandomForestClassifier(n_estimators=10, max_depth=5, random_state=0).fit(X, y)
+    numpy_model = as_numpy_model(model)
+
+    base, contributions = numpy_model.explain(X[:500], class_index=1)
+    np.testing.assert_allclose(base + contributions.sum(axis=1), model.predict_proba(X[:500])[:, 1], atol=1e-6)
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from encoding import FeatureEncoder
+from score_cache import ScoreCache
+from synthetic import make_clients
+
+
+@pytest.fixture(scope='module')
+def scored():
+    df = make_clients(2_000, seed=0)
+    encoder = FeatureEncoder.fit(df)
+    model = LogisticRegression(max_iter=500).fit(encoder.transform_frame(df), encoder.encode_target(df['Attrition_Risk']))
+    return df, model, encoder
+
+
+def _expected(df, model, encoder):
+    return model.predict_proba(encoder.transform_frame(df))
+
+
+def test_only_new_or_changed_rows_are_predicted(scored, tmp_path):
+    df, model, encoder = scored
+    path = str(tmp_path / 'score_cache.parquet')
+    cache = ScoreCache(path)
+    np.testing.assert_allclose(cache.predict_proba(df, model, encoder, 'v1'), _expected(df, model, encoder))
+    cache.save()
+
+    changed = df.copy()
+    changed.loc[:99, 'Monthly_Spend'] *= 1.1
+    cache = ScoreCache(path)
+    y_prob = cache.predict_proba(changed, model, encoder, 'v1')
+    assert cache.counters == {'rows': len(df), 'predicted': 100}
+    np.testing.assert_allclose(y_prob, _expected(changed, model, encoder))
+
+
+def test_a_model_version_change_invalidates_every_score(scored, tmp_path):
+    df, model, encoder = scored
+    path = str(tmp_path / 'score_cache.parquet')
+    cache = ScoreCache(path)
+    cache.predict_proba(df, model, encoder, 'v1')
+    cache.save()
+
+    cache = ScoreCache(path)
+    cache.predict_proba(df, model, encoder, 'v2')
+    assert cache.counters['predicted'] == len(df)
+    cache.save()
+    assert set(pd.read_parquet(path)['model_version']) == {'v2'}
+
+
+def test_concurrent_savers_keep_each_others_entries(scored, tmp_path):
+    df, model, encoder = scored
+    path = str(tmp_path / 'score_cache.parquet')
+    first, second = ScoreCache(path), ScoreCache(path)
+    first.predict_proba(df.iloc[:1000], model, encoder, 'v1')
+    second.predict_proba(df.iloc[1000:], model, encoder, 'v1')
+    first.save()
+    second.save()
+    assert len(ScoreCache(path)) == len(df)
@@ -0,0 +1,46 @@
+import pytest
+
+RECORD = {'Client_ID': 'a6173373-f8f4-492e-80c0-f6944551ab99', 'Age': 40, 'Gender': 'Male', 'Tenure_Years': 3,
+          'Monthly_Spend': 500.0, 'Complaints': 1, 'Overdue_Payments': 0}
+
+
+@pytest.fixture
+def client(train_model):
+    from deployment import deploy_model
+    from service import app
+
+    train_model(seed=1)
+    deploy_model()
+    return app.test_client()
+
+
+@pytest.mark.parametrize('value, message', [
+    (None, "must not be null"),
+    (True, "must be a finite number"),
+    ('12', "must be a finite number"),
+    (10**400, "must be a finite number"),
+])
+def test_invalid_numbers_are_rejected_with_400(client, value, message):
+    for path, body in (('/predict', dict(RECORD, Age=value)), ('/predict/batch', [RECORD, dict(RECORD, Age=value)])):
+        response = client.post(path, json=body)
+        assert response.status_code == 400, path
+        assert message in response.get_json()['error']
+
+
+def test_non_finite_json_numbers_are_rejected(client):
+    response = client.post('/predict/batch', data='[{"Age": NaN}]', content_type='application/json')
+    assert response.status_code == 400
+
+
+def test_malformed_bodies_are_rejected(client):
+    assert client.post('/predict/batch', json=[]).status_code == 400
+    assert client.post('/predict/batch', json={'Age': 40}).status_code == 400
+    assert client.post('/predict', json=[RECORD]).status_code == 400
+
+
+def test_valid_records_are_scored(client):
+    single = client.post('/predict', json=RECORD)
+    batch = client.post('/predict/batch', json=[RECORD, {k: v for k, v in RECORD.items() if k != 'Complaints'}])
+    assert single.status_code == 200 and batch.status_code == 200
+    assert single.get_json()['probability_of_leaving'] == pytest.approx(batch.get_json()[0]['probability_of_leaving'])
+    assert 0.0 <= batch.get_json()[1]['probability_of_leaving'] <= 1.0
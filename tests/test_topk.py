@@ -0,0 +1,59 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from topk import TopKAccumulator
+
+
+def _reference(scores, k):
+    # A full stable sort: highest score first, earlier rows first among ties
+    return np.lexsort((np.arange(len(scores)), -scores))[:k]
+
+
+@pytest.mark.parametrize('by', ['probability', 'expected_revenue_loss'])
+def test_matches_full_sort_with_ties_chunks_and_merges(by):
+    rng = np.random.default_rng(1)
+    n_rows, k = 100_000, 50
+    probability = np.round(rng.random(n_rows), 2)  # many ties
+    revenue = rng.random(n_rows) * 500
+    ids = np.array([f"c{i}" for i in range(n_rows)], dtype=object)
+    scores = probability if by == 'probability' else revenue * 12 * probability
+    expected = _reference(scores, k)
+
+    chunked = TopKAccumulator(k, by)
+    for start in range(0, n_rows, 7777):
+        chunked.update(probability[start:start + 7777], ids[start:start + 7777], revenue[start:start + 7777])
+
+    shards = []
+    for start in range(0, n_rows, 30000):
+        stop = min(start + 30000, n_rows)
+        shard = TopKAccumulator(k, by).update(probability[start:stop], ids[start:stop], revenue[start:stop],
+                                              positions=np.arange(start, stop))
+        shards.append(pickle.loads(pickle.dumps(shard)))
+    merged = TopKAccumulator(k, by)
+    for shard in reversed(shards):
+        merged.merge(shard)
+
+    for accumulator in (chunked, merged):
+        ranked = accumulator.result()
+        assert accumulator.rows_seen == n_rows
+        np.testing.assert_array_equal(ranked.index.to_numpy(), expected)
+        np.testing.assert_array_equal(ranked['Client_ID'].to_numpy(), ids[expected])
+
+
+def test_nan_scores_rank_last():
+    ids = np.array(['a', 'b', 'c', 'd'], dtype=object)
+    ranked = TopKAccumulator(3, 'expected_revenue_loss').update(
+        [.9, .8, .7, .6], ids, [100, np.nan, np.nan, np.nan]).result()
+    assert list(ranked['Client_ID']) == ['a', 'b', 'c']
+    assert ranked['expected_annual_revenue_loss'].iloc[0] == pytest.approx(1080.0)
+    assert ranked['expected_annual_revenue_loss'].iloc[1:].isna().all()
+
+    ranked = TopKAccumulator(2).update([np.nan, .5, np.nan, .7], ids).result()
+    assert list(ranked['Client_ID']) == ['d', 'b']
+
+
+def test_merge_requires_same_ranking():
+    with pytest.raises(ValueError):
+        TopKAccumulator(5).merge(TopKAccumulator(5, 'expected_revenue_loss'))
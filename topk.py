@@ -0,0 +1,243 @@
+"""
+Streaming top-K selection of the highest-risk clients.
+
+TopKAccumulator keeps only the K best rows seen so far: every scored batch is
+reduced to its own K best with a partial select (np.argpartition) and merged
+into the buffer, so memory stays O(K) however many rows stream through.
+Accumulators of different chunks, shards or worker processes merge into the
+same result a single sort of all rows would give, ties included (earlier rows
+win), because every row carries its global position.
+
+Clients can be ranked by probability_of_leaving or by expected annual revenue
+loss, Monthly_Spend * 12 * probability_of_leaving.
+
+Usage:
+    python topk.py                                     # top 50 of the columnar store by probability
+    python topk.py --by expected_revenue_loss --top-k 100 --workers 4
+"""
+
+import sys
+import time
+import argparse
+import logging
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+RANK_BY = ('probability', 'expected_revenue_loss')
+REVENUE_COLUMN = 'Monthly_Spend'
+
+
+def _select(scores, positions, k):
+    """
+    Returns the indices of the k highest scores, breaking ties by the lowest position, unordered.
+
+    Scores must not be NaN (TopKAccumulator.update maps them to -inf).
+    """
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if len(scores) <= k:
+        return np.arange(len(scores))
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    threshold = scores[candidates].min()
+    # argpartition keeps an arbitrary subset of the rows tied at the threshold; a full sort keeps the earliest
+    above = np.flatnonzero(scores > threshold)
+    tied = np.flatnonzero(scores == threshold)
+    tied = tied[np.argsort(positions[tied], kind='stable')[:k - len(above)]]
+    return np.concatenate([above, tied])
+
+
+class TopKAccumulator:
+    """
+    The k highest-risk rows seen so far, as a few parallel arrays of at most k entries.
+
+    Accumulators are picklable, so shards can be ranked in worker processes and merged
+    in the parent with merge().
+    """
+
+    def __init__(self, k=50, by='probability'):
+        """
+        Args:
+            k (int): Rows to keep.
+            by (str): 'probability' or 'expected_revenue_loss' (monthly revenue * 12 * probability).
+        """
+        if by not in RANK_BY:
+            raise ValueError(f"by must be one of {RANK_BY}, got {by!r}")
+        self.k = k
+        self.by = by
+        self.rows_seen = 0
+        self._scores = np.empty(0)
+        self._positions = np.empty(0, dtype=np.int64)
+        self._probability = np.empty(0)
+        self._monthly_revenue = np.empty(0)
+        self._client_ids = np.empty(0, dtype=object)
+
+    def __len__(self):
+        return len(self._scores)
+
+    def update(self, probability, client_ids=None, monthly_revenue=None, positions=None):
+        """
+        Adds a scored batch.
+
+        Args:
+            probability (array-like): probability_of_leaving of each row.
+            client_ids (array-like): Client_ID of each row. Defaults to the positions.
+            monthly_revenue (array-like): Monthly revenue of each row; required for
+                by='expected_revenue_loss', otherwise only used for annual_revenue_loss.
+            positions (array-like): Global row numbers, used to break ties. Defaults to
+                the rows following those already seen.
+
+        Returns:
+            TopKAccumulator: self
+        """
+        probability = np.asarray(probability, dtype=np.float64)
+        n_rows = len(probability)
+        if positions is None:
+            positions = np.arange(self.rows_seen, self.rows_seen + n_rows, dtype=np.int64)
+        positions = np.asarray(positions, dtype=np.int64)
+        if monthly_revenue is None:
+            if self.by == 'expected_revenue_loss':
+                raise ValueError("monthly_revenue is required to rank by expected_revenue_loss")
+            monthly_revenue = np.full(n_rows, np.nan)
+        monthly_revenue = np.asarray(monthly_revenue, dtype=np.float64)
+        scores = probability if self.by == 'probability' else monthly_revenue * 12 * probability
+        # NaN compares false with everything, so a NaN at the threshold would make _select drop
+        # every row; unscoreable rows rank last instead
+        scores = np.where(np.isnan(scores), -np.inf, scores)
+
+        # Only the batch's own top k can enter the buffer, so nothing else is gathered
+        keep = _select(scores, positions, self.k)
+        if client_ids is None:
+            batch_ids = positions[keep].astype(object)
+        else:
+            batch_ids = pd.Series(client_ids, copy=False).iloc[keep].to_numpy(dtype=object)
+        self._add(scores[keep], positions[keep], probability[keep], monthly_revenue[keep], batch_ids)
+        self.rows_seen += n_rows
+        return self
+
+    def merge(self, other):
+        """
+        Folds another accumulator (same k and by, disjoint rows) into this one.
+
+        Returns:
+            TopKAccumulator: self
+        """
+        if (other.k, other.by) != (self.k, self.by):
+            raise ValueError("Only accumulators with the same k and by can be merged")
+        self._add(other._scores, other._positions, other._probability, other._monthly_revenue, other._client_ids)
+        self.rows_seen += other.rows_seen
+        return self
+
+    def _add(self, scores, positions, probability, monthly_revenue, client_ids):
+        scores = np.concatenate([self._scores, scores])
+        positions = np.concatenate([self._positions, positions])
+        keep = _select(scores, positions, self.k)
+        self._scores = scores[keep]
+        self._positions = positions[keep]
+        self._probability = np.concatenate([self._probability, probability])[keep]
+        self._monthly_revenue = np.concatenate([self._monthly_revenue, monthly_revenue])[keep]
+        self._client_ids = np.concatenate([self._client_ids, client_ids])[keep]
+
+    def result(self):
+        """
+        Returns the ranked clients in the format of diagnostics.rank_high_risk_clients.
+
+        Returns:
+            pandas.DataFrame: Client_ID, probability_of_leaving, predicted_class and
+            annual_revenue_loss (plus expected_annual_revenue_loss when ranked by it), best first,
+            indexed by the rows' global positions.
+        """
+        order = np.lexsort((self._positions, -self._scores))
+        probability = self._probability[order]
+        predicted_class = (probability >= 0.5).astype(np.int8)
+        monthly_revenue = self._monthly_revenue[order]
+        ranked = pd.DataFrame({
+            'Client_ID': self._client_ids[order],
+            'probability_of_leaving': probability,
+            'predicted_class': predicted_class,
+            'annual_revenue_loss': np.where(predicted_class == 1, monthly_revenue * 12, 0.0),
+        }, index=self._positions[order])
+        if self.by == 'expected_revenue_loss':
+            scores = self._scores[order]
+            ranked['expected_annual_revenue_loss'] = np.where(np.isneginf(scores), np.nan, scores)
+        return ranked
+
+
+def _store_offsets():
+    # Global position of the first row of every store part (the legacy CSV counts as one part)
+    import pyarrow.parquet as pq
+    from data_store import store_parts
+
+    parts = store_parts()
+    return np.cumsum([0] + [pq.ParquetFile(part).metadata.num_rows for part in parts])[:max(len(parts), 1)]
+
+
+def _rank_parts(part_indexes, offsets, k, by, batch_size, release):
+    from data_store import iter_store_batches
+    from model_registry import load_deployed_encoder
+    from numpy_model import load_scoring_model
+
+    model = load_scoring_model(release)
+    encoder = load_deployed_encoder(model, release)
+    accumulator = TopKAccumulator(k, by)
+    for part in part_indexes:
+        position = offsets[part]
+        for (part_index, _), batch in iter_store_batches(batch_size=batch_size, start=(part, 0)):
+            if part_index != part:
+                break
+            probability = model.predict_proba(encoder.transform_frame(batch))[:, 1]
+            accumulator.update(probability, batch['Client_ID'], batch[REVENUE_COLUMN],
+                               positions=np.arange(position, position + len(batch)))
+            position += len(batch)
+    return accumulator
+
+
+def stream_high_risk_clients(k=50, by='probability', batch_size=100_000, n_workers=1, release=None):
+    """
+    Scores the columnar store in one streaming pass and returns its k highest-risk clients.
+
+    With n_workers > 1 the store parts are spread over worker processes, each returning
+    its own accumulator, and the accumulators are merged.
+
+    Args:
+        k (int): Clients to return.
+        by (str): 'probability' or 'expected_revenue_loss'.
+        batch_size (int): Rows scored at a time.
+        n_workers (int): Worker processes.
+        release (str): Release directory to score with. Defaults to the current one.
+
+    Returns:
+        pandas.DataFrame: See TopKAccumulator.result.
+    """
+    from model_registry import release_dir
+
+    if release is None:
+        release = release_dir()
+    offsets = _store_offsets()
+    parts = list(range(len(offsets)))
+    starttime = time.perf_counter()
+    if n_workers <= 1 or len(parts) <= 1:
+        accumulator = _rank_parts(parts, offsets, k, by, batch_size, release)
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = [executor.submit(_rank_parts, parts[w::n_workers], offsets, k, by, batch_size, release)
+                       for w in range(min(n_workers, len(parts)))]
+            accumulator = TopKAccumulator(k, by)
+            for future in futures:
+                accumulator.merge(future.result())
+    logging.info(f"Ranked {accumulator.rows_seen:,} clients by {by} in {time.perf_counter() - starttime:.2f} sec")
+    return accumulator.result()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stream the columnar store and list its highest-risk clients.")
+    parser.add_argument('--top-k', type=int, default=50, help="Clients to list")
+    parser.add_argument('--by', choices=RANK_BY, default='probability', help="Ranking score")
+    parser.add_argument('--batch-size', type=int, default=100_000, help="Rows scored at a time")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes (store parts are split between them)")
+    args = parser.parse_args()
+
+    logging.info("Running topk.py")
+    print(stream_high_risk_clients(args.top_k, args.by, args.batch_size, args.workers).to_string(index=False))
@@ -2,46 +2,36 @@
 Author: Ibrahim Sherif
 Date: December, 2021
 This script is used for training a logistic regression model on the ingested data.
+
+`python training.py --incremental` trains out of core instead: the data store is streamed
+in chunks through an SGD logistic regression, with a checkpoint after every chunk so an
+interrupted run resumes where it stopped.
 """
 
 import os
 import sys
 import pickle
+import argparse
 import logging
+import numpy as np
 import pandas as pd
-from sklearn.linear_model import LogisticRegression
+import sklearn
+from pandas.api.types import is_numeric_dtype
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.preprocessing import LabelEncoder
-from config import MODEL_PATH, DATA_PATH
+from config import MODEL_PATH
+from data_store import read_store, store_columns, store_exists, store_parts, iter_store, iter_store_batches, LEGACY_CSV
+from encoding import ENCODER_FILE, NON_FEATURE_COLUMNS, FeatureEncoder
+from profiling import ColumnProfile
+from metrics import confusion_counts, metrics_from_confusion
 
 logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 
-def train_model():
+def build_model():
     """
-    Train logistic regression model on ingested data and save the model.
+    Returns the (unfitted) logistic regression trained by train_model.
     """
-    # Load the data
-    data_file = os.path.join(DATA_PATH, 'finaldata.csv')
-    if not os.path.exists(data_file):
-        logging.error(f"Error: The file '{data_file}' does not exist.")
-        return
-
-    logging.info("Loading and preparing finaldata.csv")
-    data_df = pd.read_csv(data_file)
-
-    # Check if necessary columns are in the dataset
-    if 'Attrition_Risk' not in data_df.columns:
-        logging.error("Required column 'Attrition_Risk' not found in data.")
-        return
-
-    # Drop the identifier column and prepare target variable
-    X_df = data_df.drop(['Client_ID', 'Attrition_Risk'], axis=1)
-    
-    # Encode categorical variables
-    X_df = pd.get_dummies(X_df, drop_first=True)
-    y_df = LabelEncoder().fit_transform(data_df['Attrition_Risk'])
-
-    # Define the Logistic Regression model
-    model = LogisticRegression(
+    return LogisticRegression(
         C=1.0,
         class_weight=None,
         dual=False,
@@ -55,18 +45,227 @@ def train_model():
         tol=0.0001,
         warm_start=False)
 
+def fit_model(data_df):
+    """
+    Fits the feature encoder and the logistic regression on raw client rows, without saving anything.
+
+    Returns:
+        tuple: (fitted model, fitted FeatureEncoder)
+    """
+    # Fit the feature encoder (drops the identifier and target columns) and encode
+    encoder = FeatureEncoder.fit(data_df)
+    X_df = encoder.transform_frame(data_df)
+    y_df = LabelEncoder().fit_transform(data_df['Attrition_Risk'])
+
+    model = build_model()
+    model.fit(X_df, y_df)
+    return model, encoder
+
+def train_model():
+    """
+    Train logistic regression model on ingested data and save the model.
+    """
+    # Load the data
+    if not store_exists() and not os.path.exists(LEGACY_CSV):
+        logging.error("Error: No ingested data found. Run ingestion.py first.")
+        return
+
+    logging.info("Loading and preparing ingested data")
+    # Client_ID is not a feature; skipping it avoids loading one string per client
+    data_df = read_store(columns=[col for col in store_columns() if col != 'Client_ID'])
+
+    # Check if necessary columns are in the dataset
+    if 'Attrition_Risk' not in data_df.columns:
+        logging.error("Required column 'Attrition_Risk' not found in data.")
+        return
+
     # Train the model
     logging.info("Training model")
-    model.fit(X_df, y_df)
+    model, encoder = fit_model(data_df)
 
     # Save the trained model
     model_path = os.path.join(MODEL_PATH, 'trainedmodel.pkl')
     os.makedirs(MODEL_PATH, exist_ok=True)
     with open(model_path, 'wb') as model_file:
         pickle.dump(model, model_file)
+    encoder.save(os.path.join(MODEL_PATH, ENCODER_FILE))
     
-    logging.info(f"Model saved to {model_path}")
+    logging.info(f"Model and encoder saved to {MODEL_PATH}")
+
+
+CHECKPOINT_PATH = os.path.join(MODEL_PATH, 'training_checkpoint.pkl')
+HOLDOUT_BUCKETS = 10  # One bucket in ten (by hashed Client_ID) is held out for the final metrics
+
+# The logistic loss was renamed in scikit-learn 1.1
+_LOG_LOSS = 'log_loss' if tuple(int(part) for part in sklearn.__version__.split('.')[:2]) >= (1, 1) else 'log'
+
+
+def _store_fingerprint():
+    # Any new, removed or rewritten part invalidates a checkpoint
+    parts = store_parts() or [LEGACY_CSV]
+    return [(os.path.basename(part), os.path.getsize(part), os.path.getmtime(part)) for part in parts]
+
+
+def _holdout_mask(chunk):
+    key = chunk['Client_ID'] if 'Client_ID' in chunk.columns else chunk
+    return pd.util.hash_pandas_object(key, index=False).to_numpy() % HOLDOUT_BUCKETS == 0
+
+
+def fit_streaming_encoder(chunksize):
+    """
+    Fits the feature encoder and its scaler in one streaming pass over the data store.
+
+    Numeric moments are merged across chunks (Chan updates); one-hot columns are scaled
+    from their category frequencies, so no chunk is kept in memory.
+
+    Returns:
+        tuple: (FeatureEncoder with scaler, sorted target labels)
+    """
+    numeric_profiles, category_counts, labels = {}, {}, set()
+    num_rows = 0
+    for chunk in iter_store(batch_size=chunksize):
+        num_rows += len(chunk)
+        labels.update(chunk['Attrition_Risk'].dropna().unique())
+        for col in chunk.columns:
+            if col in NON_FEATURE_COLUMNS:
+                continue
+            if col in numeric_profiles or (col not in category_counts and is_numeric_dtype(chunk[col])):
+                numeric_profiles.setdefault(col, ColumnProfile(numeric=True, quantiles=False)).update(chunk[col])
+            else:
+                counts = category_counts.setdefault(col, {})
+                for category, count in chunk[col].value_counts().items():
+                    counts[category] = counts.get(category, 0) + int(count)
+
+    # Same layout as FeatureEncoder.fit: numeric columns, then drop_first dummies
+    feature_names = list(numeric_profiles)
+    means = [profile.mean for profile in numeric_profiles.values()]
+    scales = [np.sqrt(profile.m2 / profile.count) if profile.count else 0.0 for profile in numeric_profiles.values()]
+    category_tables = {}
+    for col, counts in category_counts.items():
+        category_tables[col] = {}
+        for category in sorted(counts)[1:]:
+            category_tables[col][category] = len(feature_names)
+            feature_names.append(f"{col}_{category}")
+            frequency = counts[category] / num_rows
+            means.append(frequency)
+            scales.append(np.sqrt(frequency * (1 - frequency)))
+
+    encoder = FeatureEncoder(feature_names, {col: i for i, col in enumerate(numeric_profiles)}, category_tables)
+    scales = np.asarray(scales)
+    scales[scales == 0] = 1.0
+    encoder.scaler_mean_ = np.asarray(means, dtype=np.float32)
+    encoder.scaler_scale_ = scales.astype(np.float32)
+    encoder.target_labels_ = sorted(labels)
+    return encoder, encoder.target_labels_
+
+
+def _save_checkpoint(state):
+    tmp_path = f"{CHECKPOINT_PATH}.tmp"
+    with open(tmp_path, 'wb') as checkpoint_file:
+        pickle.dump(state, checkpoint_file)
+    os.replace(tmp_path, CHECKPOINT_PATH)
+
+
+def _load_checkpoint(fingerprint):
+    if not os.path.exists(CHECKPOINT_PATH):
+        return None
+    with open(CHECKPOINT_PATH, 'rb') as checkpoint_file:
+        state = pickle.load(checkpoint_file)
+    if state['fingerprint'] != fingerprint:
+        logging.info("Ingested data changed since the checkpoint; starting over")
+        return None
+    return state
+
+
+def train_model_incremental(chunksize=100_000, epochs=3, resume=True, random_state=0):
+    """
+    Trains an SGD logistic regression out of core, one store chunk at a time.
+
+    Memory use is bounded by the chunk size. The model, encoder and stream position are
+    checkpointed after every chunk; with resume=True a run picks up from the last checkpoint
+    (provided the data store is unchanged). Rows whose hashed Client_ID falls in the holdout
+    bucket are never trained on and give the final metrics.
+
+    Args:
+        chunksize (int): Rows per chunk.
+        epochs (int): Passes over the data.
+        resume (bool): Continue from an existing checkpoint.
+        random_state (int): Seed of the model and of the per-chunk shuffles.
+
+    Returns:
+        dict: Holdout metrics (see metrics.metrics_from_confusion), or None if there is no data.
+    """
+    if not store_exists() and not os.path.exists(LEGACY_CSV):
+        logging.error("Error: No ingested data found. Run ingestion.py first.")
+        return None
+
+    os.makedirs(MODEL_PATH, exist_ok=True)
+    fingerprint = _store_fingerprint()
+    state = _load_checkpoint(fingerprint) if resume else None
+    if state is None:
+        logging.info("Fitting encoder and scaler in a streaming pass")
+        encoder, labels = fit_streaming_encoder(chunksize)
+        model = SGDClassifier(loss=_LOG_LOSS, penalty='l2', alpha=1e-4, average=True, random_state=random_state)
+        state = {'fingerprint': fingerprint, 'encoder': encoder, 'labels': labels, 'model': model,
+                 'epoch': 0, 'position': (0, 0), 'rows_trained': 0}
+    else:
+        logging.info(f"Resuming from epoch {state['epoch']}, part/batch {state['position']}")
+
+    encoder, labels, model = state['encoder'], state['labels'], state['model']
+    classes = np.arange(len(labels))
+    while state['epoch'] < epochs:
+        for (part, batch), chunk in iter_store_batches(batch_size=chunksize, start=state['position']):
+            train = ~_holdout_mask(chunk)
+            y = pd.Categorical(chunk['Attrition_Risk'], categories=labels).codes
+            train &= y >= 0
+            X_df = encoder.transform_frame(chunk[train])
+            # partial_fit does not shuffle, so each chunk is permuted (reproducibly) before the update
+            order = np.random.default_rng([random_state, state['epoch'], part, batch]).permutation(len(X_df))
+            model.partial_fit(X_df.iloc[order], y[train][order], classes=classes)
+
+            state['position'] = (part, batch + 1)
+            state['rows_trained'] += int(train.sum())
+            _save_checkpoint(state)
+        state['epoch'] += 1
+        state['position'] = (0, 0)
+        _save_checkpoint(state)
+        logging.info(f"Epoch {state['epoch']}/{epochs} done ({state['rows_trained']} rows trained)")
+
+    if not hasattr(model, 'coef_'):
+        logging.error("No rows were trained (epochs=0 and no checkpoint); nothing to save.")
+        return None
+
+    # Final metrics on the held-out bucket
+    confusion = np.zeros((len(labels), len(labels)), dtype=np.int64)
+    for chunk in iter_store(batch_size=chunksize):
+        holdout = chunk[_holdout_mask(chunk)]
+        y = pd.Categorical(holdout['Attrition_Risk'], categories=labels).codes
+        holdout, y = holdout[y >= 0], y[y >= 0]
+        if len(holdout):
+            confusion += confusion_counts(y, model.predict(encoder.transform_frame(holdout)), classes)
+    metrics = metrics_from_confusion(confusion, labels)
+    logging.info(f"Holdout f1 = {metrics['f1']:.4f}, precision = {metrics['precision']:.4f}, "
+                 f"recall = {metrics['recall']:.4f} on {int(confusion.sum())} rows")
+
+    with open(os.path.join(MODEL_PATH, 'trainedmodel.pkl'), 'wb') as model_file:
+        pickle.dump(model, model_file)
+    encoder.save(os.path.join(MODEL_PATH, ENCODER_FILE))
+    if os.path.exists(CHECKPOINT_PATH):
+        os.remove(CHECKPOINT_PATH)
+    logging.info(f"Model and encoder saved to {MODEL_PATH}")
+    return metrics
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train the attrition model on the ingested data.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Stream the data store through an SGD logistic regression with checkpoints")
+    parser.add_argument('--chunksize', type=int, default=100_000, help="Rows per chunk in incremental mode")
+    parser.add_argument('--epochs', type=int, default=3, help="Passes over the data in incremental mode")
+    parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint")
+    args = parser.parse_args()
+
     logging.info("Running training.py")
-    train_model()
+    if args.incremental:
+        train_model_incremental(chunksize=args.chunksize, epochs=args.epochs, resume=not args.restart)
+    else:
+        train_model()
@@ -0,0 +1,220 @@
+"""
+Successive-halving hyperparameter search for the RandomForest in scoring.py.
+
+n_estimators is treated as the budget: every configuration of the remaining
+parameters is cross-validated at the smallest forest size, the best third
+advance, and their per-fold forests are grown with warm_start to the next
+size instead of being refitted. Fold scores are cached on disk keyed by a
+hash of the data and of the search setup (folds, metric, base estimator)
+plus the parameters, so reruns of an unchanged search reuse every earlier fit.
+
+Usage:
+    python tuning.py    # compare wall-clock of the exhaustive grid and successive halving on testdata.csv
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import hashlib
+import logging
+import itertools
+import numpy as np
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import f1_score
+from sklearn.model_selection import GridSearchCV, StratifiedKFold
+
+from config import MODEL_PATH
+
+logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+
+CACHE_DIR = os.path.join(MODEL_PATH, 'tuning_cache')
+
+
+def data_hash(X, y):
+    """
+    Returns a sha256 over the feature names, feature values and target.
+    """
+    sha256 = hashlib.sha256()
+    sha256.update(json.dumps([str(col) for col in getattr(X, 'columns', [])]).encode('utf-8'))
+    sha256.update(np.ascontiguousarray(np.asarray(X)).tobytes())
+    sha256.update(np.ascontiguousarray(np.asarray(y)).tobytes())
+    return sha256.hexdigest()
+
+
+def search_hash(estimator, param_grid, cv, scoring_average):
+    """
+    Returns a sha256 over everything besides the data and the grid values that a fold score
+    depends on: the fold count, the F1 averaging and the base estimator's class and parameters.
+
+    Parameters set by the grid, and ones that do not change the fitted trees (n_jobs,
+    verbose, warm_start), are left out.
+    """
+    ignored = set(param_grid) | {'n_jobs', 'verbose', 'warm_start'}
+    estimator_params = {name: value for name, value in estimator.get_params(deep=False).items()
+                        if name not in ignored}
+    payload = {
+        'cv': cv,
+        'scoring_average': scoring_average,
+        'estimator': type(estimator).__name__,
+        'estimator_params': estimator_params,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=repr).encode('utf-8')).hexdigest()
+
+
+class FoldScoreCache:
+    """
+    On-disk cache of cross-validation fold scores for one dataset and search setup.
+    """
+
+    def __init__(self, dataset_hash, cache_dir=CACHE_DIR, setup_hash=None):
+        name = dataset_hash if setup_hash is None else f"{dataset_hash}-{setup_hash[:16]}"
+        self.path = os.path.join(cache_dir, f"{name}.json")
+        self.scores = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.scores = json.load(f)
+
+    @staticmethod
+    def key(params, n_estimators, fold):
+        return json.dumps({'params': params, 'n_estimators': n_estimators, 'fold': fold}, sort_keys=True)
+
+    def get(self, params, n_estimators, fold):
+        return self.scores.get(self.key(params, n_estimators, fold))
+
+    def put(self, params, n_estimators, fold, score):
+        self.scores[self.key(params, n_estimators, fold)] = score
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.scores, f)
+        os.replace(tmp_path, self.path)
+
+
+def successive_halving_search(estimator, param_grid, X, y, cv=5, eta=3, scoring_average='weighted',
+                              cache_dir=CACHE_DIR):
+    """
+    Successive halving over param_grid with n_estimators as the budget.
+
+    Args:
+        estimator (RandomForestClassifier): Base estimator (random_state, class_weight, ...).
+        param_grid (dict): Grid in GridSearchCV format; must contain 'n_estimators'.
+        X (pd.DataFrame): The feature set.
+        y (pd.Series): The target variable.
+        cv (int): Number of stratified folds.
+        eta (int): Only the best 1/eta of the configurations advance to the next forest size.
+        scoring_average (str): Averaging of the F1 score ('weighted' matches f1_weighted).
+        cache_dir (str): Directory of the fold score cache.
+
+    Returns:
+        tuple: (best_model refitted on all data, best_params, search stats dict).
+    """
+    starttime = time.perf_counter()
+    budgets = sorted(param_grid['n_estimators'])
+    other_params = {name: values for name, values in param_grid.items() if name != 'n_estimators'}
+    names = list(other_params)
+    candidates = [dict(zip(names, values)) for values in itertools.product(*other_params.values())]
+
+    folds = list(StratifiedKFold(n_splits=cv).split(X, y))
+    cache = FoldScoreCache(data_hash(X, y), cache_dir, search_hash(estimator, param_grid, cv, scoring_average))
+    X_values, y_values = np.asarray(X), np.asarray(y)
+    forests = {}  # (candidate index, fold) -> warm forest at the previous budget
+    fits = cached = 0
+
+    alive = list(range(len(candidates)))
+    for level, n_estimators in enumerate(budgets):
+        last_level = level == len(budgets) - 1
+        # Forests only matter for the configurations that advance (none after the last level)
+        keep = 0 if last_level else max(1, math.ceil(len(alive) / eta))
+        mean_scores = {}
+        grown = {}
+        for c in alive:
+            fold_scores = []
+            for fold, (train_idx, test_idx) in enumerate(folds):
+                # Taken out of forests, so a previous level's forest is released once it is grown further
+                forest = forests.pop((c, fold), None)
+                score = cache.get(candidates[c], n_estimators, fold)
+                if score is None:
+                    # Growing a warm forest draws the same tree seeds as fitting the larger forest
+                    # from scratch, so cached and freshly grown scores are interchangeable
+                    if forest is None:
+                        forest = clone(estimator).set_params(warm_start=True, **candidates[c])
+                    forest.set_params(n_estimators=n_estimators)
+                    forest.fit(X_values[train_idx], y_values[train_idx])
+                    grown[(c, fold)] = forest
+                    score = float(f1_score(y_values[test_idx], forest.predict(X_values[test_idx]),
+                                           average=scoring_average))
+                    cache.put(candidates[c], n_estimators, fold, score)
+                    fits += 1
+                else:
+                    cached += 1
+                fold_scores.append(score)
+            mean_scores[c] = float(np.mean(fold_scores))
+            # Keep only the forests of the configurations that would advance so far, so at most
+            # keep + 1 configurations' forests are in memory at once
+            leaders = set(sorted(mean_scores, key=mean_scores.get, reverse=True)[:keep])
+            grown = {key: forest for key, forest in grown.items() if key[0] in leaders}
+        cache.save()
+        forests = grown
+
+        if not last_level:
+            alive = sorted(alive, key=lambda c: mean_scores[c], reverse=True)[:keep]
+        logging.info(f"n_estimators={n_estimators}: scored {len(mean_scores)} configs, {len(alive)} advance")
+
+    best = max(alive, key=lambda c: mean_scores[c])
+    best_params = dict(candidates[best], n_estimators=budgets[-1])
+    best_model = clone(estimator).set_params(**best_params).fit(X, y)
+
+    stats = {
+        'seconds': time.perf_counter() - starttime,
+        'fits': fits,
+        'cached_fold_scores': cached,
+        'best_score': mean_scores[best],
+    }
+    logging.info(
+        f"Successive halving: {fits} fits, {cached} cached fold scores, "
+        f"best f1 {stats['best_score']:.4f} in {stats['seconds']:.1f} sec")
+    return best_model, best_params, stats
+
+
+def compare_search_timing(X, y, param_grid, estimator=None):
+    """
+    Runs the exhaustive GridSearchCV and successive halving on the same data and reports wall-clock.
+
+    Returns:
+        dict: grid/halving seconds, best params and best cross-validated scores.
+    """
+    if estimator is None:
+        estimator = RandomForestClassifier(random_state=42, class_weight='balanced', n_jobs=-1)
+
+    starttime = time.perf_counter()
+    grid_search = GridSearchCV(estimator, param_grid, scoring='f1_weighted', cv=5, n_jobs=-1).fit(X, y)
+    grid_seconds = time.perf_counter() - starttime
+
+    _, halving_params, halving_stats = successive_halving_search(estimator, param_grid, X, y)
+
+    result = {
+        'grid_seconds': grid_seconds,
+        'grid_best_params': grid_search.best_params_,
+        'grid_best_score': float(grid_search.best_score_),
+        'halving_seconds': halving_stats['seconds'],
+        'halving_best_params': halving_params,
+        'halving_best_score': halving_stats['best_score'],
+    }
+    logging.info(f"Grid search {grid_seconds:.1f} sec vs successive halving {halving_stats['seconds']:.1f} sec")
+    return result
+
+
+if __name__ == '__main__':
+    from config import TEST_DATA_PATH
+    from client_data import read_clients
+    from scoring import PARAM_GRID, preprocess_data
+
+    logging.info("Running tuning.py")
+    test_df = read_clients(os.path.join(TEST_DATA_PATH, 'testdata.csv'))
+    X, y, _ = preprocess_data(test_df)
+    print(json.dumps(compare_search_timing(X, y, PARAM_GRID), indent=4, default=str))